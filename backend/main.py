@@ -1,20 +1,51 @@
 # main.py - SkinCare AI App sans dossiers uploads
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+_IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import io
+import json
 import logging
+import os
+import threading
+from typing import Optional, Tuple, Union
 from PIL import Image
-from services.skincare_analysis import analyze_skincare_from_memory
+from services.skincare_analysis import analyze_skincare_from_memory, analyze_skincare_fast, skincare_analyzer
 from services.skincare_recommendation import generate_skincare_recommendations
 from services.face_validation import validate_face_for_skincare
-from models.schemas import SkincareAnalysisResponse, ErrorResponse, HealthResponse
+from services.live_tracking import LiveFaceTracker
+from services.job_store import job_store
+from services.profiling import request_profiler
+from services.structured_logging import setup_logging, request_log_context
+from services.model_loader import is_clip_loaded, startup_timings
+from services.clip_backend import close_clip_backend, get_clip_backend
+from services.skincare_history import skincare_history
+from services.analysis_modes import ANALYSIS_MODES, analysis_load
+from services.shadow_evaluation import shadow_evaluator
+from services.threading_policy import threading_policy
+from services.validation_tickets import validation_tickets
+from services.buffer_pool import buffer_pool
+from services.static_catalogs import PrecomputedJSON, skin_types_catalog, skin_problems_catalog
+from services.response_shaping import CompressionMiddleware, shape_analysis, shape_validation
+from models.schemas import SkincareAnalysisResponse, FastAnalysisResponse, ErrorResponse, HealthResponse, SkincareHistory
 import uuid
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
+# torch, transformers et cv2 ne sont importés qu'au premier besoin (voir services/model_loader.py)
+startup_timings["main_import_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
+
+# Configuration du logging (JSON, non bloquant, contexte par requête)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Résolution suffisante pour l'analyse (le visage est recadré puis ramené à 224px) :
+# le frontend réduit et recompresse les photos à cette taille avant l'upload
+UPLOAD_MAX_DIMENSION = 1024
+UPLOAD_JPEG_QUALITY = 0.85
+
 app = FastAPI(
     title="SkinCare AI API",
     description="API d'analyse de peau et recommandations skincare personnalisées avec IA (sans stockage)",
@@ -29,35 +60,93 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression brotli/gzip des réponses > 1 Ko (hors flux SSE)
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+# 📋 Catalogues statiques : générés une fois au démarrage à partir des labels réels de
+# l'analyseur, servis en octets pré-encodés avec ETag (304 si inchangés)
+STATIC_CATALOGS = {
+    "root": PrecomputedJSON(
+        HealthResponse(
+            status="operational",
+            services=["skincare_analysis_memory", "skin_recommendations", "no_storage"],
+            version="2.0.0"
+        ).model_dump(),
+        cache_control="no-cache"
+    ),
+    "health": PrecomputedJSON(
+        HealthResponse(status="healthy", services=["skincare-ai-memory"]).model_dump(),
+        cache_control="no-cache"
+    ),
+    "skin_types": PrecomputedJSON(skin_types_catalog(skincare_analyzer.skin_types)),
+    "skin_problems": PrecomputedJSON(skin_problems_catalog(skincare_analyzer.skin_problems)),
+    "features": PrecomputedJSON({
+        "storage_type": "in_memory_only",
+        "face_validation": "enabled",
+        "ai_models": ["CLIP-ViT-B/32", "OpenCV-YuNet", "OpenCV-HaarCascade"],
+        "privacy_level": "maximum",
+        "features": [
+            "Validation automatique de visage humain",
+            "Détection de visage DNN (YuNet) + validation CLIP",
+            "Aucun fichier stocké sur le serveur",
+            "Traitement 100% en mémoire",
+            "Rejet automatique des non-visages",
+            "Messages d'erreur explicites",
+            "Suggestions d'amélioration photo"
+        ],
+        "validation_criteria": {
+            # Détecteur configuré (retombe sur Haar si le modèle YuNet manque) : cv2 n'est pas chargé ici
+            "face_detection": f"OpenCV {os.getenv('FACE_DETECTOR', 'yunet').lower()} (image réduite)",
+            "human_confirmation": "CLIP semantic analysis",
+            "min_face_size": "5% of image area",
+            "min_image_size": "50x50 pixels"
+        },
+        "upload_constraints": {
+            "max_dimension": UPLOAD_MAX_DIMENSION,
+            "jpeg_quality": UPLOAD_JPEG_QUALITY,
+            "max_file_size_mb": 15
+        },
+        "analysis_modes": {
+            "available": list(ANALYSIS_MODES),
+            "default": "full",
+            # Charge courante : GET /api/metrics
+            "max_full_in_flight": analysis_load.MAX_FULL_IN_FLIGHT
+        }
+    })
+}
+
 @app.get("/", response_model=HealthResponse)
-def read_root():
+async def read_root(if_none_match: Optional[str] = Header(default=None)):
     """Page d'accueil de l'API SkinCare AI"""
-    return HealthResponse(
-        status="operational",
-        services=["skincare_analysis_memory", "skin_recommendations", "no_storage"],
-        version="2.0.0"
-    )
+    return STATIC_CATALOGS["root"].response(if_none_match)
 
 @app.get("/health", response_model=HealthResponse)
-def health_check():
+async def health_check(if_none_match: Optional[str] = Header(default=None)):
     """Endpoint de vérification de santé"""
-    return HealthResponse(
-        status="healthy",
-        services=["skincare-ai-memory"]
-    )
+    return STATIC_CATALOGS["health"].response(if_none_match)
 
-@app.post("/api/analyze", response_model=SkincareAnalysisResponse)
-async def analyze_skin(file: UploadFile = File(...)):
-    """
-    🔍 Analyse une photo de peau directement en mémoire (sans stockage)
+@app.get("/api/metrics")
+def get_runtime_metrics():
+    """📈 Charge courante : analyses en cours, politique de threads CPU, file des jobs"""
+    return {
+        "analysis_load": analysis_load.stats(),
+        "threading": threading_policy.stats(),
+        "validation_tickets": validation_tickets.stats(),
+        "buffer_pool": buffer_pool.stats(),
+        "jobs": {"pending": job_store.queue.qsize() if job_store.queue is not None else 0}
+    }
 
-    Upload une photo de ton visage et reçois :
-    - Type de peau détecté (grasse, sèche, mixte, etc.)
-    - Problèmes identifiés (acné, rides, taches, etc.)
-    - Routine skincare personnalisée
-    - Produits et ingrédients recommandés
+@app.get("/api/startup")
+def get_startup_timings():
+    """⏱️ Temps d'import et de démarrage du processus, état du chargement du modèle"""
+    return {**startup_timings, "model_loaded": is_clip_loaded(), "clip_backend": os.getenv("CLIP_BACKEND", "local")}
 
-    ✨ Avantages: Pas de stockage, traitement immédiat, confidentialité maximale
+async def read_analysis_upload(file: UploadFile) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Vérifie l'upload (type, taille, en-tête d'image) et retourne (octets, dimensions)
+
+    Seul l'en-tête est lu ici : le décodage complet (coûteux, plusieurs centaines de Mo
+    pour une photo de téléphone) se fait dans le thread d'analyse avec decode_upload.
     """
 
     # Validation du fichier
@@ -84,67 +173,288 @@ async def analyze_skin(file: UploadFile = File(...)):
             detail="❌ Image trop petite ou corrompue"
         )
 
+    logger.debug("✅ Image reçue en mémoire: %s (%.1fKB)", file.filename, file_size / 1024)
+
+    # 🖼️ En-tête uniquement (format et dimensions), sans décoder les pixels
     try:
-        # Génération ID unique pour cette analyse
-        analysis_id = str(uuid.uuid4())
+        with Image.open(io.BytesIO(content)) as probe:
+            image_size = probe.size
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"❌ Image corrompue ou format non supporté: {str(e)}"
+        )
+
+    return content, image_size
+
+def decode_upload(content: bytes) -> Image.Image:
+    """Décode un upload en image PIL RGB (dans le thread d'analyse)"""
+    try:
+        pil_image = Image.open(io.BytesIO(content)).convert('RGB')
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"❌ Image corrompue ou format non supporté: {str(e)}"
+        )
+    logger.debug("📸 Image convertie: %s pixels", pil_image.size)
+    return pil_image
+
+def _raise_if_invalid(validation_result: dict):
+    """HTTPException 400 si l'image ne contient pas de visage humain valide"""
+    if not validation_result["is_valid"]:
+        logger.warning(f"❌ Image rejetée: {validation_result['reason']}")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": validation_result["reason"],
+                "suggestion": validation_result["suggestion"],
+                "type": "face_validation_failed",
+                "details": validation_result["details"]
+            }
+        )
+
+async def run_skincare_pipeline(
+    image: Union[Image.Image, bytes, None],
+    analysis_id: str,
+    history_id: Optional[str] = None,
+    mode: str = "full",
+    allow_downgrade: bool = True,
+    validated: Optional[dict] = None,
+    profile: bool = False
+):
+    """
+    Pipeline d'analyse dans le mode demandé ("full" peut être servi en "fast" en cas de surcharge)
+
+    image : image PIL ou octets de l'upload (décodés dans le thread d'analyse).
+    Lève une HTTPException 400 si l'image ne contient pas de visage humain valide.
+    Avec history_id, l'embedding et les scores (jamais la photo) sont ajoutés à l'historique.
+    Avec validated (données d'un ticket de validation), image est ignorée et la
+    validation n'est pas refaite. Avec profile, l'analyse est profilée (dans son thread).
+
+    L'admission (comptage de charge, choix du mode) a lieu sur la boucle ; le pipeline
+    lui-même s'exécute dans le pool de threads d'analyse.
+    """
+    with analysis_load.acquire(mode, allow_downgrade) as (mode, downgraded):
+        async def pipeline():
+            pil_image = decode_upload(image) if isinstance(image, bytes) else image
+            if mode == "fast":
+                return await run_fast_pipeline(pil_image, analysis_id, downgraded, validated, history_id)
+            return await run_full_pipeline(pil_image, analysis_id, history_id, validated)
+
+        if profile:
+            return await analysis_load.run(lambda: _profiled_pipeline(analysis_id, pipeline))
+        return await analysis_load.run(pipeline)
+
+async def _profiled_pipeline(analysis_id: str, pipeline):
+    with request_profiler.profile(analysis_id):
+        return await pipeline()
+
+async def run_fast_pipeline(
+    pil_image: Image.Image,
+    analysis_id: str,
+    downgraded: bool = False,
+    validated: Optional[dict] = None,
+    history_id: Optional[str] = None
+) -> FastAnalysisResponse:
+    """
+    Analyse rapide : un seul embedding de l'image entière, partagé par la validation
+    CLIP, le type de peau et les problèmes (ni recadrage, ni filtrage, ni recommandations)
+
+    Jamais ajoutée à l'historique : l'embedding de l'image entière n'est pas comparable
+    à celui du visage recadré des analyses complètes (history_skipped_reason="fast_mode").
+    """
+    logger.debug("⚡ Analyse rapide...")
+    if validated is None:
+        validation_result = await validate_face_for_skincare(pil_image, return_embeds=True)
+        _raise_if_invalid(validation_result)
+        image_embeds = validation_result.pop("image_embeds")
+        face_confidence = validation_result["details"]["clip_validation"]["confidence"]
+    else:
+        image_embeds, face_confidence = validated["image_embeds"], validated["face_confidence"]
+
+    skin_analysis = await analyze_skincare_fast(image_embeds, analysis_id)
+    logger.debug("✅ Analyse rapide terminée")
+
+    return FastAnalysisResponse(
+        id=analysis_id,
+        downgraded=downgraded,
+        face_confidence=face_confidence,
+        skin_type=skin_analysis.get("skin_type", {}),
+        problems_detected=skin_analysis.get("problems_detected", []),
+        confidence_note=skin_analysis.get("confidence_note", ""),
+        history_recorded=False if history_id else None,
+        history_skipped_reason="fast_mode" if history_id else None
+    )
 
-        logger.info(f"✅ Image reçue en mémoire: {file.filename} ({file_size/1024:.1f}KB)")
-
-        # 🖼️ Conversion en objet PIL directement depuis les bytes
-        try:
-            image_stream = io.BytesIO(content)
-            pil_image = Image.open(image_stream).convert('RGB')
-            logger.info(f"📸 Image convertie: {pil_image.size} pixels")
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"❌ Image corrompue ou format non supporté: {str(e)}"
-            )
-
-        # 🔍 ÉTAPE 1: Validation que c'est bien un visage humain
-        logger.info("🔍 Validation du visage humain...")
+async def run_full_pipeline(
+    pil_image: Image.Image,
+    analysis_id: str,
+    history_id: Optional[str] = None,
+    validated: Optional[dict] = None
+) -> SkincareAnalysisResponse:
+    """Pipeline complet : validation du visage, analyse CLIP et recommandations"""
+    # 🔍 ÉTAPE 1: Validation que c'est bien un visage humain (déjà faite si ticket)
+    if validated is None:
+        logger.debug("🔍 Validation du visage humain...")
         validation_result = await validate_face_for_skincare(pil_image)
+        _raise_if_invalid(validation_result)
+        face_confidence = validation_result["details"]["clip_validation"].get("confidence", 0.0)
+    else:
+        face_confidence = validated["face_confidence"]
 
-        if not validation_result["is_valid"]:
-            logger.warning(f"❌ Image rejetée: {validation_result['reason']}")
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": validation_result["reason"],
-                    "suggestion": validation_result["suggestion"],
-                    "type": "face_validation_failed",
-                    "details": validation_result["details"]
-                }
-            )
-
-        logger.info("✅ Visage humain validé, analyse skincare autorisée")
-
-        # 🔍 ÉTAPE 2: Analyse avec CLIP (maintenant qu'on sait que c'est un visage)
-        logger.info("🔍 Début de l'analyse de peau avec CLIP (visage validé)...")
+    logger.debug("✅ Visage humain validé, analyse skincare autorisée")
+
+    # 🔍 ÉTAPE 2: Analyse avec CLIP (maintenant qu'on sait que c'est un visage)
+    logger.debug("🔍 Début de l'analyse de peau avec CLIP (visage validé)...")
+    analysis_start = time.perf_counter()
+    if validated is None:
         skin_analysis = await analyze_skincare_from_memory(pil_image, analysis_id)
-        logger.info("✅ Analyse de peau terminée")
-
-        # 💡 Génération des recommandations
-        logger.info("💡 Génération des recommandations skincare...")
-        recommendations = await generate_skincare_recommendations(skin_analysis)
-        logger.info("✅ Recommandations générées")
-
-        # 📋 Construction de la réponse
-        response = SkincareAnalysisResponse(
-            id=analysis_id,
-            skin_type=skin_analysis.get("skin_type", {}),
-            problems_detected=skin_analysis.get("problems_detected", []),
-            skin_condition=skin_analysis.get("skin_condition", {}),
-            recommendations=recommendations,
-            confidence_note=skin_analysis.get("confidence_note", "")
-        )
+    else:
+        skin_analysis = await analyze_skincare_from_memory(validated["face_crop"], analysis_id, preprocessed=True)
+    analysis_seconds = time.perf_counter() - analysis_start
+    logger.debug("✅ Analyse de peau terminée")
+
+    # 📚 Historique opt-in : embedding + scores uniquement
+    history_recorded, history_skipped_reason = record_history(history_id, analysis_id, skin_analysis)
+
+    # 💡 Génération des recommandations
+    logger.debug("💡 Génération des recommandations skincare...")
+    recommendations = await generate_skincare_recommendations(skin_analysis)
+    logger.debug("✅ Recommandations générées")
+
+    # 📋 Construction de la réponse
+    response = SkincareAnalysisResponse(
+        id=analysis_id,
+        skin_type=skin_analysis.get("skin_type", {}),
+        problems_detected=skin_analysis.get("problems_detected", []),
+        skin_condition=skin_analysis.get("skin_condition", {}),
+        recommendations=recommendations,
+        confidence_note=skin_analysis.get("confidence_note", ""),
+        detailed_scores={
+            "problems": skin_analysis.get("problem_scores", {}),
+            "face_validation": face_confidence
+        },
+        history_recorded=history_recorded,
+        history_skipped_reason=history_skipped_reason
+    )
+
+    # 🕶️ Évaluation shadow échantillonnée : soumise une fois la réponse de production construite,
+    # exécutée en arrière-plan (pas avec un ticket : le candidat a besoin de l'image entière, non conservée)
+    if validated is None:
+        shadow_evaluator.maybe_submit(pil_image, analysis_id, skin_analysis, analysis_seconds)
+
+    return response
+
+def record_history(history_id: Optional[str], analysis_id: str, skin_analysis: dict) -> Tuple[Optional[bool], Optional[str]]:
+    """Ajoute l'analyse à l'historique : (history_recorded, history_skipped_reason), (None, None) sans history_id"""
+    if not history_id:
+        return None, None
+    if not skincare_history.enabled:
+        return False, "history_disabled"
+    if not skincare_history.is_valid_id(history_id):
+        return False, "invalid_history_id"
+    try:
+        # Déjà dans un thread d'analyse : appel direct
+        if skincare_history.record(history_id, analysis_id, skin_analysis):
+            return True, None
+        return False, "no_embedding"
+    except Exception as e:
+        logger.warning(f"⚠️ Historique non enregistré: {str(e)}")
+        return False, "record_failed"
+
+def summarize_analysis(summary: dict, response):
+    """Champs du record de synthèse d'une analyse réussie"""
+    summary["mode"] = response.mode
+    summary["skin_type"] = response.skin_type.category
+    summary["problems"] = [p.condition for p in response.problems_detected]
+    if isinstance(response, FastAnalysisResponse):
+        summary["downgraded"] = response.downgraded
+    else:
+        summary["severity"] = response.recommendations.severity
+
+@app.post("/api/analyze", response_model=Union[SkincareAnalysisResponse, FastAnalysisResponse])
+async def analyze_skin(
+    file: Optional[UploadFile] = File(default=None),
+    ticket: Optional[str] = Form(default=None),
+    original_width: Optional[int] = Form(default=None),
+    original_height: Optional[int] = Form(default=None),
+    history_id: Optional[str] = Form(default=None),
+    mode: str = Form(default="full"),
+    allow_downgrade: bool = Form(default=True),
+    verbose: bool = True,
+    fields: Optional[str] = None,
+    x_profile_token: Optional[str] = Header(default=None)
+):
+    """
+    🔍 Analyse une photo de peau directement en mémoire (sans stockage)
 
-        # 🧹 Nettoyage automatique de la mémoire
-        del content, image_stream, pil_image
+    Upload une photo de ton visage et reçois :
+    - Type de peau détecté (grasse, sèche, mixte, etc.)
+    - Problèmes identifiés (acné, rides, taches, etc.)
+    - Routine skincare personnalisée
+    - Produits et ingrédients recommandés
 
-        logger.info(f"🎉 Analyse skincare terminée avec succès pour {analysis_id} (aucun fichier stocké)")
+    ✨ Avantages: Pas de stockage, traitement immédiat, confidentialité maximale
+
+    🔬 Avec l'en-tête X-Profile-Token, la requête est profilée (cProfile + torch) ;
+    le profil est consultable via GET /api/profiles/{id}.
+
+    📚 Avec history_id (identifiant pseudonyme généré par le client), l'analyse est
+    ajoutée à l'historique de suivi ; aucune photo n'est conservée. history_recorded
+    indique si elle l'a été (jamais en mode rapide, voir history_skipped_reason).
+
+    ⚡ mode=fast : validation, type de peau et principaux problèmes en une seule passe ;
+    mode=full (défaut) : sortie complète avec scores détaillés. En cas de surcharge,
+    une analyse complète peut être servie en mode rapide (désactivable avec allow_downgrade=false).
+    L'en-tête X-Analysis-Mode indique le mode effectif.
 
-        return response
+    📦 ?verbose=false retire les scores détaillés (all_scores, detailed_scores) ;
+    ?fields=id,skin_type.category,problems_detected ne renvoie que les champs demandés.
+
+    🎫 ticket (obtenu via POST /api/validate-face?ticket=true) remplace l'upload : ni
+    nouvel envoi de la photo, ni nouvelle validation. Usage unique, durée de vie courte.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"❌ Mode inconnu: {mode} (fast ou full)")
+    if (file is None) == (ticket is None):
+        raise HTTPException(status_code=400, detail="❌ Envoyez soit une image (file), soit un ticket de validation")
+
+    try:
+        # Génération ID unique pour cette analyse
+        analysis_id = str(uuid.uuid4())
+        headers = {}
+
+        with request_log_context(analysis_id, logger) as summary:
+            if ticket is not None:
+                validated = validation_tickets.redeem(ticket)
+                if validated is None:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="❌ Ticket de validation inconnu, déjà utilisé ou expiré : renvoyez l'image"
+                    )
+                content = None
+                summary["image_size"] = validated["image_size"]
+                summary["ticket"] = True
+            else:
+                validated = None
+                content, summary["image_size"] = await read_analysis_upload(file)
+            if original_width and original_height:
+                summary["original_size"] = (original_width, original_height)
+
+            profile = request_profiler.should_profile(x_profile_token)
+            response = await run_skincare_pipeline(content, analysis_id, history_id, mode, allow_downgrade, validated, profile)
+            # Pas de profil si un autre était déjà en cours
+            if profile and request_profiler.get(analysis_id) is not None:
+                headers["X-Profile-Id"] = analysis_id
+                summary["profiled"] = True
+
+            # 🧹 Nettoyage automatique de la mémoire
+            del content, validated
+
+            summarize_analysis(summary, response)
+
+        headers["X-Analysis-Mode"] = response.mode
+        return JSONResponse(shape_analysis(response, verbose, fields), headers=headers)
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -156,8 +466,98 @@ async def analyze_skin(file: UploadFile = File(...)):
             detail=f"❌ Erreur lors de l'analyse: {str(e)}"
         )
 
+async def _run_analysis_job(job_id: str, content: bytes) -> dict:
+    """Handler des workers de jobs : même pipeline que /api/analyze (toujours en mode complet)"""
+    with request_log_context(job_id, logger, event="analysis_job") as summary:
+        response = await run_skincare_pipeline(content, job_id, allow_downgrade=False)
+        summarize_analysis(summary, response)
+    return response.model_dump()
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Pas plus de workers de jobs que de threads d'analyse : les requêtes interactives gardent leur place
+    job_store.WORKERS = min(job_store.WORKERS, analysis_load.WORKERS)
+    job_store.start(_run_analysis_job)
+
+@app.on_event("startup")
+async def report_startup():
+    startup_timings["app_ready_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
+    logger.info(f"🚀 API prête en {startup_timings['app_ready_seconds']}s", extra={"event": "startup", **startup_timings})
+
+    # Préchargement optionnel du modèle en arrière-plan : /health répond immédiatement
+    if os.getenv("PRELOAD_MODEL", "false").lower() == "true":
+        threading.Thread(target=get_clip_backend, name="clip-preload", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_store.stop()
+
+@app.on_event("shutdown")
+async def close_clip():
+    # Backend distant : connexion et segment /dev/shm
+    close_clip_backend()
+
+@app.post("/api/jobs", status_code=202)
+async def create_analysis_job(file: UploadFile = File(...)):
+    """
+    ⏳ Lance une analyse en arrière-plan et retourne immédiatement un job_id
+
+    Le résultat se récupère ensuite via :
+    - GET /api/jobs/{job_id}?wait=30 (long-polling)
+    - GET /api/jobs/{job_id}/events (Server-Sent Events)
+
+    Les jobs restent uniquement en mémoire et expirent après 10 minutes.
+    """
+    # Octets encodés en file (quelques Mo), décodés seulement quand un worker prend le job
+    content, _ = await read_analysis_upload(file)
+
+    job = job_store.submit(content)
+    if job is None:
+        raise HTTPException(
+            status_code=503,
+            detail="❌ Trop d'analyses en attente, veuillez réessayer dans quelques instants"
+        )
+
+    logger.info(f"⏳ Job d'analyse {job['id']} mis en file")
+    return job_store.to_public(job)
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str, wait: float = 0.0, verbose: bool = True, fields: Optional[str] = None):
+    """📋 État d'un job ; wait (secondes, max 60) attend la fin du job avant de répondre"""
+    job = await job_store.wait(job_id, timeout=min(max(wait, 0.0), 60.0))
+    if job is None:
+        raise HTTPException(status_code=404, detail="❌ Job introuvable ou expiré")
+    public = job_store.to_public(job)
+    if public.get("result") is not None:
+        public["result"] = shape_analysis(public["result"], verbose, fields)
+    return public
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str):
+    """📡 Flux Server-Sent Events : un événement à chaque changement d'état du job"""
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="❌ Job introuvable ou expiré")
+
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await job_store.wait(job_id, timeout=1.0)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"Job expiré\"}\n\n"
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(job_store.to_public(job))}\n\n"
+            else:
+                # Keep-alive pour les proxys
+                yield ": ping\n\n"
+            if job["status"] in ("done", "failed"):
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/api/validate-face")
-async def validate_face_only(file: UploadFile = File(...)):
+async def validate_face_only(file: UploadFile = File(...), verbose: bool = True, ticket: bool = False):
     """
     🔍 Valide uniquement si l'image contient un visage humain (sans analyse complète)
 
@@ -165,6 +565,12 @@ async def validate_face_only(file: UploadFile = File(...)):
     - is_valid: true/false
     - reason: explication du résultat
     - suggestion: conseil pour améliorer la photo
+
+    ?verbose=false : sans les boîtes OpenCV ni les scores de chaque prompt CLIP
+
+    ?ticket=true : si l'image est valide, retourne aussi un ticket à passer à
+    POST /api/analyze à la place de l'image (visage recadré, boîtes et embedding
+    gardés en mémoire quelques minutes, jamais la photo entière)
     """
 
     # Validation du fichier
@@ -184,23 +590,43 @@ async def validate_face_only(file: UploadFile = File(...)):
             detail="❌ Image trop volumineuse. Taille maximale: 10MB"
         )
 
-    try:
-        # Conversion en PIL
-        image_stream = io.BytesIO(content)
-        pil_image = Image.open(image_stream).convert('RGB')
+    async def validate() -> dict:
+        # Dans le thread d'analyse : décodage, OpenCV, CLIP et recadrage
+        pil_image = Image.open(io.BytesIO(content)).convert('RGB')
 
         # Validation uniquement
-        validation_result = await validate_face_for_skincare(pil_image)
-
-        # Nettoyage mémoire
-        del content, image_stream, pil_image
+        validation_result = await validate_face_for_skincare(pil_image, return_embeds=ticket)
 
-        return {
+        result = {
             "file_name": file.filename,
-            "file_size_kb": round(file_size/1024, 1),
-            "validation": validation_result
+            "file_size_kb": round(file_size/1024, 1)
         }
 
+        # 🎫 Ticket : le recadrage du visage est fait ici, une seule fois, avec les boîtes déjà détectées
+        if ticket:
+            # Absent quand l'image est rejetée avant CLIP (trop petite, qualité insuffisante)
+            image_embeds = validation_result.pop("image_embeds", None)
+            if validation_result["is_valid"] and image_embeds is not None:
+                details = validation_result["details"]
+                face_boxes = [face["position"] for face in details["opencv_detection"]["faces_info"]]
+                face_crop = skincare_analyzer.preprocess_pil_image(pil_image, "ticket", face_boxes)
+                result["ticket"] = validation_tickets.issue(
+                    face_crop,
+                    face_boxes,
+                    image_embeds,
+                    details["clip_validation"]["confidence"],
+                    pil_image.size
+                )
+                result["ticket_expires_in"] = validation_tickets.TTL
+
+        result["validation"] = shape_validation(validation_result, verbose)
+        return result
+
+    try:
+        # Compté dans la charge (bascule en mode rapide, politique de threads) comme une analyse
+        with analysis_load.acquire("fast", allow_downgrade=False):
+            return await analysis_load.run(validate)
+
     except Exception as e:
         logger.error(f"❌ Erreur lors de la validation: {str(e)}")
         raise HTTPException(
@@ -208,58 +634,173 @@ async def validate_face_only(file: UploadFile = File(...)):
             detail=f"❌ Erreur lors de la validation: {str(e)}"
         )
 
+@app.websocket("/ws/live")
+async def live_camera(websocket: WebSocket):
+    """
+    🎥 Mode caméra en direct
+
+    Le client envoie les frames de la caméra (JPEG/PNG en binaire) et reçoit
+    pour chacune un conseil instantané ("rapprochez-vous", "centrez votre visage"...).
+    Le visage est suivi d'une frame à l'autre ; seule la dernière frame reçue est
+    traitée quand le serveur prend du retard. Dès qu'une frame est stable et bien
+    cadrée, l'analyse complète est lancée une seule fois puis la connexion est fermée.
+    """
+    await websocket.accept()
+    tracker = LiveFaceTracker()
+    latest = {"frame": None, "skipped": 0}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if not data or len(data) > 2 * 1024 * 1024:
+                continue
+            # Le serveur est en retard : on écrase la frame non traitée
+            if latest["frame"] is not None:
+                latest["skipped"] += 1
+            latest["frame"] = data
+            frame_ready.set()
+
+    def decode_and_track(data: bytes):
+        frame = Image.open(io.BytesIO(data)).convert('RGB')
+        return frame, tracker.process_frame(frame)
+
+    receiver = asyncio.create_task(receive_frames())
+    processing_ms = 0.0
+
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                break
+
+            data, latest["frame"] = latest["frame"], None
+            skipped, latest["skipped"] = latest["skipped"], 0
+            frame_ready.clear()
+
+            start = time.perf_counter()
+            try:
+                frame, feedback = await run_in_threadpool(decode_and_track, data)
+            except Exception:
+                await websocket.send_json({"type": "error", "message": "Frame illisible"})
+                continue
+            processing_ms = 0.8 * processing_ms + 0.2 * (time.perf_counter() - start) * 1000
+
+            await websocket.send_json({
+                "type": "feedback",
+                **feedback,
+                "frames_skipped": skipped,
+                # Le client peut espacer ses envois pour suivre le rythme du serveur
+                "next_frame_delay_ms": round(processing_ms)
+            })
+
+            if not feedback["ready"]:
+                continue
+
+            # 🔍 Frame de bonne qualité : analyse complète
+            analysis_id = str(uuid.uuid4())
+            try:
+                with request_log_context(analysis_id, logger, event="live_analysis") as summary:
+                    response = await run_skincare_pipeline(frame, analysis_id)
+                    summarize_analysis(summary, response)
+            except HTTPException as e:
+                tracker.reset()
+                detail = e.detail if isinstance(e.detail, dict) else {"error": e.detail}
+                await websocket.send_json({
+                    "type": "rejected",
+                    "message": detail.get("error"),
+                    "suggestion": detail.get("suggestion")
+                })
+                continue
+
+            await websocket.send_json({"type": "analysis", "result": response.model_dump()})
+            await websocket.close()
+            break
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+# L'identifiant d'historique est le seul secret d'accès : en-tête X-History-Id, jamais dans l'URL
+# (journaux d'accès, historique du navigateur, Referer)
+def _require_history(history_id: Optional[str]) -> str:
+    if not skincare_history.enabled:
+        raise HTTPException(status_code=404, detail="❌ Historique désactivé sur ce serveur")
+    if not skincare_history.is_valid_id(history_id):
+        raise HTTPException(status_code=400, detail="❌ En-tête X-History-Id absent ou invalide (16 à 64 caractères)")
+    return history_id
+
+@app.get("/api/history", response_model=SkincareHistory)
+def get_skincare_history(x_history_id: Optional[str] = Header(default=None)):
+    """📚 Analyses passées (scores uniquement) et évolution de la peau"""
+    history_id = _require_history(x_history_id)
+    history = skincare_history.get_history(history_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="❌ Aucun historique pour cet identifiant")
+    return history
+
+@app.get("/api/history/progress")
+def get_skincare_progress(label: str, x_history_id: Optional[str] = Header(default=None)):
+    """📈 Évolution d'un score (ex: label=acné, label=peau grasse) sans retraiter d'image"""
+    history_id = _require_history(x_history_id)
+    try:
+        progress = skincare_history.get_progress(history_id, label)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"❌ Score inconnu: {label}")
+    if progress is None:
+        raise HTTPException(status_code=404, detail="❌ Aucun historique pour cet identifiant")
+    return progress
+
+@app.delete("/api/history")
+def delete_skincare_history(x_history_id: Optional[str] = Header(default=None)):
+    """🗑️ Supprime tout l'historique associé à cet identifiant"""
+    history_id = _require_history(x_history_id)
+    return {"deleted": skincare_history.delete(history_id)}
+
+@app.get("/api/profiles")
+def list_profiles(x_profile_token: Optional[str] = Header(default=None)):
+    """🔬 Liste des profils d'analyse gardés en mémoire (en-tête X-Profile-Token requis)"""
+    if not request_profiler.is_authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="❌ Accès au profilage refusé")
+    return {"profiles": request_profiler.list()}
+
+@app.get("/api/profiles/{analysis_id}")
+def get_profile(analysis_id: str, x_profile_token: Optional[str] = Header(default=None)):
+    """🔬 Profil cProfile et torch d'une analyse (en-tête X-Profile-Token requis)"""
+    if not request_profiler.is_authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="❌ Accès au profilage refusé")
+    profile = request_profiler.get(analysis_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="❌ Profil introuvable ou expiré")
+    return profile
+
+@app.get("/api/shadow")
+def get_shadow_metrics(x_profile_token: Optional[str] = Header(default=None)):
+    """🕶️ Accord et latence du pipeline candidat shadow (en-tête X-Profile-Token requis)"""
+    if not request_profiler.is_authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="❌ Accès aux métriques shadow refusé")
+    return shadow_evaluator.metrics()
+
 @app.get("/api/skin-types")
-def get_skin_types():
+async def get_skin_types(if_none_match: Optional[str] = Header(default=None)):
     """📋 Liste des types de peau détectables"""
-    return {
-        "skin_types": [
-            {"type": "peau grasse", "description": "Production excessive de sébum"},
-            {"type": "peau sèche", "description": "Manque d'hydratation et de sébum"},
-            {"type": "peau mixte", "description": "Zone T grasse, joues normales/sèches"},
-            {"type": "peau normale", "description": "Équilibre optimal eau/sébum"},
-            {"type": "peau sensible", "description": "Réactivité aux produits et environnement"}
-        ]
-    }
+    return STATIC_CATALOGS["skin_types"].response(if_none_match)
 
 @app.get("/api/skin-problems")
-def get_detectable_problems():
+async def get_detectable_problems(if_none_match: Optional[str] = Header(default=None)):
     """🔍 Liste des problèmes de peau détectables"""
-    return {
-        "problems": [
-            {"problem": "acné", "severity": "medium", "treatable": True},
-            {"problem": "points noirs", "severity": "low", "treatable": True},
-            {"problem": "rides", "severity": "low", "treatable": True},
-            {"problem": "taches brunes", "severity": "medium", "treatable": True},
-            {"problem": "rougeurs", "severity": "medium", "treatable": True},
-            {"problem": "pores dilatés", "severity": "low", "treatable": True},
-            {"problem": "cernes", "severity": "low", "treatable": True}
-        ]
-    }
+    return STATIC_CATALOGS["skin_problems"].response(if_none_match)
 
 @app.get("/api/features")
-def get_app_features():
+async def get_app_features(if_none_match: Optional[str] = Header(default=None)):
     """✨ Fonctionnalités de l'application SkinCare AI"""
-    return {
-        "storage_type": "in_memory_only",
-        "face_validation": "enabled",
-        "ai_models": ["CLIP-ViT-B/32", "OpenCV-HaarCascade"],
-        "privacy_level": "maximum",
-        "features": [
-            "Validation automatique de visage humain",
-            "Détection OpenCV + validation CLIP",
-            "Aucun fichier stocké sur le serveur",
-            "Traitement 100% en mémoire",
-            "Rejet automatique des non-visages",
-            "Messages d'erreur explicites",
-            "Suggestions d'amélioration photo"
-        ],
-        "validation_criteria": {
-            "face_detection": "OpenCV HaarCascade",
-            "human_confirmation": "CLIP semantic analysis",
-            "min_face_size": "5% of image area",
-            "min_image_size": "50x50 pixels"
-        }
-    }
+    return STATIC_CATALOGS["features"].response(if_none_match)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -272,7 +813,7 @@ async def http_exception_handler(request, exc):
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Gestionnaire d'exceptions général"""
-    logger.error(f"❌ Erreur non gérée: {str(e)}")
+    logger.error(f"❌ Erreur non gérée: {str(exc)}")
     return JSONResponse(
         status_code=500,
         content={
@@ -37,6 +37,22 @@ class SkincareAnalysisResponse(BaseModel):
     skin_condition: SkinClassification = Field(description="État général actuel de la peau")
     recommendations: SkincareRecommendation = Field(description="Recommandations personnalisées complètes")
     confidence_note: str = Field(description="Note sur la fiabilité de l'analyse IA")
+    mode: str = Field(default="full", description="Mode d'analyse effectif")
+    detailed_scores: Optional[Dict[str, Any]] = Field(default=None, description="Scores détaillés (tous les problèmes, validation du visage)")
+    history_recorded: Optional[bool] = Field(default=None, description="Avec history_id : analyse ajoutée à l'historique de suivi")
+    history_skipped_reason: Optional[str] = Field(default=None, description="Raison pour laquelle l'analyse n'a pas été ajoutée à l'historique")
+
+class FastAnalysisResponse(BaseModel):
+    """Réponse d'analyse rapide : validation, type de peau et principaux problèmes"""
+    id: str = Field(description="Identifiant unique de l'analyse")
+    mode: str = Field(default="fast", description="Mode d'analyse effectif")
+    downgraded: bool = Field(default=False, description="Analyse complète demandée mais servie en mode rapide (surcharge)")
+    face_confidence: float = Field(description="Confiance de la validation du visage", ge=0.0, le=1.0)
+    skin_type: SkinClassification = Field(description="Type de peau principal détecté")
+    problems_detected: List[SkinProblem] = Field(description="Principaux problèmes de peau identifiés")
+    confidence_note: str = Field(description="Note sur la fiabilité de l'analyse IA")
+    history_recorded: Optional[bool] = Field(default=None, description="Avec history_id : analyse ajoutée à l'historique de suivi")
+    history_skipped_reason: Optional[str] = Field(default=None, description="Raison pour laquelle l'analyse n'a pas été ajoutée à l'historique")
 
 # ==========================================
 # SCHÉMAS UTILITAIRES
@@ -91,8 +107,15 @@ class DetailedAnalysisResponse(SkincareAnalysisResponse):
     metadata: Optional[ImageMetadata] = Field(default=None, description="Métadonnées de traitement")
     processing_timestamp: datetime = Field(default_factory=datetime.now, description="Horodatage du traitement")
 
+class HistoryEntry(BaseModel):
+    """Analyse conservée dans l'historique (scores uniquement, jamais la photo)"""
+    id: str = Field(description="Identifiant de l'analyse")
+    timestamp: datetime = Field(description="Date de l'analyse")
+    skin_type: str = Field(description="Type de peau détecté")
+    problem_scores: Dict[str, float] = Field(default={}, description="Probabilité de chaque problème")
+
 class SkincareHistory(BaseModel):
     """Historique d'analyses pour suivi dans le temps"""
     user_id: Optional[str] = Field(default=None, description="ID utilisateur (optionnel)")
-    analyses: List[SkincareAnalysisResponse] = Field(description="Liste des analyses chronologiques")
+    analyses: List[HistoryEntry] = Field(description="Liste des analyses chronologiques")
     skin_evolution: Optional[Dict[str, Any]] = Field(default=None, description="Évolution détectée")
\ No newline at end of file
@@ -0,0 +1,107 @@
+# services/analysis_modes.py - Modes d'analyse (rapide / complète) et bascule automatique en cas de surcharge
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+
+from services.threading_policy import threading_policy
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODES = ("fast", "full")
+
+# Premier import de cv2 : distinct du verrou de comptage pris à chaque admission
+_import_lock = threading.Lock()
+
+
+class AnalysisLoad:
+    """
+    Compte les analyses en cours et choisit le mode effectif de chaque requête.
+
+    - fast : validation, type de peau et principaux problèmes à partir d'un seul
+      embedding de l'image, sans recadrage ni filtrage
+    - full : sortie complète (état de la peau, recommandations, scores détaillés)
+
+    Au-delà de MAX_FULL_IN_FLIGHT analyses simultanées, les requêtes "full" qui
+    l'autorisent sont servies en mode "fast". Une analyse compte dès son admission
+    (sur la boucle) et jusqu'à sa fin, y compris l'attente d'un thread libre.
+
+    Le pipeline (CPU, sans point d'attente) s'exécute dans un pool de WORKERS
+    threads, chacun avec sa propre boucle asyncio : la boucle du serveur reste
+    libre pour le long-polling, les SSE, /health et l'admission des requêtes.
+    """
+
+    def __init__(self, max_full_in_flight: int = None, workers: int = None):
+        self.MAX_FULL_IN_FLIGHT = max_full_in_flight or int(os.getenv("ANALYSIS_MAX_FULL_IN_FLIGHT", "4"))
+        self.WORKERS = workers or int(os.getenv("ANALYSIS_WORKERS", str(max(2, threading_policy.cpu_limit["cpus"]))))
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.downgraded_total = 0
+        self.executor = None
+        self.thread_state = threading.local()
+
+    @contextmanager
+    def acquire(self, requested_mode: str = "full", allow_downgrade: bool = True):
+        """Réserve une place et retourne (mode effectif, downgraded) pour la durée de l'analyse"""
+        with self.lock:
+            mode, downgraded = requested_mode, False
+            if mode == "full" and allow_downgrade and self.in_flight >= self.MAX_FULL_IN_FLIGHT:
+                mode, downgraded = "fast", True
+                self.downgraded_total += 1
+            self.in_flight += 1
+            in_flight = self.in_flight
+
+        # Threads torch/OpenCV : tous les CPU au repos, un par analyse sous charge (appliqué dans le thread d'analyse)
+        threading_policy.adjust(in_flight)
+
+        if downgraded:
+            logger.warning(f"⚡ Surcharge ({in_flight} analyses en cours) : analyse servie en mode rapide")
+
+        try:
+            yield mode, downgraded
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _init_thread(self):
+        # Le chargement de cv2 remplace le module en cours d'import : pas de premier import simultané
+        with _import_lock:
+            import cv2  # noqa: F401
+        threading_policy.apply()
+
+    def _run_in_thread(self, pipeline: Callable[[], Awaitable]):
+        # Nombre de threads OpenMP propre à chaque thread : politique appliquée ici, pas sur la boucle
+        threading_policy.apply()
+        # Une boucle par thread d'analyse, réutilisée d'une analyse à l'autre
+        loop = getattr(self.thread_state, "loop", None)
+        if loop is None:
+            loop = self.thread_state.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(pipeline())
+
+    async def run(self, pipeline: Callable[[], Awaitable]):
+        """Exécute la coroutine pipeline() dans le pool de threads d'analyse et attend son résultat"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.WORKERS, thread_name_prefix="analysis", initializer=self._init_thread
+                )
+        # Le contexte (logs par requête) suit l'analyse dans son thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, self._run_in_thread, pipeline)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.WORKERS,
+            "in_flight": self.in_flight,
+            "max_full_in_flight": self.MAX_FULL_IN_FLIGHT,
+            "downgraded_total": self.downgraded_total
+        }
+
+
+# Instance globale
+analysis_load = AnalysisLoad()
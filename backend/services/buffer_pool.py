@@ -0,0 +1,81 @@
+# services/buffer_pool.py - Buffers préalloués pour les étapes à taille fixe (recadrage 224x224, tenseurs CLIP)
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from services.clip_backend import CLIP_IMAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class PreprocessBuffers:
+    """
+    Un jeu de buffers par analyse en cours : chaque étape du prétraitement écrit
+    dans son propre buffer (dst= d'OpenCV, out= de numpy) au lieu d'allouer.
+    """
+
+    def __init__(self, size: int = CLIP_IMAGE_SIZE):
+        self.resized = np.empty((size, size, 3), dtype=np.uint8)       # Visage recadré redimensionné
+        self.filtered = np.empty((size, size, 3), dtype=np.uint8)      # Après filtre bilatéral
+        self.lab = np.empty((size, size, 3), dtype=np.uint8)
+        self.luminance = np.empty((size, size), dtype=np.uint8)
+        self.equalized = np.empty((size, size), dtype=np.uint8)        # Luminance après CLAHE
+        self.crop = np.empty((size, size, 3), dtype=np.uint8)          # Résultat final (RGB)
+        self.pixels = np.empty((1, 3, size, size), dtype=np.float32)   # Entrée normalisée de l'encodeur
+        self.clahe = None          # Créé par l'analyseur au premier usage (non thread-safe : un par jeu)
+
+
+class BufferPool:
+    """
+    Pool de PreprocessBuffers par processus.
+
+    borrow() prête un jeu libre (ou en crée un si tous sont pris) et le rend au
+    pool à la sortie du bloc. Au-delà de MAX_SIZE jeux libres, les jeux rendus
+    sont abandonnés au ramasse-miettes. Rien de ce qui sort du bloc ne doit
+    référencer un buffer emprunté.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.MAX_SIZE = max_size or int(os.getenv("BUFFER_POOL_SIZE", "8"))
+
+        self.lock = threading.Lock()
+        self.free = []
+        self.counts = {"borrowed": 0, "created": 0, "discarded": 0}
+        self.in_use = 0
+
+    @contextmanager
+    def borrow(self):
+        with self.lock:
+            buffers = self.free.pop() if self.free else None
+            if buffers is None:
+                self.counts["created"] += 1
+            self.counts["borrowed"] += 1
+            self.in_use += 1
+        if buffers is None:
+            buffers = PreprocessBuffers()
+
+        try:
+            yield buffers
+        finally:
+            with self.lock:
+                self.in_use -= 1
+                if len(self.free) < self.MAX_SIZE:
+                    self.free.append(buffers)
+                else:
+                    self.counts["discarded"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "free": len(self.free),
+                "in_use": self.in_use,
+                "max_size": self.MAX_SIZE,
+                **self.counts
+            }
+
+
+# Instance globale
+buffer_pool = BufferPool()
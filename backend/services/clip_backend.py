@@ -0,0 +1,221 @@
+# services/clip_backend.py - Backends d'inférence CLIP (local ou serveur d'inférence partagé)
+import hashlib
+import logging
+import os
+import threading
+from typing import List, Sequence
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Prétraitement identique à CLIPImageProcessor (openai/clip-vit-base-patch32)
+CLIP_IMAGE_SIZE = 224
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32).reshape(3, 1, 1)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32).reshape(3, 1, 1)
+
+
+def normalize_for_clip(rgb: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    (224, 224, 3) uint8 RGB -> (3, 224, 224) float32 normalisé
+
+    out: buffer de destination (pool de buffers), alloué ici sinon
+    """
+    if out is None:
+        out = np.empty((3, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), dtype=np.float32)
+    np.multiply(rgb.transpose(2, 0, 1), np.float32(1.0 / 255.0), out=out)
+    out -= CLIP_MEAN
+    out /= CLIP_STD
+    return out
+
+
+def preprocess_for_clip(pil_image: Image.Image, out: np.ndarray = None) -> np.ndarray:
+    """
+    Redimensionne (plus petit côté à 224, bicubique), recadre au centre et normalise
+
+    Returns:
+        np.ndarray: Tenseur float32 (3, 224, 224) prêt pour l'encodeur d'image (out si fourni)
+    """
+    width, height = pil_image.size
+    scale = CLIP_IMAGE_SIZE / min(width, height)
+    new_size = (max(CLIP_IMAGE_SIZE, round(width * scale)), max(CLIP_IMAGE_SIZE, round(height * scale)))
+    if new_size != (width, height):
+        pil_image = pil_image.resize(new_size, Image.BICUBIC)
+
+    if new_size != (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE):
+        left = (new_size[0] - CLIP_IMAGE_SIZE) // 2
+        top = (new_size[1] - CLIP_IMAGE_SIZE) // 2
+        pil_image = pil_image.crop((left, top, left + CLIP_IMAGE_SIZE, top + CLIP_IMAGE_SIZE))
+
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    return normalize_for_clip(np.asarray(pil_image), out)
+
+
+def softmax(logits: np.ndarray, axis: int = -1) -> np.ndarray:
+    logits = logits - logits.max(axis=axis, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=axis, keepdims=True)
+
+
+class ClipBackend:
+    """
+    Interface commune des backends CLIP.
+
+    encode_images: (N, 3, 224, 224) float32 -> (N, D) float32, normalisés L2
+    encode_texts:  liste de N prompts       -> (N, D) float32, normalisés L2 (mis en cache)
+    logit_scale:   facteur de température ; logits = logit_scale * images @ textes.T,
+                   exactement comme CLIPModel.logits_per_image
+    """
+
+    name = "base"
+    logit_scale = 100.0
+    embed_dim = 512
+
+    def __init__(self):
+        self._text_cache = {}
+        self._text_lock = threading.Lock()
+
+    def encode_images(self, pixel_values: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Les prompts sont fixes : chaque liste n'est encodée qu'une fois par processus"""
+        key = tuple(texts)
+        cached = self._text_cache.get(key)
+        if cached is None:
+            with self._text_lock:
+                cached = self._text_cache.get(key)
+                if cached is None:
+                    cached = self._encode_texts(list(texts))
+                    self._text_cache[key] = cached
+        return cached
+
+    def similarity(self, image_embeds: np.ndarray, texts: Sequence[str]) -> np.ndarray:
+        """Probabilités softmax (N images, M prompts), comme logits_per_image.softmax(dim=1)"""
+        return softmax(self.logit_scale * image_embeds @ self.encode_texts(texts).T)
+
+    def close(self):
+        """Libère les ressources hors processus (rien par défaut)"""
+
+
+class LocalClipBackend(ClipBackend):
+    """CLIP chargé dans le processus courant (déploiement historique)"""
+
+    name = "local"
+
+    def __init__(self, model_path: str = None):
+        super().__init__()
+        from services.model_loader import get_clip
+        self.processor, self.model, self.device = get_clip(model_path)
+        self.logit_scale = float(self.model.logit_scale.exp().item())
+        self.embed_dim = int(self.model.config.projection_dim)
+
+    @staticmethod
+    def _features(output):
+        # Selon la version de transformers : tenseur direct ou sortie avec pooler_output
+        return output if hasattr(output, "norm") else output.pooler_output
+
+    def encode_images(self, pixel_values: np.ndarray) -> np.ndarray:
+        import torch
+        with torch.no_grad():
+            pixels = torch.from_numpy(np.ascontiguousarray(pixel_values, dtype=np.float32)).to(self.device)
+            features = self._features(self.model.get_image_features(pixel_values=pixels))
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32, copy=False)
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        import torch
+        inputs = self.processor.tokenizer(texts, padding=True, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            features = self._features(self.model.get_text_features(**inputs))
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32, copy=False)
+
+
+class FakeClipBackend(ClipBackend):
+    """
+    Substitut déterministe de CLIP, sans poids ni réseau (tests et mesure du coût hors modèle)
+
+    Mêmes contrats que les vrais backends : (N, D) float32 normalisés L2, logit_scale ~100.
+    - texte : vecteur pseudo-aléatoire dérivé du hash du prompt
+    - image : projection fixe d'une version 8x8 des pixels, orientée vers "a human face"
+      pour que la validation CLIP passe ; la détection OpenCV et le contrôle qualité
+      restent réels, le type de peau et les problèmes varient avec l'image
+    """
+
+    name = "fake"
+    FACE_ANCHOR_PROMPT = "a human face"
+
+    def __init__(self, embed_dim: int = 512, logit_scale: float = 100.0, face_bias: float = 0.35):
+        super().__init__()
+        self.embed_dim = embed_dim
+        self.logit_scale = logit_scale
+        self.FACE_BIAS = face_bias
+        self.projection = np.random.default_rng(0).standard_normal((3 * 8 * 8, embed_dim)).astype(np.float32)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+    def encode_images(self, pixel_values: np.ndarray) -> np.ndarray:
+        pixels = np.asarray(pixel_values, dtype=np.float32)
+        count = len(pixels)
+        # Moyenne par blocs 28x28 : (N, 3, 224, 224) -> (N, 3, 8, 8)
+        pooled = pixels.reshape(count, 3, 8, CLIP_IMAGE_SIZE // 8, 8, CLIP_IMAGE_SIZE // 8).mean(axis=(3, 5))
+        features = self._normalize(pooled.reshape(count, -1) @ self.projection)
+        anchor = self.encode_texts([self.FACE_ANCHOR_PROMPT])[0]
+        return self._normalize(features + self.FACE_BIAS * anchor).astype(np.float32)
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big"))
+            .standard_normal(self.embed_dim)
+            for text in texts
+        ])
+        return self._normalize(vectors).astype(np.float32)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_clip_backend(name: str = None, model_path: str = None) -> ClipBackend:
+    """
+    Crée le backend configuré par CLIP_BACKEND
+
+    - "local" (défaut) : modèle dans le processus
+    - "remote" : serveur d'inférence partagé (services/inference_server.py) via socket Unix
+    - "fake" : substitut déterministe sans modèle (tests, benchmarks hors ligne)
+
+    model_path ne concerne que le backend local (variante de CLIP à charger).
+    """
+    name = (name or os.getenv("CLIP_BACKEND", "local")).lower()
+    if name == "fake":
+        return FakeClipBackend()
+    if name == "remote":
+        from services.inference_server import RemoteClipBackend
+        return RemoteClipBackend()
+    return LocalClipBackend(model_path)
+
+
+def get_clip_backend() -> ClipBackend:
+    """Backend partagé par FaceValidator et SkincareAnalyzer"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_clip_backend()
+                logger.info(f"Backend CLIP: {_backend.name}")
+    return _backend
+
+
+def close_clip_backend():
+    """Ferme le backend partagé s'il a été créé (sans le charger sinon), à l'arrêt du processus"""
+    if _backend is not None:
+        _backend.close()
@@ -0,0 +1,152 @@
+# services/face_detection.py - Détecteurs de visage interchangeables (YuNet DNN, Haar en secours)
+# cv2 est importé à la demande pour que le démarrage et les endpoints légers ne le chargent pas
+import numpy as np
+import logging
+import os
+import threading
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Modèle YuNet (OpenCV Zoo, ~230KB) téléchargé dans l'image Docker au build
+YUNET_MODEL_PATH = os.getenv("FACE_DETECTOR_MODEL", "/opt/models/face_detection_yunet_2023mar.onnx")
+
+
+class FaceDetector:
+    """
+    Interface commune des détecteurs de visage.
+
+    detect() reçoit une image RGB (numpy HxWx3) en pleine résolution et retourne
+    les visages en coordonnées pleine résolution : [{"box": (x, y, w, h), "score": float}].
+    La détection se fait sur une copie réduite à DETECTION_MAX_SIZE pixels (plus grand côté).
+    """
+
+    name = "base"
+
+    def __init__(self, detection_max_size: int = 640):
+        self.DETECTION_MAX_SIZE = detection_max_size
+        # Les détecteurs OpenCV ne sont pas thread-safe (threadpool du mode caméra)
+        self.lock = threading.Lock()
+
+    def _downscale(self, rgb: np.ndarray):
+        import cv2
+        height, width = rgb.shape[:2]
+        scale = min(1.0, self.DETECTION_MAX_SIZE / max(height, width))
+        if scale < 1.0:
+            rgb = cv2.resize(rgb, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return rgb, scale
+
+    def _detect_scaled(self, small_rgb: np.ndarray, scale: float) -> list:
+        raise NotImplementedError
+
+    def detect(self, rgb: np.ndarray) -> List[dict]:
+        small, scale = self._downscale(rgb)
+        faces = []
+        for x, y, w, h, score in self._detect_scaled(small, scale):
+            faces.append({
+                "box": (int(round(x / scale)), int(round(y / scale)), int(round(w / scale)), int(round(h / scale))),
+                "score": round(float(score), 4)
+            })
+        # Plus grand visage en premier
+        faces.sort(key=lambda f: f["box"][2] * f["box"][3], reverse=True)
+        return faces
+
+
+class HaarFaceDetector(FaceDetector):
+    """Cascade Haar frontale d'OpenCV (historique, utilisée en secours)"""
+
+    name = "haar"
+
+    def __init__(self, detection_max_size: int = 800, min_size: int = 30):
+        import cv2
+        super().__init__(detection_max_size)
+        self.MIN_SIZE = min_size  # Taille minimum du visage en pleine résolution
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    def _detect_scaled(self, small_rgb: np.ndarray, scale: float) -> list:
+        import cv2
+        gray = cv2.cvtColor(small_rgb, cv2.COLOR_RGB2GRAY)
+        min_size = max(12, int(self.MIN_SIZE * scale))
+        with self.lock:
+            faces = self.cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(min_size, min_size),
+                flags=cv2.CASCADE_SCALE_IMAGE
+            )
+        return [(x, y, w, h, 1.0) for (x, y, w, h) in faces]
+
+
+class YuNetFaceDetector(FaceDetector):
+    """Détecteur CNN léger YuNet (cv2.FaceDetectorYN) : plus rapide et robuste aux visages tournés"""
+
+    name = "yunet"
+
+    def __init__(self, model_path: str = YUNET_MODEL_PATH, detection_max_size: int = 640, score_threshold: float = 0.7):
+        import cv2
+        super().__init__(detection_max_size)
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, 0.3, 50)
+
+    def _detect_scaled(self, small_rgb: np.ndarray, scale: float) -> list:
+        import cv2
+        bgr = cv2.cvtColor(small_rgb, cv2.COLOR_RGB2BGR)
+        height, width = bgr.shape[:2]
+        with self.lock:
+            self.detector.setInputSize((width, height))
+            _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return []
+        # Chaque ligne : x, y, w, h, 5 landmarks (10 valeurs), score
+        results = []
+        for face in faces:
+            x, y, w, h = face[:4]
+            x, y = max(0.0, x), max(0.0, y)
+            w, h = min(w, width - x), min(h, height - y)
+            if w > 0 and h > 0:
+                results.append((x, y, w, h, face[-1]))
+        return results
+
+
+def create_face_detector(name: str = None) -> FaceDetector:
+    """
+    Crée le détecteur configuré par FACE_DETECTOR ("yunet" par défaut, ou "haar")
+
+    Retombe sur Haar si le modèle YuNet est absent ou si OpenCV ne fournit pas FaceDetectorYN.
+    """
+    import cv2
+    name = (name or os.getenv("FACE_DETECTOR", "yunet")).lower()
+    if name == "yunet":
+        if not hasattr(cv2, "FaceDetectorYN"):
+            logger.warning("cv2.FaceDetectorYN indisponible (OpenCV < 4.5.4), utilisation de Haar")
+        elif not os.path.exists(YUNET_MODEL_PATH):
+            logger.warning(f"Modèle YuNet introuvable ({YUNET_MODEL_PATH}), utilisation de Haar")
+        else:
+            try:
+                detector = YuNetFaceDetector(YUNET_MODEL_PATH)
+                logger.info("Détecteur de visage: YuNet (DNN)")
+                return detector
+            except Exception as e:
+                logger.warning(f"Chargement YuNet impossible ({str(e)}), utilisation de Haar")
+
+    logger.info("Détecteur de visage: Haar cascade")
+    return HaarFaceDetector()
+
+
+_face_detector = None
+_face_detector_lock = threading.Lock()
+
+
+def get_face_detector() -> FaceDetector:
+    """Détecteur partagé par la validation, le prétraitement et le mode caméra"""
+    global _face_detector
+    if _face_detector is None:
+        # Premières analyses concurrentes (threads d'analyse) : un seul import de cv2 et un seul détecteur
+        with _face_detector_lock:
+            if _face_detector is None:
+                detector = create_face_detector()
+                # cv2 vient d'être importé : appliquer la politique de threads courante
+                from services.threading_policy import threading_policy
+                threading_policy.apply()
+                _face_detector = detector
+    return _face_detector
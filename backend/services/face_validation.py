@@ -1,77 +1,78 @@
 # services/face_validation.py - Validation de visage humain
 from PIL import Image
-import cv2
 import numpy as np
-from transformers import CLIPProcessor, CLIPModel
-import torch
 import logging
+from services.face_detection import get_face_detector
+from services.photo_quality import photo_quality_checker
+from services.clip_backend import get_clip_backend, preprocess_for_clip
+from services.buffer_pool import buffer_pool
 
 logger = logging.getLogger(__name__)
 
+def passes_validation_threshold(score, threshold):
+    """Règle des seuils de validation (aire du visage, confiance CLIP) : score >= seuil, scalaires ou tableaux"""
+    return score >= threshold
+
 class FaceValidator:
     def __init__(self):
-        self.clip_processor = None
-        self.clip_model = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.clip_backend = None  # Local ou serveur d'inférence (CLIP_BACKEND)
 
         # Seuils de validation
-        self.FACE_DETECTION_MIN_SIZE = (30, 30)  # Taille minimum du visage détecté
         self.CLIP_HUMAN_FACE_THRESHOLD = 0.6     # Seuil CLIP pour "visage humain"
         self.MIN_FACE_AREA_RATIO = 0.05          # Visage doit occuper au moins 5% de l'image
+        self.MIN_IMAGE_SIZE = 50                 # Côté minimum (pixels) avant tout contrôle
+
+        # Prompts pour validation : les 3 premiers décrivent un visage humain
+        self.VALIDATION_PROMPTS = [
+            "a human face",
+            "a person's face",
+            "human facial features",
+            "not a human face",
+            "an object",
+            "a vehicle",
+            "an animal",
+            "text or document"
+        ]
+        self.HUMAN_PROMPT_COUNT = 3
 
     def load_clip_model(self):
         """Charge le modèle CLIP pour validation sémantique"""
-        if self.clip_processor is None or self.clip_model is None:
-            logger.info("Chargement de CLIP pour validation de visage...")
-            self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-
-            if self.device == "cuda":
-                self.clip_model = self.clip_model.to(self.device)
-
-            logger.info("CLIP chargé pour validation")
+        if self.clip_backend is None:
+            # Backend partagé avec SkincareAnalyzer (une seule copie des poids)
+            self.clip_backend = get_clip_backend()
 
     def detect_faces_opencv(self, pil_image: Image.Image) -> dict:
         """
-        Détecte les visages avec OpenCV (méthode rapide et fiable)
+        Détecte les visages avec OpenCV (YuNet DNN, ou cascade Haar en secours)
 
         Returns:
             dict: Informations sur les visages détectés
         """
         try:
-            # Convertir PIL en array pour OpenCV
-            img_array = np.array(pil_image)
-            img = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-            # Charger le classificateur de visages
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-            # Détecter les visages avec plusieurs échelles
-            faces = face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=self.FACE_DETECTION_MIN_SIZE,
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-
-            image_area = img.shape[0] * img.shape[1]
+            # Le détecteur travaille sur une copie réduite et renvoie des boîtes pleine résolution
+            img_array = np.asarray(pil_image)
+            detector = get_face_detector()
+            faces = detector.detect(img_array)
+
+            image_area = img_array.shape[0] * img_array.shape[1]
             face_info = []
 
-            for (x, y, w, h) in faces:
+            for face in faces:
+                x, y, w, h = face["box"]
                 face_area = w * h
                 area_ratio = face_area / image_area
 
                 face_info.append({
                     "position": (x, y, w, h),
+                    "score": face["score"],
                     "area": face_area,
                     "area_ratio": area_ratio,
-                    "size_valid": area_ratio >= self.MIN_FACE_AREA_RATIO
+                    "size_valid": passes_validation_threshold(area_ratio, self.MIN_FACE_AREA_RATIO)
                 })
 
             return {
                 "faces_detected": len(faces),
+                "detector": detector.name,
                 "faces_info": face_info,
                 "has_valid_face": len([f for f in face_info if f["size_valid"]]) > 0
             }
@@ -85,53 +86,36 @@ class FaceValidator:
                 "error": str(e)
             }
 
-    async def validate_human_face_clip(self, pil_image: Image.Image) -> dict:
+    async def validate_human_face_clip(self, pil_image: Image.Image, image_embeds: np.ndarray = None) -> dict:
         """
         Valide qu'il s'agit bien d'un visage humain avec CLIP
 
+        image_embeds: embedding déjà calculé pour cette image (mode rapide), sinon calculé ici
+
         Returns:
             dict: Résultats de validation CLIP
         """
         try:
             self.load_clip_model()
 
-            # Prompts pour validation
-            validation_prompts = [
-                "a human face",
-                "a person's face",
-                "human facial features",
-                "not a human face",
-                "an object",
-                "a vehicle",
-                "an animal",
-                "text or document"
-            ]
-
-            # Analyse avec CLIP
-            inputs = self.clip_processor(
-                text=validation_prompts,
-                images=pil_image,
-                return_tensors="pt",
-                padding=True
-            )
-
-            if self.device == "cuda":
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            with torch.no_grad():
-                outputs = self.clip_model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1)
+            validation_prompts = self.VALIDATION_PROMPTS
+
+            # Analyse avec CLIP (embeddings des prompts mis en cache par le backend)
+            if image_embeds is None:
+                with buffer_pool.borrow() as buffers:
+                    preprocess_for_clip(pil_image, out=buffers.pixels[0])
+                    image_embeds = self.clip_backend.encode_images(buffers.pixels)
+            probs = self.clip_backend.similarity(image_embeds, validation_prompts)
 
             # Calculer les scores
-            human_face_score = float(probs[0][0]) + float(probs[0][1]) + float(probs[0][2])  # Somme des 3 premiers
-            non_face_score = float(probs[0][3]) + float(probs[0][4]) + float(probs[0][5]) + float(probs[0][6]) + float(probs[0][7])  # Somme des autres
+            human_face_score = float(probs[0, :self.HUMAN_PROMPT_COUNT].sum())  # Somme des 3 premiers
+            non_face_score = float(probs[0, self.HUMAN_PROMPT_COUNT:].sum())  # Somme des autres
 
             # Normaliser
             total_score = human_face_score + non_face_score
             human_face_confidence = human_face_score / total_score if total_score > 0 else 0
 
-            is_human_face = human_face_confidence >= self.CLIP_HUMAN_FACE_THRESHOLD
+            is_human_face = passes_validation_threshold(human_face_confidence, self.CLIP_HUMAN_FACE_THRESHOLD)
 
             return {
                 "is_human_face": is_human_face,
@@ -151,14 +135,17 @@ class FaceValidator:
                 "error": str(e)
             }
 
-    async def validate_image_for_skincare(self, pil_image: Image.Image) -> dict:
+    async def validate_image_for_skincare(self, pil_image: Image.Image, return_embeds: bool = False) -> dict:
         """
         Validation complète d'une image pour l'analyse skincare
 
+        return_embeds: ajoute l'embedding CLIP de l'image au résultat ("image_embeds"),
+        pour le réutiliser sans second passage dans le modèle (mode rapide)
+
         Returns:
             dict: Résultat complet de validation
         """
-        logger.info("🔍 Début de la validation d'image pour skincare...")
+        logger.debug("🔍 Début de la validation d'image pour skincare...")
 
         # 1. Validation basique de l'image
         if not isinstance(pil_image, Image.Image):
@@ -170,20 +157,57 @@ class FaceValidator:
 
         # Vérifier les dimensions
         width, height = pil_image.size
-        if width < 50 or height < 50:
+        if min(width, height) < self.MIN_IMAGE_SIZE:
             return {
                 "is_valid": False,
                 "reason": "Image trop petite",
-                "details": {"size": pil_image.size, "min_required": (50, 50)}
+                "details": {"size": pil_image.size, "min_required": (self.MIN_IMAGE_SIZE, self.MIN_IMAGE_SIZE)}
             }
 
-        # 2. Détection de visages avec OpenCV
+        # 2. Qualité de la photo (quelques ms, avant tout modèle)
+        quality_result = photo_quality_checker.assess(pil_image)
+        if not quality_result["is_acceptable"]:
+            logger.debug("❌ Image rejetée (qualité) : %s", quality_result["reason"])
+            return {
+                "is_valid": False,
+                "reason": quality_result["reason"],
+                "suggestion": quality_result["suggestion"],
+                "details": {
+                    "photo_quality": quality_result,
+                    "image_size": pil_image.size,
+                    "validation_passed": {
+                        "photo_quality": False,
+                        "face_detected": False,
+                        "human_confirmed": False
+                    }
+                }
+            }
+
+        # 3. Détection de visages avec OpenCV
         opencv_result = self.detect_faces_opencv(pil_image)
 
-        # 3. Validation sémantique avec CLIP
-        clip_result = await self.validate_human_face_clip(pil_image)
+        # 4. Validation sémantique avec CLIP (calculée seulement si la photo a passé le contrôle qualité)
+        image_embeds = None
+        if return_embeds:
+            self.load_clip_model()
+            with buffer_pool.borrow() as buffers:
+                preprocess_for_clip(pil_image, out=buffers.pixels[0])
+                image_embeds = self.clip_backend.encode_images(buffers.pixels)
+        clip_result = await self.validate_human_face_clip(pil_image, image_embeds)
+
+        # 5. Décision finale
+        result = self.build_result(pil_image.size, quality_result, opencv_result, clip_result)
+
+        if return_embeds:
+            result["image_embeds"] = image_embeds
 
-        # 4. Décision finale
+        return result
+
+    def build_result(self, image_size: tuple, quality_result: dict, opencv_result: dict, clip_result: dict) -> dict:
+        """
+        Décision finale à partir des résultats OpenCV et CLIP déjà calculés
+        (utilisée aussi par l'analyse en masse, qui fait tourner CLIP par lots)
+        """
         is_valid_face = (
                 opencv_result["has_valid_face"] and  # OpenCV détecte un visage de taille correcte
                 clip_result["is_human_face"]         # CLIP confirme que c'est un visage humain
@@ -209,10 +233,12 @@ class FaceValidator:
             "reason": reason,
             "suggestion": suggestion,
             "details": {
+                "photo_quality": quality_result,
                 "opencv_detection": opencv_result,
                 "clip_validation": clip_result,
-                "image_size": pil_image.size,
+                "image_size": image_size,
                 "validation_passed": {
+                    "photo_quality": True,
                     "face_detected": opencv_result["has_valid_face"],
                     "human_confirmed": clip_result["is_human_face"]
                 }
@@ -220,9 +246,9 @@ class FaceValidator:
         }
 
         if is_valid_face:
-            logger.info("✅ Image validée : visage humain détecté")
+            logger.debug("✅ Image validée : visage humain détecté")
         else:
-            logger.warning(f"❌ Image rejetée : {reason}")
+            logger.debug("❌ Image rejetée : %s", reason)
 
         return result
 
@@ -230,6 +256,6 @@ class FaceValidator:
 face_validator = FaceValidator()
 
 # Fonction wrapper pour l'API
-async def validate_face_for_skincare(pil_image: Image.Image) -> dict:
+async def validate_face_for_skincare(pil_image: Image.Image, return_embeds: bool = False) -> dict:
     """Fonction wrapper pour validation de visage"""
-    return await face_validator.validate_image_for_skincare(pil_image)
\ No newline at end of file
+    return await face_validator.validate_image_for_skincare(pil_image, return_embeds)
\ No newline at end of file
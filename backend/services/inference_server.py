@@ -0,0 +1,384 @@
+# services/inference_server.py - Serveur d'inférence CLIP partagé par plusieurs réplicas de l'API
+"""
+Déploiement séparé (optionnel) : un processus dédié possède le modèle CLIP et la file
+de batching ; les processus FastAPI (CLIP_BACKEND=remote) lui envoient les tenseurs
+déjà prétraités via une socket Unix + mémoire partagée, sans JSON.
+
+Protocole (binaire, big-endian) :
+    requête  : MAGIC(4s) op(B) payload_len(I) payload
+    réponse  : status(B) payload_len(I) payload
+
+    op=OP_INFO          -> réponse: embed_dim(I) logit_scale(f)
+    op=OP_ENCODE_IMAGES payload: shm_name_len(H) shm_name n(I)
+                        Le client écrit (n, 3, 224, 224) float32 au début du segment ;
+                        le serveur écrit (n, D) float32 juste après, puis répond (payload vide).
+    op=OP_ENCODE_TEXTS  payload: prompts UTF-8 séparés par "\\n" -> réponse: (n, D) float32
+
+Lancement (depuis backend/) :
+    python -m services.inference_server --socket /run/skincare/inference.sock
+"""
+import argparse
+import asyncio
+import atexit
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import List
+
+import numpy as np
+
+from services.clip_backend import ClipBackend, CLIP_IMAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/run/skincare/inference.sock")
+
+MAGIC = b"SKIN"
+OP_INFO, OP_ENCODE_IMAGES, OP_ENCODE_TEXTS = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 0, 1
+
+REQUEST_HEADER = struct.Struct("!4sBI")
+RESPONSE_HEADER = struct.Struct("!BI")
+INFO_PAYLOAD = struct.Struct("!If")
+IMAGE_TENSOR_SIZE = 3 * CLIP_IMAGE_SIZE * CLIP_IMAGE_SIZE * 4
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Ouvre un segment créé par le client sans que ce processus ne le supprime à sa sortie"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 : pas de paramètre track, on désenregistre du resource_tracker
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ==========================================
+# SERVEUR (possède le modèle et la file de batching)
+# ==========================================
+
+class InferenceServer:
+    def __init__(self, socket_path: str, max_batch: int = 16, max_wait_ms: float = 5.0):
+        from services.clip_backend import LocalClipBackend
+
+        self.SOCKET_PATH = socket_path
+        self.MAX_BATCH = max_batch          # Images maximum par passe du modèle
+        self.MAX_WAIT_MS = max_wait_ms      # Attente maximum pour compléter un batch
+
+        self.backend = LocalClipBackend()
+        self.queue = None
+        # Tenseur de batch réutilisé d'un batch à l'autre (un seul batch en cours à la fois)
+        self.batch_pixels = np.empty((max_batch, 3, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), dtype=np.float32)
+
+        # Un seul consommateur du modèle : chaque batch peut utiliser tous les CPU du quota
+        from services.threading_policy import threading_policy
+        threading_policy.set_mode("latency")
+
+    async def _batcher(self):
+        """Regroupe les images des requêtes concurrentes en un seul appel au modèle"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.MAX_WAIT_MS / 1000
+            while count < self.MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                count += len(item[0])
+
+            if len(batch) > 1:
+                if count > len(self.batch_pixels):
+                    self.batch_pixels = np.empty((count,) + self.batch_pixels.shape[1:], dtype=np.float32)
+                pixels = np.concatenate([item[0] for item in batch], out=self.batch_pixels[:count])
+            else:
+                pixels = batch[0][0]
+            try:
+                embeds = await loop.run_in_executor(None, self.backend.encode_images, pixels)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_pixels, future in batch:
+                if not future.done():
+                    future.set_result(embeds[offset:offset + len(item_pixels)])
+                offset += len(item_pixels)
+
+    async def _encode_images(self, payload: bytes, segments: dict) -> bytes:
+        (name_length,) = struct.unpack_from("!H", payload, 0)
+        name = payload[2:2 + name_length].decode()
+        (count,) = struct.unpack_from("!I", payload, 2 + name_length)
+
+        shm = segments.get(name)
+        if shm is None:
+            shm = segments[name] = _attach_shared_memory(name)
+
+        dim = self.backend.embed_dim
+        pixels = np.ndarray((count, 3, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), dtype=np.float32, buffer=shm.buf)
+        output = np.ndarray((count, dim), dtype=np.float32, buffer=shm.buf, offset=count * IMAGE_TENSOR_SIZE)
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((pixels, future))
+        output[:] = await future
+        del pixels, output
+        return b""
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        segments = {}
+        try:
+            while True:
+                header = await reader.readexactly(REQUEST_HEADER.size)
+                magic, op, payload_length = REQUEST_HEADER.unpack(header)
+                if magic != MAGIC:
+                    break
+                payload = await reader.readexactly(payload_length) if payload_length else b""
+
+                try:
+                    if op == OP_INFO:
+                        response = INFO_PAYLOAD.pack(self.backend.embed_dim, self.backend.logit_scale)
+                    elif op == OP_ENCODE_IMAGES:
+                        response = await self._encode_images(payload, segments)
+                    elif op == OP_ENCODE_TEXTS:
+                        texts = payload.decode("utf-8").split("\n")
+                        embeds = await asyncio.get_running_loop().run_in_executor(None, self.backend.encode_texts, texts)
+                        response = embeds.tobytes()
+                    else:
+                        raise ValueError(f"Opération inconnue: {op}")
+                    status = STATUS_OK
+                except Exception as e:
+                    logger.error(f"Erreur d'inférence: {str(e)}")
+                    status, response = STATUS_ERROR, str(e).encode("utf-8")
+
+                writer.write(RESPONSE_HEADER.pack(status, len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            for shm in segments.values():
+                shm.close()
+            writer.close()
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        if os.path.exists(self.SOCKET_PATH):
+            os.unlink(self.SOCKET_PATH)
+        os.makedirs(os.path.dirname(self.SOCKET_PATH) or ".", exist_ok=True)
+
+        server = await asyncio.start_unix_server(self._handle_client, path=self.SOCKET_PATH)
+        batcher = asyncio.create_task(self._batcher())
+        logger.info(f"🧠 Serveur d'inférence prêt sur {self.SOCKET_PATH} (batch max {self.MAX_BATCH})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+# ==========================================
+# CLIENT (utilisé par les processus FastAPI)
+# ==========================================
+
+class _Connection:
+    """Une connexion au serveur d'inférence et son segment de mémoire partagée (un seul utilisateur à la fois)"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        self.SOCKET_PATH = socket_path
+        self.TIMEOUT = timeout
+        self.sock = None
+        self.shm = None
+        self.connect()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Serveur bloqué : la requête échoue au lieu de bloquer le thread d'analyse indéfiniment
+        sock.settimeout(self.TIMEOUT)
+        try:
+            sock.connect(self.SOCKET_PATH)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def reconnect(self):
+        """Nouvelle socket (le serveur a pu redémarrer) ; le segment, créé par le client, est conservé"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.connect()
+
+    def _recv_exactly(self, size: int) -> bytes:
+        view = bytearray(size)
+        received = 0
+        while received < size:
+            chunk = self.sock.recv_into(memoryview(view)[received:], size - received)
+            if chunk == 0:
+                raise ConnectionError("Serveur d'inférence déconnecté")
+            received += chunk
+        return bytes(view)
+
+    def request(self, op: int, payload: bytes) -> bytes:
+        self.sock.sendall(REQUEST_HEADER.pack(MAGIC, op, len(payload)) + payload)
+        status, length = RESPONSE_HEADER.unpack(self._recv_exactly(RESPONSE_HEADER.size))
+        response = self._recv_exactly(length) if length else b""
+        if status != STATUS_OK:
+            raise RuntimeError(f"Serveur d'inférence: {response.decode('utf-8', 'replace')}")
+        return response
+
+    def segment(self, count: int, embed_dim: int) -> shared_memory.SharedMemory:
+        """Segment réutilisé d'une requête à l'autre, agrandi si nécessaire"""
+        size = count * (IMAGE_TENSOR_SIZE + embed_dim * 4)
+        if self.shm is None or self.shm.size < size:
+            self._unlink_segment()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 4 * (IMAGE_TENSOR_SIZE + embed_dim * 4)))
+        return self.shm
+
+    def _unlink_segment(self):
+        if self.shm is not None:
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._unlink_segment()
+
+
+class RemoteClipBackend(ClipBackend):
+    """
+    Backend CLIP qui délègue l'inférence au serveur d'inférence local.
+
+    Chaque appel emprunte une connexion (socket + segment /dev/shm) à un pool :
+    les threads d'analyse interrogent le serveur en parallèle, ce qui permet au
+    serveur de les regrouper en batch. Au-delà de MAX_IDLE connexions libres, les
+    connexions rendues sont fermées. Une erreur de transport (déconnexion, délai
+    dépassé) déclenche une reconnexion et un seul nouvel essai.
+    """
+
+    name = "remote"
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, connect_timeout: float = 30.0):
+        super().__init__()
+        self.SOCKET_PATH = socket_path
+        self.TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "60"))
+        self.MAX_IDLE = int(os.getenv("INFERENCE_CONNECTIONS", "4"))
+
+        self.lock = threading.Lock()
+        self.free = []
+        self.connections = set()     # Toutes les connexions ouvertes, libres ou empruntées
+
+        # Le serveur peut démarrer après l'API (chargement du modèle)
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                connection = _Connection(self.SOCKET_PATH, self.TIMEOUT)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+
+        self.connections.add(connection)
+        self.embed_dim, self.logit_scale = INFO_PAYLOAD.unpack(connection.request(OP_INFO, b""))
+        self.free.append(connection)
+        # Filet de sécurité hors API (outils) : les segments /dev/shm survivent au processus sinon
+        atexit.register(self.close)
+
+    @contextmanager
+    def _borrow(self):
+        with self.lock:
+            connection = self.free.pop() if self.free else None
+        if connection is None:
+            connection = _Connection(self.SOCKET_PATH, self.TIMEOUT)
+            with self.lock:
+                self.connections.add(connection)
+
+        healthy = True
+        try:
+            yield connection
+        except OSError:
+            # Protocole désynchronisé après une erreur de transport : la connexion n'est pas réutilisée
+            healthy = False
+            raise
+        finally:
+            with self.lock:
+                keep = healthy and connection in self.connections and len(self.free) < self.MAX_IDLE
+                if keep:
+                    self.free.append(connection)
+                else:
+                    self.connections.discard(connection)
+            if not keep:
+                connection.close()
+
+    def _request(self, connection: _Connection, op: int, payload: bytes) -> bytes:
+        try:
+            return connection.request(op, payload)
+        except OSError as e:
+            # ConnectionError et socket.timeout compris : une reconnexion, un seul nouvel essai
+            logger.warning(f"🔌 Serveur d'inférence: {e!r}, reconnexion")
+            connection.reconnect()
+            return connection.request(op, payload)
+
+    def encode_images(self, pixel_values: np.ndarray) -> np.ndarray:
+        count = len(pixel_values)
+        with self._borrow() as connection:
+            shm = connection.segment(count, self.embed_dim)
+            pixels = np.ndarray(pixel_values.shape, dtype=np.float32, buffer=shm.buf)
+            pixels[:] = pixel_values
+            name = shm.name.encode()
+            self._request(connection, OP_ENCODE_IMAGES, struct.pack("!H", len(name)) + name + struct.pack("!I", count))
+            output = np.ndarray((count, self.embed_dim), dtype=np.float32, buffer=shm.buf, offset=count * IMAGE_TENSOR_SIZE)
+            result = output.copy()
+            del pixels, output
+        return result
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        with self._borrow() as connection:
+            response = self._request(connection, OP_ENCODE_TEXTS, "\n".join(texts).encode("utf-8"))
+        return np.frombuffer(response, dtype=np.float32).reshape(len(texts), self.embed_dim).copy()
+
+    def close(self):
+        """Ferme les connexions et supprime leurs segments /dev/shm (idempotent)"""
+        with self.lock:
+            idle, self.free = self.free, []
+            # Une connexion encore empruntée n'est plus connue du pool : fermée à sa restitution
+            self.connections.clear()
+        for connection in idle:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur d'inférence CLIP partagé")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    from services.structured_logging import setup_logging
+    setup_logging()
+
+    server = InferenceServer(args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# services/job_store.py - Jobs d'analyse asynchrones (stockage 100% en mémoire)
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    File de jobs d'analyse traitée par un pool de workers asyncio.
+
+    Les jobs (upload encodé en entrée, résultat en sortie) ne vivent qu'en mémoire et
+    sont supprimés automatiquement après JOB_TTL secondes : rien n'est persisté.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, job_ttl: float = 600.0, max_jobs: int = 1000):
+        self.WORKERS = workers
+        self.MAX_PENDING = max_pending      # Jobs en attente avant de refuser (503)
+        self.JOB_TTL = job_ttl              # Durée de vie d'un job terminé (secondes)
+        self.MAX_JOBS = max_jobs            # Nombre maximum de jobs conservés
+
+        self.jobs = {}
+        self.queue = None
+        self.worker_tasks = []
+        self.handler = None
+
+    def start(self, handler: Callable[[str, object], Awaitable[object]]):
+        """Démarre les workers ; handler(job_id, payload) produit le résultat du job"""
+        if self.worker_tasks:
+            return
+        self.handler = handler
+        self.queue = asyncio.Queue(maxsize=self.MAX_PENDING)
+        self.worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.WORKERS)]
+        logger.info(f"🧵 {self.WORKERS} workers de jobs démarrés")
+
+    async def stop(self):
+        """Arrête les workers (les jobs en attente sont abandonnés)"""
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    def _purge(self):
+        """Supprime les jobs expirés, puis les plus anciens terminés si la limite est atteinte"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.JOB_TTL
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+        if len(self.jobs) >= self.MAX_JOBS:
+            finished = sorted(
+                (job for job in self.jobs.values() if job["finished_at"] is not None),
+                key=lambda job: job["finished_at"]
+            )
+            for job in finished[:len(self.jobs) - self.MAX_JOBS + 1]:
+                del self.jobs[job["id"]]
+
+    def submit(self, payload) -> Optional[dict]:
+        """
+        Ajoute un job à la file
+
+        Returns:
+            dict: Le job créé, ou None si la file est pleine
+        """
+        self._purge()
+        if self.queue is None or self.queue.full() or len(self.jobs) >= self.MAX_JOBS:
+            return None
+
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "status": "pending",
+            "created_at": time.monotonic(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "payload": payload,
+            "done": asyncio.Event()
+        }
+        self.jobs[job_id] = job
+        self.queue.put_nowait(job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        self._purge()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Attend la fin d'un job au plus timeout secondes (long-polling)"""
+        job = self.get(job_id)
+        if job is None or timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(job["done"].wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    def to_public(self, job: dict) -> dict:
+        """Représentation JSON d'un job (sans l'image en entrée)"""
+        now = time.monotonic()
+        end = job["finished_at"] or now
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "queue_position": self._queue_position(job),
+            "elapsed_seconds": round(end - job["created_at"], 3),
+            "result": job["result"],
+            "error": job["error"]
+        }
+
+    def _queue_position(self, job: dict) -> Optional[int]:
+        if job["status"] != "pending":
+            return None
+        return sum(
+            1 for other in self.jobs.values()
+            if other["status"] == "pending" and other["created_at"] < job["created_at"]
+        )
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+
+            # Le job ne garde plus l'upload dès qu'il quitte la file : seul le handler le détient
+            payload, job["payload"] = job["payload"], None
+            job["status"] = "running"
+            job["started_at"] = time.monotonic()
+            try:
+                job["result"] = await self.handler(job_id, payload)
+                job["status"] = "done"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = getattr(e, "detail", None) or str(e)
+                logger.warning(f"❌ Job {job_id} en échec: {job['error']}")
+            finally:
+                # 🧹 Libérer l'upload dès que le job est terminé
+                del payload
+                job["finished_at"] = time.monotonic()
+                job["done"].set()
+                self.queue.task_done()
+
+
+# Instance globale
+job_store = JobStore()
@@ -0,0 +1,160 @@
+# services/live_tracking.py - Suivi de visage temps réel pour le mode caméra
+from PIL import Image
+import numpy as np
+import logging
+from services.face_detection import get_face_detector
+
+logger = logging.getLogger(__name__)
+
+
+class LiveFaceTracker:
+    """
+    Suit un visage d'une frame à l'autre pour le mode caméra.
+
+    Le détecteur de visage n'est relancé que périodiquement ou quand le suivi
+    par template matching est perdu ; les scores sont lissés dans le temps
+    pour éviter que le message affiché à l'utilisateur ne clignote.
+    """
+
+    def __init__(self):
+        # Paramètres de suivi
+        self.TRACKING_WIDTH = 320            # Largeur de travail (frames réduites)
+        self.REDETECT_INTERVAL = 15          # Relancer la détection toutes les N frames
+        self.TRACKING_MIN_SCORE = 0.55       # Score minimum de template matching
+        self.SMOOTHING = 0.4                 # Poids de la nouvelle mesure (EMA)
+
+        # Critères d'une "bonne" frame (mêmes seuils que FaceValidator)
+        self.MIN_FACE_AREA_RATIO = 0.05
+        self.MAX_FACE_AREA_RATIO = 0.6
+        self.MAX_CENTER_OFFSET = 0.25
+        self.MIN_BRIGHTNESS = 60
+        self.MAX_BRIGHTNESS = 210
+        self.STABLE_FRAMES_REQUIRED = 5      # Frames consécutives avant analyse
+
+        self.reset()
+
+    def reset(self):
+        """Réinitialise l'état de suivi (nouveau visage ou nouvelle capture)"""
+        self.box = None                      # (x, y, w, h) dans l'image réduite
+        self.template = None
+        self.frames_since_detection = 0
+        self.stable_frames = 0
+        self.smoothed = {
+            "presence": 0.0,
+            "area_ratio": 0.0,
+            "center_offset": 1.0,
+            "brightness": 0.0
+        }
+
+    def _detect(self, rgb: np.ndarray):
+        """Détection complète (détecteur partagé) sur l'image réduite"""
+        faces = get_face_detector().detect(rgb)
+        if len(faces) == 0:
+            return None
+        # Garder le plus grand visage
+        return faces[0]["box"]
+
+    def _track(self, gray: np.ndarray):
+        """Recherche le template du visage autour de sa dernière position"""
+        import cv2
+        x, y, w, h = self.box
+        img_h, img_w = gray.shape
+        margin_x, margin_y = w // 2, h // 2
+        x1, y1 = max(0, x - margin_x), max(0, y - margin_y)
+        x2, y2 = min(img_w, x + w + margin_x), min(img_h, y + h + margin_y)
+        search = gray[y1:y2, x1:x2]
+
+        if search.shape[0] < h or search.shape[1] < w:
+            return None, 0.0
+
+        result = cv2.matchTemplate(search, self.template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < self.TRACKING_MIN_SCORE:
+            return None, float(max_val)
+        return (x1 + max_loc[0], y1 + max_loc[1], w, h), float(max_val)
+
+    def _smooth(self, key: str, value: float) -> float:
+        self.smoothed[key] = (1 - self.SMOOTHING) * self.smoothed[key] + self.SMOOTHING * value
+        return self.smoothed[key]
+
+    def process_frame(self, pil_image: Image.Image) -> dict:
+        """
+        Traite une frame de la caméra
+
+        Returns:
+            dict: Position du visage, scores lissés et conseil pour l'utilisateur
+        """
+        import cv2
+
+        # Travailler sur une copie réduite en niveaux de gris
+        width, height = pil_image.size
+        scale = min(1.0, self.TRACKING_WIDTH / width)
+        if scale < 1.0:
+            pil_image = pil_image.resize((int(width * scale), int(height * scale)), Image.BILINEAR)
+        rgb = np.asarray(pil_image)
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        img_h, img_w = gray.shape
+
+        # Suivi si possible, sinon détection complète
+        method = "track"
+        box, tracking_score = (None, 0.0)
+        if self.box is not None and self.frames_since_detection < self.REDETECT_INTERVAL:
+            box, tracking_score = self._track(gray)
+            self.frames_since_detection += 1
+
+        if box is None:
+            method = "detect"
+            box = self._detect(rgb)
+            self.frames_since_detection = 0
+
+        self.box = box
+        if box is not None:
+            x, y, w, h = box
+            self.template = gray[y:y + h, x:x + w].copy()
+            area_ratio = (w * h) / (img_w * img_h)
+            center_x, center_y = x + w / 2, y + h / 2
+            center_offset = max(abs(center_x / img_w - 0.5), abs(center_y / img_h - 0.5))
+            brightness = float(gray[y:y + h, x:x + w].mean())
+        else:
+            self.template = None
+            area_ratio, center_offset, brightness = 0.0, 1.0, self.smoothed["brightness"]
+
+        presence = self._smooth("presence", 1.0 if box is not None else 0.0)
+        area_ratio = self._smooth("area_ratio", area_ratio)
+        center_offset = self._smooth("center_offset", center_offset)
+        brightness = self._smooth("brightness", brightness)
+
+        # Conseil pour l'utilisateur, par ordre de priorité
+        if presence < 0.5:
+            is_good, message = False, "Placez votre visage face à la caméra"
+        elif area_ratio < self.MIN_FACE_AREA_RATIO:
+            is_good, message = False, "Rapprochez-vous de la caméra"
+        elif area_ratio > self.MAX_FACE_AREA_RATIO:
+            is_good, message = False, "Reculez un peu de la caméra"
+        elif center_offset > self.MAX_CENTER_OFFSET:
+            is_good, message = False, "Centrez votre visage dans le cadre"
+        elif brightness < self.MIN_BRIGHTNESS:
+            is_good, message = False, "Éclairage trop faible, placez-vous face à la lumière"
+        elif brightness > self.MAX_BRIGHTNESS:
+            is_good, message = False, "Image surexposée, évitez la lumière directe"
+        else:
+            is_good, message = True, "Parfait, ne bougez plus..."
+
+        self.stable_frames = self.stable_frames + 1 if is_good and box is not None else 0
+        ready = self.stable_frames >= self.STABLE_FRAMES_REQUIRED
+
+        return {
+            "face_detected": box is not None,
+            "face_box": [int(round(v / scale)) for v in box] if box is not None else None,
+            "method": method,
+            "tracking_score": round(tracking_score, 3),
+            "scores": {
+                "presence": round(presence, 3),
+                "area_ratio": round(area_ratio, 3),
+                "center_offset": round(center_offset, 3),
+                "brightness": round(brightness, 1)
+            },
+            "message": message,
+            "stable_frames": self.stable_frames,
+            "ready": ready
+        }
@@ -0,0 +1,84 @@
+# services/model_loader.py - Chargement paresseux et partagé du modèle CLIP
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+# Copie safetensors préparée au build Docker (chargée en mmap, sans copie complète en mémoire)
+CLIP_MODEL_PATH = os.getenv("CLIP_MODEL_PATH", "/opt/models/clip-vit-base-patch32")
+
+# Temps de démarrage, exposés par /api/startup
+startup_timings = {
+    "heavy_imports_seconds": None,
+    "model_load_seconds": None,
+    "model_source": None
+}
+
+_clips = {}
+_lock = threading.Lock()
+
+
+def get_clip(model_path: str = None):
+    """
+    Retourne (processor, model, device), chargés une seule fois pour tout le processus
+
+    torch et transformers ne sont importés qu'ici : les endpoints légers (/health,
+    /api/skin-types...) ne les chargent jamais. FaceValidator et SkincareAnalyzer
+    partagent la même instance du modèle.
+
+    model_path: autre variante de CLIP (dossier local ou id du hub), ex. candidat
+    de l'évaluation shadow ; une instance est gardée par variante.
+    """
+    key = model_path or CLIP_MODEL_PATH
+    clip = _clips.get(key)
+    if clip is not None:
+        return clip
+
+    with _lock:
+        clip = _clips.get(key)
+        if clip is not None:
+            return clip
+        is_default = key == CLIP_MODEL_PATH
+
+        start = time.perf_counter()
+        import torch
+        from transformers import CLIPProcessor, CLIPModel
+        if is_default:
+            startup_timings["heavy_imports_seconds"] = round(time.perf_counter() - start, 3)
+
+        # torch vient d'être importé : appliquer la politique de threads courante
+        from services.threading_policy import threading_policy
+        threading_policy.apply()
+
+        start = time.perf_counter()
+        if os.path.isdir(key):
+            source = key
+            logger.info(f"Chargement de CLIP depuis {source} (safetensors mmap)...")
+            processor = CLIPProcessor.from_pretrained(source, local_files_only=True)
+            model = CLIPModel.from_pretrained(source, local_files_only=True, use_safetensors=True, low_cpu_mem_usage=True)
+        else:
+            source = CLIP_MODEL_ID if is_default else key
+            logger.info(f"Chargement de CLIP depuis le hub ({source})...")
+            processor = CLIPProcessor.from_pretrained(source)
+            model = CLIPModel.from_pretrained(source, low_cpu_mem_usage=True)
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        if device == "cuda":
+            model = model.to(device)
+        model.eval()
+
+        load_seconds = round(time.perf_counter() - start, 3)
+        if is_default:
+            startup_timings["model_load_seconds"] = load_seconds
+            startup_timings["model_source"] = source
+        logger.info(f"Modèle CLIP chargé en {load_seconds}s depuis {source} (device: {device})")
+
+        clip = _clips[key] = (processor, model, device)
+        return clip
+
+
+def is_clip_loaded() -> bool:
+    return CLIP_MODEL_PATH in _clips
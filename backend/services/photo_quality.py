@@ -0,0 +1,137 @@
+# services/photo_quality.py - Contrôle qualité de la photo avant tout passage dans les modèles
+from PIL import Image
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoQualityChecker:
+    """
+    Rejette en quelques millisecondes les photos floues, sombres, surexposées
+    ou sans contraste, et signale (sans rejeter) une forte dominante de couleur.
+
+    Toutes les mesures sont calculées sur une copie réduite de l'image, avant la
+    détection de visage et CLIP.
+
+    La dominante de couleur est mesurée sur une référence neutre : les pixels les
+    moins saturés du bord de l'image (le fond). La moyenne de toute l'image
+    prendrait la couleur de la peau pour une dominante (gros plans, peaux foncées).
+    Un mur coloré sous une lumière neutre est indiscernable d'un mur gris sous une
+    lumière colorée : la dominante n'est donc qu'un avertissement, jamais un rejet.
+    """
+
+    def __init__(self):
+        self.WORKING_SIZE = 256              # Plus grand côté de la copie analysée
+
+        # Seuils de qualité
+        self.MIN_SHARPNESS = 15.0            # Variance du Laplacien (flou en dessous, volontairement prudent)
+        self.MIN_MEAN_BRIGHTNESS = 45        # Luminosité moyenne (0-255)
+        self.MAX_MEAN_BRIGHTNESS = 220
+        self.MAX_DARK_CLIPPED_RATIO = 0.5    # Part de pixels quasi noirs (<= 10)
+        self.MAX_BRIGHT_CLIPPED_RATIO = 0.35 # Part de pixels brûlés (>= 245)
+        self.MIN_CONTRAST = 18.0             # Écart-type des niveaux de gris
+        self.MAX_COLOR_CAST = 30.0           # Chroma LAB (a*, b*) de la référence neutre (avertissement)
+
+        # Référence neutre de la dominante de couleur
+        self.BORDER_RATIO = 0.15             # Largeur du bord (part de chaque côté)
+        self.NEUTRAL_FRACTION = 0.5          # Part la moins saturée des pixels du bord retenue
+
+    def _downscale(self, pil_image: Image.Image) -> np.ndarray:
+        width, height = pil_image.size
+        scale = min(1.0, self.WORKING_SIZE / max(width, height))
+        if scale < 1.0:
+            pil_image = pil_image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.BILINEAR, reducing_gap=2.0)
+        return np.asarray(pil_image.convert("RGB"), dtype=np.float32)
+
+    def measure(self, pil_image: Image.Image) -> dict:
+        """Mesures brutes : netteté, exposition, contraste et dominante de couleur"""
+        import cv2
+
+        rgb = self._downscale(pil_image)
+        # Luminance ITU-R BT.601, identique à cv2.COLOR_RGB2GRAY
+        gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+        histogram = np.bincount(np.clip(gray, 0, 255).astype(np.uint8).ravel(), minlength=256)
+        total = histogram.sum()
+
+        return {
+            "sharpness": float(cv2.Laplacian(gray, cv2.CV_32F).var()),
+            "brightness": float(gray.mean()),
+            "dark_clipped_ratio": float(histogram[:11].sum() / total),
+            "bright_clipped_ratio": float(histogram[245:].sum() / total),
+            "contrast": float(gray.std()),
+            "color_cast": self._color_cast(rgb)
+        }
+
+    def _color_cast(self, rgb: np.ndarray) -> float:
+        """Chroma LAB moyenne des pixels les moins saturés du bord (0 = neutre)"""
+        import cv2
+
+        height, width = rgb.shape[:2]
+        bh, bw = max(1, int(height * self.BORDER_RATIO)), max(1, int(width * self.BORDER_RATIO))
+        border = np.concatenate([
+            rgb[:bh].reshape(-1, 3),
+            rgb[height - bh:].reshape(-1, 3),
+            rgb[bh:height - bh, :bw].reshape(-1, 3),
+            rgb[bh:height - bh, width - bw:].reshape(-1, 3)
+        ])
+
+        # Pixels écrêtés (quasi noirs ou brûlés) : leur couleur ne dit rien de l'éclairage
+        peak = border.max(axis=1)
+        usable = border[(peak > 10) & (peak < 250)]
+        if len(usable) < 0.05 * len(border):
+            return 0.0
+
+        lab = cv2.cvtColor((usable / 255.0).reshape(-1, 1, 3), cv2.COLOR_RGB2LAB).reshape(-1, 3)
+        chroma = np.hypot(lab[:, 1], lab[:, 2])
+        count = max(1, int(len(chroma) * self.NEUTRAL_FRACTION))
+        neutral = lab[np.argpartition(chroma, count - 1)[:count]]
+        return float(np.hypot(neutral[:, 1].mean(), neutral[:, 2].mean()))
+
+    def assess(self, pil_image: Image.Image) -> dict:
+        """
+        Évalue la qualité de la photo
+
+        Returns:
+            dict: is_acceptable, premier problème (raison + conseil), avertissements
+            non bloquants et mesures
+        """
+        metrics = self.measure(pil_image)
+
+        # Par ordre de priorité : le conseil le plus utile en premier
+        issues = []
+        if metrics["brightness"] < self.MIN_MEAN_BRIGHTNESS or metrics["dark_clipped_ratio"] > self.MAX_DARK_CLIPPED_RATIO:
+            issues.append(("too_dark", "La photo est trop sombre",
+                           "Placez-vous face à une source de lumière naturelle et reprenez la photo"))
+        if metrics["brightness"] > self.MAX_MEAN_BRIGHTNESS or metrics["bright_clipped_ratio"] > self.MAX_BRIGHT_CLIPPED_RATIO:
+            issues.append(("overexposed", "La photo est surexposée",
+                           "Évitez la lumière directe ou le flash et reprenez la photo"))
+        if metrics["sharpness"] < self.MIN_SHARPNESS:
+            issues.append(("blurry", "La photo est floue",
+                           "Tenez l'appareil immobile, faites la mise au point sur votre visage et reprenez la photo"))
+        if metrics["contrast"] < self.MIN_CONTRAST:
+            issues.append(("low_contrast", "La photo manque de contraste",
+                           "Évitez le contre-jour et les éclairages diffus trop faibles"))
+
+        # Avertissements : la photo reste analysée
+        warnings = []
+        if metrics["color_cast"] > self.MAX_COLOR_CAST:
+            warnings.append(("color_cast", "Les couleurs de la photo semblent altérées",
+                             "Si l'éclairage est coloré, préférez une lumière blanche ou naturelle"))
+
+        result = {
+            "is_acceptable": not issues,
+            "issues": [issue[0] for issue in issues],
+            "warnings": [warning[0] for warning in warnings],
+            "metrics": {key: round(value, 3) for key, value in metrics.items()}
+        }
+        if issues:
+            result["reason"], result["suggestion"] = issues[0][1], issues[0][2]
+        elif warnings:
+            result["warning"], result["suggestion"] = warnings[0][1], warnings[0][2]
+        return result
+
+
+# Instance globale
+photo_quality_checker = PhotoQualityChecker()
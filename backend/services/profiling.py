@@ -0,0 +1,144 @@
+# services/profiling.py - Profilage à la demande d'une analyse
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """
+    Profile une requête /api/analyze avec cProfile et le profiler torch.
+
+    Le profilage est activé soit par l'en-tête X-Profile-Token (doit correspondre
+    à PROFILING_TOKEN), soit par échantillonnage (PROFILING_SAMPLE_RATE).
+    Les requêtes non profilées ne paient qu'une comparaison de chaînes.
+    Les profils sont gardés en mémoire, indexés par analysis_id.
+    """
+
+    def __init__(self):
+        self.PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")                      # None = en-tête désactivé
+        self.SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))       # 0.0 à 1.0
+        self.MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "20"))      # Profils conservés
+        self.TOP_FUNCTIONS = 40                                                  # Lignes de stats cProfile
+
+        self.profiles = OrderedDict()
+        self.active = False                                                      # Un seul profil à la fois
+        self.lock = threading.Lock()
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        """Vérifie l'en-tête privilégié (comparaison à temps constant)"""
+        return bool(self.PROFILING_TOKEN and token and secrets.compare_digest(token, self.PROFILING_TOKEN))
+
+    def should_profile(self, token: Optional[str]) -> bool:
+        if self.is_authorized(token):
+            return True
+        return self.SAMPLE_RATE > 0 and random.random() < self.SAMPLE_RATE
+
+    @contextmanager
+    def profile(self, analysis_id: str):
+        """
+        Profile le bloc exécuté et enregistre le résultat sous analysis_id
+
+        Produit True si le bloc est profilé (profil enregistré à la sortie), False
+        si un autre profil est déjà en cours.
+
+        Note: à utiliser dans le thread d'analyse (cProfile ne mesure que son
+        thread) : seul le pipeline de cette requête est enregistré.
+        """
+        with self.lock:
+            busy = self.active
+            self.active = True
+        if busy:
+            # Un seul profileur actif à la fois par processus (Python 3.12+)
+            logger.warning(f"Profilage ignoré pour {analysis_id}: un autre profil est en cours")
+            yield False
+            return
+
+        try:
+            import torch.profiler as torch_profiler
+            torch_prof = torch_profiler.profile(
+                activities=[torch_profiler.ProfilerActivity.CPU],
+                record_shapes=True
+            )
+        except Exception as e:
+            logger.warning(f"Profiler torch indisponible: {str(e)}")
+            torch_prof = None
+
+        cprof = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            if torch_prof is not None:
+                try:
+                    torch_prof.__enter__()
+                except Exception as e:
+                    logger.warning(f"Profiler torch non démarré: {str(e)}")
+                    torch_prof = None
+            cprof.enable()
+            yield True
+        finally:
+            cprof.disable()
+            try:
+                if torch_prof is not None:
+                    try:
+                        torch_prof.__exit__(None, None, None)
+                    except Exception as e:
+                        logger.warning(f"Profiler torch non arrêté: {str(e)}")
+                        torch_prof = None
+                duration = time.perf_counter() - start
+                self._store(analysis_id, duration, cprof, torch_prof)
+            finally:
+                # Toujours libéré, même si l'arrêt ou l'export du profil échoue
+                with self.lock:
+                    self.active = False
+
+    def _store(self, analysis_id: str, duration: float, cprof: cProfile.Profile, torch_prof):
+        stream = io.StringIO()
+        pstats.Stats(cprof, stream=stream).sort_stats("cumulative").print_stats(self.TOP_FUNCTIONS)
+
+        torch_table = None
+        if torch_prof is not None:
+            try:
+                torch_table = torch_prof.key_averages().table(sort_by="cpu_time_total", row_limit=25)
+            except Exception as e:
+                torch_table = f"Erreur export profiler torch: {str(e)}"
+
+        entry = {
+            "analysis_id": analysis_id,
+            "duration_seconds": round(duration, 4),
+            "created_at": time.time(),
+            "cprofile": stream.getvalue(),
+            "torch": torch_table
+        }
+        # Lu par /api/profiles pendant qu'un thread d'analyse enregistre
+        with self.lock:
+            self.profiles[analysis_id] = entry
+            while len(self.profiles) > self.MAX_PROFILES:
+                self.profiles.popitem(last=False)
+
+        logger.info(f"🔬 Profil enregistré pour {analysis_id} ({duration:.2f}s)")
+
+    def get(self, analysis_id: str) -> Optional[dict]:
+        with self.lock:
+            return self.profiles.get(analysis_id)
+
+    def list(self) -> list:
+        with self.lock:
+            profiles = list(self.profiles.values())
+        return [
+            {"analysis_id": p["analysis_id"], "duration_seconds": p["duration_seconds"], "created_at": p["created_at"]}
+            for p in profiles
+        ]
+
+
+# Instance globale
+request_profiler = RequestProfiler()
@@ -0,0 +1,106 @@
+# services/response_shaping.py - Réponses allégées (verbose, sélection de champs) et compression
+import logging
+from typing import Optional
+
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Champs détaillés retirés quand verbose=false
+ANALYSIS_VERBOSE_FIELDS = {
+    "skin_type": {"all_scores"},
+    "skin_condition": {"all_scores"},
+    "detailed_scores": True
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[dict]:
+    """
+    "id,skin_type.category,problems_detected" -> {"id": True, "skin_type": {"category": True}, ...}
+    """
+    if not fields:
+        return None
+    selection = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = selection
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return selection or None
+
+
+def select_fields(data, selection: dict):
+    """Ne garde que les champs sélectionnés ; la sélection s'applique à chaque élément des listes"""
+    if isinstance(data, list):
+        return [select_fields(item, selection) for item in data]
+    if not isinstance(data, dict):
+        return data
+    selected = {}
+    for key, sub_selection in selection.items():
+        if key in data:
+            selected[key] = data[key] if sub_selection is True else select_fields(data[key], sub_selection)
+    return selected
+
+
+def shape_analysis(response, verbose: bool = True, fields: Optional[str] = None) -> dict:
+    """Sérialise une analyse (modèle ou dict) en ne produisant que ce que le client utilise"""
+    if isinstance(response, BaseModel):
+        exclude = None if verbose else {key: value for key, value in ANALYSIS_VERBOSE_FIELDS.items() if key in type(response).model_fields}
+        data = response.model_dump(mode="json", exclude=exclude)
+    else:
+        data = dict(response)
+        if not verbose:
+            for key, value in ANALYSIS_VERBOSE_FIELDS.items():
+                if value is True:
+                    data.pop(key, None)
+                elif isinstance(data.get(key), dict):
+                    data[key] = {k: v for k, v in data[key].items() if k not in value}
+
+    selection = parse_fields(fields)
+    return select_fields(data, selection) if selection else data
+
+
+def shape_validation(validation_result: dict, verbose: bool = True) -> dict:
+    """Sans verbose : verdict et conseil, sans boîtes OpenCV ni scores de chaque prompt"""
+    if verbose:
+        return validation_result
+    details = validation_result.get("details", {})
+    return {
+        "is_valid": validation_result["is_valid"],
+        "reason": validation_result.get("reason"),
+        "suggestion": validation_result.get("suggestion"),
+        "details": {"validation_passed": details.get("validation_passed", {})}
+    }
+
+
+class CompressionMiddleware:
+    """
+    Compresse les réponses volumineuses (brotli si brotli-asgi est installé, gzip sinon)
+
+    Les flux Server-Sent Events ne sont jamais compressés : chaque événement doit
+    partir immédiatement.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000):
+        self.app = app
+        try:
+            from brotli_asgi import BrotliMiddleware
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+            self.encoding = "br"
+        except ImportError:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+            self.encoding = "gzip"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].endswith("/events"):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -0,0 +1,176 @@
+# services/shadow_evaluation.py - Évaluation shadow d'un pipeline candidat sur le trafic réel
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_thread_priority():
+    """Thread shadow en priorité basse : le trafic de production passe toujours avant"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+class ShadowEvaluator:
+    """
+    Rejoue un échantillon des analyses de production sur un pipeline candidat
+    (autre variante de CLIP, autre backend ou autres seuils) et agrège l'accord
+    avec la réponse servie.
+
+    Les images ne sont gardées qu'en mémoire le temps de l'évaluation. Le travail
+    shadow tourne sur un executor dédié de basse priorité, après que la réponse
+    de production a été calculée : il n'ajoute jamais de latence à l'utilisateur.
+    Si l'executor est saturé, l'échantillon est simplement ignoré.
+    """
+
+    def __init__(self):
+        # Configuration (désactivé tant que SHADOW_SAMPLE_RATE vaut 0)
+        self.SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0"))
+        self.CANDIDATE_BACKEND = os.getenv("SHADOW_CLIP_BACKEND", "local")
+        self.CANDIDATE_MODEL_PATH = os.getenv("SHADOW_CLIP_MODEL_PATH")
+        self.CANDIDATE_PROBLEM_THRESHOLD = os.getenv("SHADOW_PROBLEM_THRESHOLD")
+        self.MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "4"))
+        self.LATENCY_WINDOW = 1000           # Dernières mesures gardées pour les percentiles
+
+        self.lock = threading.Lock()
+        self.executor = None
+        self.candidate = None
+        self.pending = 0
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.SAMPLE_RATE > 0
+
+    def reset(self):
+        with self.lock:
+            self.counts = {"sampled": 0, "skipped": 0, "completed": 0, "errors": 0, "skin_type_agreements": 0}
+            self.problem_jaccard_sum = 0.0
+            self.production_latency = deque(maxlen=self.LATENCY_WINDOW)
+            self.candidate_latency = deque(maxlen=self.LATENCY_WINDOW)
+
+    def _get_candidate(self):
+        """Analyseur candidat, construit au premier échantillon dans le thread shadow"""
+        if self.candidate is None:
+            from services.clip_backend import create_clip_backend
+            from services.skincare_analysis import SkincareAnalyzer
+
+            candidate = SkincareAnalyzer()
+            candidate.clip_backend = create_clip_backend(self.CANDIDATE_BACKEND, self.CANDIDATE_MODEL_PATH)
+            if self.CANDIDATE_PROBLEM_THRESHOLD:
+                candidate.PROBLEM_DETECTION_THRESHOLD = float(self.CANDIDATE_PROBLEM_THRESHOLD)
+            self.candidate = candidate
+            logger.info(f"🕶️ Pipeline candidat shadow prêt (backend {candidate.clip_backend.name})")
+        return self.candidate
+
+    def maybe_submit(self, pil_image: Image.Image, analysis_id: str, production_result: dict, production_seconds: float) -> bool:
+        """Soumet l'analyse à l'évaluation shadow selon le taux d'échantillonnage (non bloquant, ne lève jamais)"""
+        if not self.enabled or random.random() >= self.SAMPLE_RATE:
+            return False
+
+        with self.lock:
+            if self.pending >= self.MAX_PENDING:
+                self.counts["skipped"] += 1
+                return False
+            self.pending += 1
+            self.counts["sampled"] += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow", initializer=_lower_thread_priority)
+
+        try:
+            production = {
+                "skin_type": production_result.get("skin_type", {}).get("category"),
+                "problems": {p["condition"] for p in production_result.get("problems_detected", [])},
+                "seconds": production_seconds
+            }
+            self.executor.submit(self._evaluate, pil_image, analysis_id, production)
+        except Exception as e:
+            # Executor arrêté (extinction), résultat inattendu... : jamais d'effet sur la réponse
+            with self.lock:
+                self.pending -= 1
+                self.counts["errors"] += 1
+            logger.warning(f"⚠️ Évaluation shadow non soumise: {str(e)}")
+            return False
+        return True
+
+    def _evaluate(self, pil_image: Image.Image, analysis_id: str, production: dict):
+        try:
+            candidate = self._get_candidate()
+            start = time.perf_counter()
+            result = asyncio.run(candidate.analyze_skin_from_memory(pil_image, analysis_id))
+            candidate_seconds = time.perf_counter() - start
+            if "error" in result:
+                raise RuntimeError(result["error"])
+
+            skin_type = result["skin_type"]["category"]
+            problems = {p["condition"] for p in result["problems_detected"]}
+            union = production["problems"] | problems
+            jaccard = len(production["problems"] & problems) / len(union) if union else 1.0
+
+            with self.lock:
+                self.counts["completed"] += 1
+                self.counts["skin_type_agreements"] += int(skin_type == production["skin_type"])
+                self.problem_jaccard_sum += jaccard
+                self.production_latency.append(production["seconds"])
+                self.candidate_latency.append(candidate_seconds)
+
+            logger.debug(
+                "Shadow %s: type %s/%s, problèmes jaccard %.2f, %.0fms vs %.0fms",
+                analysis_id, production["skin_type"], skin_type, jaccard,
+                production["seconds"] * 1000, candidate_seconds * 1000
+            )
+        except Exception as e:
+            with self.lock:
+                self.counts["errors"] += 1
+            logger.warning(f"⚠️ Évaluation shadow échouée: {str(e)}")
+        finally:
+            del pil_image
+            with self.lock:
+                self.pending -= 1
+
+    @staticmethod
+    def _latency_stats(values) -> dict:
+        if not values:
+            return {"p50_ms": None, "p95_ms": None}
+        p50, p95 = np.percentile(np.asarray(values) * 1000, [50, 95])
+        return {"p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1)}
+
+    def metrics(self) -> dict:
+        """Accord et vitesse agrégés du candidat par rapport à la production"""
+        with self.lock:
+            completed = self.counts["completed"]
+            production = self._latency_stats(self.production_latency)
+            candidate = self._latency_stats(self.candidate_latency)
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.SAMPLE_RATE,
+                "candidate": {
+                    "backend": self.CANDIDATE_BACKEND,
+                    "model_path": self.CANDIDATE_MODEL_PATH,
+                    "problem_threshold": self.CANDIDATE_PROBLEM_THRESHOLD
+                },
+                **self.counts,
+                "pending": self.pending,
+                "skin_type_agreement": round(self.counts["skin_type_agreements"] / completed, 4) if completed else None,
+                "problems_mean_jaccard": round(self.problem_jaccard_sum / completed, 4) if completed else None,
+                "latency": {
+                    "production": production,
+                    "candidate": candidate,
+                    "p50_ratio": round(candidate["p50_ms"] / production["p50_ms"], 3) if completed and production["p50_ms"] else None
+                }
+            }
+
+
+# Instance globale
+shadow_evaluator = ShadowEvaluator()
@@ -1,21 +1,20 @@
 # services/skincare_analysis.py - Version mémoire sans fichiers
 from PIL import Image
-import cv2
 import numpy as np
-from transformers import CLIPProcessor, CLIPModel
-import torch
 import logging
+from services.face_detection import get_face_detector
+from services.clip_backend import get_clip_backend, normalize_for_clip, preprocess_for_clip, softmax
+from services.buffer_pool import buffer_pool
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def passes_detection_threshold(score, threshold):
+    """Règle des seuils de détection des problèmes : score strictement supérieur au seuil, scalaires ou tableaux"""
+    return score > threshold
+
 class SkincareAnalyzer:
     def __init__(self):
-        self.processor = None
-        self.model = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Utilisation du device: {self.device}")
+        self.clip_backend = None  # Local ou serveur d'inférence (CLIP_BACKEND)
 
         # Types de peau et problèmes à détecter
         self.skin_types = [
@@ -39,6 +38,10 @@ class SkincareAnalyzer:
             "brillance excessive"
         ]
 
+        # Seuil de détection des problèmes (probabilité "avec" vs "sans")
+        self.PROBLEM_DETECTION_THRESHOLD = 0.3
+        self.FAST_MODE_TOP_PROBLEMS = 3          # Problèmes renvoyés en mode rapide
+
         self.skin_conditions = [
             "peau lisse",
             "peau rugueuse",
@@ -50,34 +53,46 @@ class SkincareAnalyzer:
 
     def load_model(self):
         """Charge le modèle CLIP de manière lazy"""
-        if self.processor is None or self.model is None:
-            logger.info("Chargement du modèle CLIP...")
-            self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-
-            # Déplacer le modèle sur GPU si disponible
-            if self.device == "cuda":
-                self.model = self.model.to(self.device)
+        if self.clip_backend is None:
+            # Backend partagé avec FaceValidator (une seule copie des poids)
+            self.clip_backend = get_clip_backend()
+
+    def preprocess_pil_image(self, pil_image: Image.Image, analysis_id: str, face_boxes: list = None):
+        """
+        Prétraitement d'une image PIL directement en mémoire
+
+        face_boxes: boîtes (x, y, w, h) déjà détectées (validation), sinon détectées ici
+        """
+        with buffer_pool.borrow() as buffers:
+            crop = self._preprocess_into(buffers, pil_image, analysis_id, face_boxes)
+            # Retourner l'image originale en cas d'erreur ; fromarray copie les pixels RGB,
+            # le buffer peut retourner au pool
+            return pil_image if crop is None else Image.fromarray(crop)
+
+    def _preprocess_into(self, buffers, pil_image: Image.Image, analysis_id: str, face_boxes: list = None):
+        """
+        Recadrage du visage, redimensionnement 224x224, débruitage et contraste, écrits
+        dans les buffers empruntés (aucune allocation à taille fixe)
+
+        Returns:
+            np.ndarray: buffers.crop (224, 224, 3) RGB, ou None en cas d'erreur
+        """
+        import cv2
 
-            logger.info("Modèle CLIP chargé avec succès")
-
-    def preprocess_pil_image(self, pil_image: Image.Image, analysis_id: str):
-        """Prétraitement d'une image PIL directement en mémoire"""
         try:
-            # Convertir PIL en array numpy pour OpenCV
-            img_array = np.array(pil_image)
-            img = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+            # Vue numpy de l'image PIL ; tout le prétraitement reste en RGB
+            # (filtre bilatéral et CLAHE sur L donnent le même résultat qu'en BGR)
+            img = np.asarray(pil_image)
 
-            logger.info(f"Image originale: {img.shape}")
+            logger.debug("Image originale: %s", img.shape)
 
             # Détection de visage pour cropper la zone d'intérêt
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+            if face_boxes is None:
+                face_boxes = [face["box"] for face in get_face_detector().detect(img)]
 
             # Si un visage est détecté, on crop autour
-            if len(faces) > 0:
-                (x, y, w, h) = faces[0]  # Prendre le premier visage
+            if len(face_boxes) > 0:
+                (x, y, w, h) = face_boxes[0]  # Prendre le plus grand visage
                 # Agrandir la zone pour inclure plus de peau
                 margin = int(0.2 * max(w, h))
                 x1 = max(0, x - margin)
@@ -86,146 +101,176 @@ class SkincareAnalyzer:
                 y2 = min(img.shape[0], y + h + margin)
 
                 img = img[y1:y2, x1:x2]
-                logger.info(f"Visage détecté et cropé pour l'analyse: {img.shape}")
+                logger.debug("Visage détecté et cropé pour l'analyse: %s", img.shape)
 
-            # Redimensionner
-            target_size = 224  # Taille optimale pour CLIP
-            img = cv2.resize(img, (target_size, target_size))
+            # Redimensionner (taille optimale pour CLIP, celle des buffers)
+            cv2.resize(img, buffers.resized.shape[1::-1], dst=buffers.resized)
 
             # Améliorer les détails de la peau
             # Réduction du bruit tout en préservant les détails
-            img = cv2.bilateralFilter(img, 9, 75, 75)
-
-            # Amélioration légère du contraste
-            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
-            cl = clahe.apply(l)
-            enhanced_img = cv2.merge((cl, a, b))
-            enhanced_img = cv2.cvtColor(enhanced_img, cv2.COLOR_LAB2BGR)
+            cv2.bilateralFilter(buffers.resized, 9, 75, 75, dst=buffers.filtered)
 
-            # Reconvertir en PIL pour CLIP
-            enhanced_img_rgb = cv2.cvtColor(enhanced_img, cv2.COLOR_BGR2RGB)
-            processed_pil = Image.fromarray(enhanced_img_rgb)
+            # Amélioration légère du contraste (luminance seulement)
+            if buffers.clahe is None:
+                buffers.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+            cv2.cvtColor(buffers.filtered, cv2.COLOR_RGB2LAB, dst=buffers.lab)
+            cv2.extractChannel(buffers.lab, 0, dst=buffers.luminance)
+            buffers.clahe.apply(buffers.luminance, dst=buffers.equalized)
+            cv2.insertChannel(buffers.equalized, buffers.lab, 0)
+            cv2.cvtColor(buffers.lab, cv2.COLOR_LAB2RGB, dst=buffers.crop)
 
-            logger.info(f"Image prétraitée: {processed_pil.size} (ID: {analysis_id})")
-            return processed_pil
+            logger.debug("Image prétraitée: %s", buffers.crop.shape)
+            return buffers.crop
 
         except Exception as e:
             logger.error(f"Erreur lors du prétraitement: {str(e)}")
-            # Retourner l'image originale en cas d'erreur
-            return pil_image
+            return None
 
-    async def analyze_skin_from_memory(self, pil_image: Image.Image, analysis_id: str):
-        """Analyse la peau avec CLIP directement depuis une image PIL"""
+    async def analyze_skin_from_memory(self, pil_image: Image.Image, analysis_id: str, preprocessed: bool = False):
+        """
+        Analyse la peau avec CLIP directement depuis une image PIL
+
+        preprocessed: l'image est déjà le visage recadré et filtré (ticket de validation)
+        """
         try:
             # Charger le modèle
             self.load_model()
 
-            # Prétraitement
-            processed_image = self.preprocess_pil_image(pil_image, analysis_id)
+            # Prétraitement et normalisation dans des buffers du pool, puis une seule passe
+            # de l'encodeur d'image, réutilisée pour toutes les questions
+            with buffer_pool.borrow() as buffers:
+                crop = None if preprocessed else self._preprocess_into(buffers, pil_image, analysis_id)
+                if crop is None:
+                    # Image déjà prétraitée (ticket), ou image originale si le prétraitement a échoué
+                    preprocess_for_clip(pil_image, out=buffers.pixels[0])
+                else:
+                    normalize_for_clip(crop, out=buffers.pixels[0])
+                image_embeds = self.clip_backend.encode_images(buffers.pixels)
 
-            # Analyser le type de peau
-            skin_type = await self._classify_image(processed_image, self.skin_types, "Type de peau")
+            return await self.analyze_embeddings(image_embeds, analysis_id)
 
-            # Analyser les problèmes de peau
-            skin_problems = await self._detect_multiple_conditions(processed_image, self.skin_problems, "Problèmes détectés", threshold=0.3)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse: {str(e)}")
+            return {
+                "error": f"Erreur lors de l'analyse: {str(e)}",
+                "skin_type": {"category": "indéterminé", "confidence": 0.0, "all_scores": {}},
+                "problems_detected": [],
+                "skin_condition": {"category": "indéterminé", "confidence": 0.0, "all_scores": {}},
+                "confidence_note": "Erreur lors de l'analyse. Veuillez réessayer.",
+                "processing_method": "in_memory_error",
+                "analysis_id": analysis_id
+            }
 
-            # Analyser l'état général
-            skin_condition = await self._classify_image(processed_image, self.skin_conditions, "État de la peau")
+    async def analyze_embeddings(self, image_embeds: np.ndarray, analysis_id: str) -> dict:
+        """
+        Analyse complète à partir de l'embedding (1, D) de l'image déjà prétraitée
+        (utilisée aussi par l'analyse en masse, qui encode les images par lots)
+        """
+        self.load_model()
+
+        # Analyser le type de peau
+        skin_type = await self._classify_image(image_embeds, self.skin_types, "Type de peau")
+
+        # Analyser les problèmes de peau
+        problem_scores = self._problem_probabilities(image_embeds, self.skin_problems)
+        skin_problems = await self._detect_multiple_conditions(problem_scores, self.skin_problems, "Problèmes détectés", threshold=self.PROBLEM_DETECTION_THRESHOLD)
+
+        # Analyser l'état général
+        skin_condition = await self._classify_image(image_embeds, self.skin_conditions, "État de la peau")
+
+        # Compiler les résultats
+        analysis_result = {
+            "skin_type": skin_type,
+            "problems_detected": skin_problems,
+            "skin_condition": skin_condition,
+            # Usage interne (historique) : jamais renvoyés tels quels au client
+            "problem_scores": {p: float(score) for p, score in zip(self.skin_problems, problem_scores)},
+            "image_embedding": image_embeds[0],
+            "confidence_note": "Analyse basée sur l'intelligence artificielle CLIP. Traitement 100% en mémoire pour une confidentialité maximale. Pour un diagnostic précis, consultez un dermatologue.",
+            "processing_method": "in_memory",
+            "analysis_id": analysis_id
+        }
+
+        return analysis_result
+
+    async def analyze_skin_fast(self, image_embeds: np.ndarray, analysis_id: str):
+        """
+        Analyse rapide : type de peau et principaux problèmes à partir d'un embedding
+        déjà calculé (celui de la validation), sans second passage dans le modèle
+        """
+        try:
+            self.load_model()
+
+            skin_type = await self._classify_image(image_embeds, self.skin_types, "Type de peau")
+            problem_scores = self._problem_probabilities(image_embeds, self.skin_problems)
+            skin_problems = await self._detect_multiple_conditions(problem_scores, self.skin_problems, "Problèmes détectés", threshold=self.PROBLEM_DETECTION_THRESHOLD)
 
-            # Compiler les résultats
-            analysis_result = {
+            return {
                 "skin_type": skin_type,
-                "problems_detected": skin_problems,
-                "skin_condition": skin_condition,
-                "confidence_note": "Analyse basée sur l'intelligence artificielle CLIP. Traitement 100% en mémoire pour une confidentialité maximale. Pour un diagnostic précis, consultez un dermatologue.",
-                "processing_method": "in_memory",
+                "problems_detected": skin_problems[:self.FAST_MODE_TOP_PROBLEMS],
+                "confidence_note": "Analyse rapide (dépistage) basée sur CLIP. Demandez l'analyse complète pour l'état de la peau et les recommandations. Pour un diagnostic précis, consultez un dermatologue.",
+                "processing_method": "in_memory_fast",
                 "analysis_id": analysis_id
             }
 
-            # Nettoyage mémoire
-            del processed_image
-
-            return analysis_result
-
         except Exception as e:
-            logger.error(f"Erreur lors de l'analyse: {str(e)}")
+            logger.error(f"Erreur lors de l'analyse rapide: {str(e)}")
             return {
                 "error": f"Erreur lors de l'analyse: {str(e)}",
                 "skin_type": {"category": "indéterminé", "confidence": 0.0, "all_scores": {}},
                 "problems_detected": [],
-                "skin_condition": {"category": "indéterminé", "confidence": 0.0, "all_scores": {}},
                 "confidence_note": "Erreur lors de l'analyse. Veuillez réessayer.",
                 "processing_method": "in_memory_error",
                 "analysis_id": analysis_id
             }
 
-    async def _classify_image(self, image: Image.Image, categories, category_name):
-        """Classifie l'image parmi les catégories données"""
+    async def _classify_image(self, image_embeds: np.ndarray, categories, category_name):
+        """Classifie l'image (embedding CLIP) parmi les catégories données"""
         try:
-            # Préparer les inputs
-            inputs = self.processor(text=categories, images=image, return_tensors="pt", padding=True)
-
-            # Déplacer sur GPU si disponible
-            if self.device == "cuda":
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            # Calcul des similarités
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1)
+            # Calcul des similarités (embeddings des catégories mis en cache)
+            probs = self.clip_backend.similarity(image_embeds, categories)[0]
 
             # Trouver la catégorie avec la plus haute probabilité
-            max_prob_idx = probs.argmax().item()
-            max_prob = probs.max().item()
+            max_prob_idx = int(probs.argmax())
 
             result = {
                 "category": categories[max_prob_idx],
-                "confidence": float(max_prob),
-                "all_scores": {categories[i]: float(probs[0][i]) for i in range(len(categories))}
+                "confidence": float(probs[max_prob_idx]),
+                "all_scores": {categories[i]: float(probs[i]) for i in range(len(categories))}
             }
 
-            logger.info(f"{category_name}: {result['category']} (confiance: {result['confidence']:.2f})")
+            logger.debug("%s: %s (confiance: %.2f)", category_name, result['category'], result['confidence'])
             return result
 
         except Exception as e:
             logger.error(f"Erreur lors de la classification {category_name}: {str(e)}")
             return {"category": "indéterminé", "confidence": 0.0, "all_scores": {}}
 
-    async def _detect_multiple_conditions(self, image: Image.Image, conditions, category_name, threshold=0.25):
-        """Détecte plusieurs conditions simultanément avec un seuil"""
-        try:
-            detected = []
-
-            for condition in conditions:
-                # Créer un prompt binaire pour chaque condition
-                binary_prompt = [f"visage avec {condition}", f"visage sans {condition}"]
-
-                inputs = self.processor(text=binary_prompt, images=image, return_tensors="pt", padding=True)
+    def _problem_probabilities(self, image_embeds: np.ndarray, conditions) -> np.ndarray:
+        """Probabilité de présence de chaque condition (prompts binaires "avec" / "sans")"""
+        binary_prompts = []
+        for condition in conditions:
+            binary_prompts += [f"visage avec {condition}", f"visage sans {condition}"]
 
-                if self.device == "cuda":
-                    inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        text_embeds = self.clip_backend.encode_texts(binary_prompts)
+        logits = self.clip_backend.logit_scale * (image_embeds[0] @ text_embeds.T)
 
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                    logits_per_image = outputs.logits_per_image
-                    probs = logits_per_image.softmax(dim=1)
+        # Softmax par paire, toutes les conditions évaluées en une fois
+        return softmax(logits.reshape(len(conditions), 2))[:, 0]
 
-                # Probabilité que la condition soit présente
-                prob_present = probs[0][0].item()
-
-                if prob_present > threshold:
-                    detected.append({
-                        "condition": condition,
-                        "confidence": prob_present
-                    })
+    async def _detect_multiple_conditions(self, probs_present: np.ndarray, conditions, category_name, threshold=0.25):
+        """Détecte plusieurs conditions simultanément avec un seuil"""
+        try:
+            detected = [
+                {"condition": condition, "confidence": float(prob_present)}
+                for condition, prob_present in zip(conditions, probs_present)
+                if passes_detection_threshold(prob_present, threshold)
+            ]
 
             # Trier par confiance décroissante
             detected.sort(key=lambda x: x['confidence'], reverse=True)
 
-            logger.info(f"{category_name}: {len(detected)} conditions détectées")
+            logger.debug("%s: %d conditions détectées", category_name, len(detected))
             return detected
 
         except Exception as e:
@@ -236,9 +281,13 @@ class SkincareAnalyzer:
 skincare_analyzer = SkincareAnalyzer()
 
 # Nouvelle fonction pour traitement en mémoire
-async def analyze_skincare_from_memory(pil_image: Image.Image, analysis_id: str):
+async def analyze_skincare_from_memory(pil_image: Image.Image, analysis_id: str, preprocessed: bool = False):
     """Fonction wrapper pour l'analyse skincare en mémoire"""
-    return await skincare_analyzer.analyze_skin_from_memory(pil_image, analysis_id)
+    return await skincare_analyzer.analyze_skin_from_memory(pil_image, analysis_id, preprocessed)
+
+async def analyze_skincare_fast(image_embeds: np.ndarray, analysis_id: str):
+    """Fonction wrapper pour l'analyse rapide à partir d'un embedding existant"""
+    return await skincare_analyzer.analyze_skin_fast(image_embeds, analysis_id)
 
 # Ancienne fonction pour compatibilité (si besoin)
 async def analyze_skincare(image_path):
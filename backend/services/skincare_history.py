@@ -0,0 +1,260 @@
+# services/skincare_history.py - Historique d'analyses sans photos (embeddings + scores)
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Désactivé par défaut : l'historique n'est activé que si un chemin de base est configuré
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH")
+
+# Identifiant pseudonyme généré côté client : il sert aussi de secret d'accès
+HISTORY_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS score_labels (
+    id INTEGER PRIMARY KEY,
+    labels TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    labels_id INTEGER NOT NULL REFERENCES score_labels(id),
+    skin_type TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    scores BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_user ON analyses(user_id, created_at);
+"""
+
+
+class SkincareHistoryStore:
+    """
+    Historique opt-in des analyses d'un utilisateur.
+
+    Aucune photo n'est conservée : seulement l'embedding CLIP de l'image et le
+    vecteur de scores (types de peau, problèmes, états), en float16 (~1 Ko par
+    analyse). Les requêtes d'évolution sont calculées sur ces tableaux, sans
+    retraiter d'image.
+    """
+
+    def __init__(self, db_path: Optional[str] = HISTORY_DB_PATH, max_cached_users: int = 256,
+                 max_entries_per_user: int = 500):
+        self.DB_PATH = db_path
+        self.MAX_CACHED_USERS = max_cached_users
+        self.MAX_ENTRIES_PER_USER = max_entries_per_user   # Les plus anciennes sont supprimées
+
+        self.lock = threading.Lock()
+        self.connection = None
+        self.labels_ids = {}          # labels (tuple) -> id
+        self.cache = OrderedDict()    # user_id -> tableaux déjà décodés
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.DB_PATH)
+
+    @staticmethod
+    def is_valid_id(user_id: Optional[str]) -> bool:
+        return bool(user_id) and HISTORY_ID_PATTERN.match(user_id) is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.DB_PATH)), exist_ok=True)
+            connection = sqlite3.connect(self.DB_PATH, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self.connection = connection
+            logger.info(f"📚 Historique des analyses activé ({self.DB_PATH})")
+        return self.connection
+
+    def _labels_id(self, connection: sqlite3.Connection, labels: tuple) -> int:
+        labels_id = self.labels_ids.get(labels)
+        if labels_id is None:
+            encoded = json.dumps(labels, ensure_ascii=False)
+            connection.execute("INSERT OR IGNORE INTO score_labels (labels) VALUES (?)", (encoded,))
+            (labels_id,) = connection.execute("SELECT id FROM score_labels WHERE labels = ?", (encoded,)).fetchone()
+            self.labels_ids[labels] = labels_id
+        return labels_id
+
+    @staticmethod
+    def score_vector(skin_analysis: dict):
+        """Scores d'une analyse à plat : (libellés, valeurs), dans l'ordre des catégories de l'analyseur"""
+        labels, values = [], []
+        for prefix, scores in (
+            ("skin_type", skin_analysis.get("skin_type", {}).get("all_scores", {})),
+            ("problem", skin_analysis.get("problem_scores", {})),
+            ("skin_condition", skin_analysis.get("skin_condition", {}).get("all_scores", {}))
+        ):
+            for label, value in scores.items():
+                labels.append(f"{prefix}:{label}")
+                values.append(value)
+        return tuple(labels), np.asarray(values, dtype=np.float16)
+
+    def record(self, user_id: str, analysis_id: str, skin_analysis: dict) -> bool:
+        """Enregistre une analyse (embedding + scores). Retourne False si rien n'a été enregistré."""
+        embedding = skin_analysis.get("image_embedding")
+        if not self.enabled or embedding is None or not self.is_valid_id(user_id):
+            return False
+
+        labels, scores = self.score_vector(skin_analysis)
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        analysis_id,
+                        user_id,
+                        time.time(),
+                        self._labels_id(connection, labels),
+                        skin_analysis.get("skin_type", {}).get("category", "indéterminé"),
+                        np.asarray(embedding, dtype=np.float16).tobytes(),
+                        scores.tobytes()
+                    )
+                )
+                connection.execute(
+                    """DELETE FROM analyses WHERE user_id = ? AND analysis_id NOT IN (
+                        SELECT analysis_id FROM analyses WHERE user_id = ? ORDER BY created_at DESC LIMIT ?)""",
+                    (user_id, user_id, self.MAX_ENTRIES_PER_USER)
+                )
+            self.cache.pop(user_id, None)
+        return True
+
+    def _load(self, user_id: str) -> Optional[dict]:
+        """Tableaux de l'utilisateur (jeu de libellés le plus récent), mis en cache jusqu'à la prochaine écriture"""
+        with self.lock:
+            arrays = self.cache.get(user_id)
+            if arrays is not None:
+                self.cache.move_to_end(user_id)
+                return arrays
+
+            rows = self._connect().execute(
+                """SELECT a.analysis_id, a.created_at, a.skin_type, a.embedding, a.scores, l.labels
+                   FROM analyses a JOIN score_labels l ON l.id = a.labels_id
+                   WHERE a.user_id = ? ORDER BY a.created_at""",
+                (user_id,)
+            ).fetchall()
+            if not rows:
+                return None
+
+            # Si les catégories de l'analyseur ont changé, seules les analyses comparables sont gardées
+            labels = rows[-1][5]
+            rows = [row for row in rows if row[5] == labels]
+
+            arrays = {
+                "analysis_ids": [row[0] for row in rows],
+                "timestamps": np.array([row[1] for row in rows]),
+                "skin_types": [row[2] for row in rows],
+                "embeddings": np.frombuffer(b"".join(row[3] for row in rows), dtype=np.float16).reshape(len(rows), -1).astype(np.float32),
+                "scores": np.frombuffer(b"".join(row[4] for row in rows), dtype=np.float16).reshape(len(rows), -1).astype(np.float32),
+                "labels": json.loads(labels)
+            }
+            # Renormaliser après l'arrondi float16
+            arrays["embeddings"] /= np.linalg.norm(arrays["embeddings"], axis=1, keepdims=True)
+
+            self.cache[user_id] = arrays
+            if len(self.cache) > self.MAX_CACHED_USERS:
+                self.cache.popitem(last=False)
+            return arrays
+
+    @staticmethod
+    def _evolution(arrays: dict) -> dict:
+        """Évolution de chaque score et de l'apparence, calculée en une fois sur tous les tableaux"""
+        timestamps, scores, embeddings = arrays["timestamps"], arrays["scores"], arrays["embeddings"]
+        count = len(timestamps)
+
+        # Tendance par semaine : pente des moindres carrés pour toutes les colonnes à la fois
+        weeks = (timestamps - timestamps.mean()) / (7 * 86400)
+        denominator = float(weeks @ weeks)
+        slopes = weeks @ (scores - scores.mean(axis=0)) / denominator if denominator > 0 else np.zeros(scores.shape[1])
+
+        first, last = scores[0], scores[-1]
+        change = last - first
+        similarity_to_first = embeddings @ embeddings[0]
+        similarity_to_previous = np.einsum("ij,ij->i", embeddings[1:], embeddings[:-1])
+
+        per_label = {
+            label: {
+                "first": round(float(first[i]), 3),
+                "last": round(float(last[i]), 3),
+                "change": round(float(change[i]), 3),
+                "trend_per_week": round(float(slopes[i]), 4)
+            }
+            for i, label in enumerate(arrays["labels"])
+        }
+
+        problems = [i for i, label in enumerate(arrays["labels"]) if label.startswith("problem:")]
+        return {
+            "analyses_count": count,
+            "period_days": round(float(timestamps[-1] - timestamps[0]) / 86400, 1),
+            "scores": per_label,
+            # Pour un problème, une baisse du score est une amélioration
+            "improving": [arrays["labels"][i].split(":", 1)[1] for i in problems if change[i] <= -0.05],
+            "worsening": [arrays["labels"][i].split(":", 1)[1] for i in problems if change[i] >= 0.05],
+            "appearance_similarity": {
+                "to_first": [round(float(v), 3) for v in similarity_to_first],
+                "to_previous": [round(float(v), 3) for v in similarity_to_previous]
+            }
+        }
+
+    def get_history(self, user_id: str) -> Optional[dict]:
+        """Historique compact et évolution détectée (format SkincareHistory)"""
+        arrays = self._load(user_id)
+        if arrays is None:
+            return None
+
+        labels = arrays["labels"]
+        problems = [i for i, label in enumerate(labels) if label.startswith("problem:")]
+        analyses = [
+            {
+                "id": analysis_id,
+                "timestamp": float(arrays["timestamps"][row]),
+                "skin_type": arrays["skin_types"][row],
+                "problem_scores": {labels[i].split(":", 1)[1]: round(float(arrays["scores"][row, i]), 3) for i in problems}
+            }
+            for row, analysis_id in enumerate(arrays["analysis_ids"])
+        ]
+        return {"user_id": user_id, "analyses": analyses, "skin_evolution": self._evolution(arrays)}
+
+    def get_progress(self, user_id: str, label: str) -> Optional[dict]:
+        """Série temporelle d'un score ("acné", "peau grasse"...) sans retraiter d'image"""
+        arrays = self._load(user_id)
+        if arrays is None:
+            return None
+
+        matches = [i for i, full_label in enumerate(arrays["labels"]) if full_label.split(":", 1)[1] == label]
+        if not matches:
+            raise KeyError(label)
+
+        column = arrays["scores"][:, matches[0]]
+        evolution = self._evolution(arrays)["scores"][arrays["labels"][matches[0]]]
+        return {
+            "label": label,
+            "timestamps": arrays["timestamps"].tolist(),
+            "values": [round(float(v), 3) for v in column],
+            **evolution
+        }
+
+    def delete(self, user_id: str) -> int:
+        """Supprime tout l'historique d'un utilisateur"""
+        if not self.enabled:
+            return 0
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                deleted = connection.execute("DELETE FROM analyses WHERE user_id = ?", (user_id,)).rowcount
+            self.cache.pop(user_id, None)
+        return deleted
+
+
+# Instance globale
+skincare_history = SkincareHistoryStore()
@@ -3,6 +3,13 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Confiance minimum d'un problème détecté pour ajouter ses recommandations spécifiques
+RECOMMENDATION_CONFIDENCE_THRESHOLD = 0.4
+
+def passes_recommendation_threshold(confidence, threshold=RECOMMENDATION_CONFIDENCE_THRESHOLD):
+    """Confiance suffisante pour les recommandations spécifiques : strictement supérieure au seuil"""
+    return confidence > threshold
+
 async def generate_skincare_recommendations(analysis_result):
     """Génère des recommandations personnalisées basées sur l'analyse de peau"""
 
@@ -29,7 +36,7 @@ async def generate_skincare_recommendations(analysis_result):
         problem_name = problem.get("condition", "")
         confidence = problem.get("confidence", 0)
 
-        if confidence > 0.4:  # Seuil pour recommandations spécifiques
+        if passes_recommendation_threshold(confidence):  # Seuil pour recommandations spécifiques
             problem_recs = _get_problem_specific_recommendations(problem_name)
 
             # Fusionner les recommandations
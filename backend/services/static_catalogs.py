@@ -0,0 +1,90 @@
+# services/static_catalogs.py - Catalogues statiques pré-encodés (ETag, Cache-Control, 304)
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Durée de cache des catalogues côté client / proxy
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "3600"))
+
+# Métadonnées d'affichage ; la liste des labels vient toujours de SkincareAnalyzer
+SKIN_TYPE_DESCRIPTIONS = {
+    "peau grasse": "Production excessive de sébum",
+    "peau sèche": "Manque d'hydratation et de sébum",
+    "peau mixte": "Zone T grasse, joues normales/sèches",
+    "peau normale": "Équilibre optimal eau/sébum",
+    "peau sensible": "Réactivité aux produits et environnement"
+}
+
+SKIN_PROBLEM_INFO = {
+    "acné": {"severity": "medium", "treatable": True},
+    "points noirs": {"severity": "low", "treatable": True},
+    "boutons": {"severity": "medium", "treatable": True},
+    "rides": {"severity": "low", "treatable": True},
+    "taches brunes": {"severity": "medium", "treatable": True},
+    "rougeurs": {"severity": "medium", "treatable": True},
+    "pores dilatés": {"severity": "low", "treatable": True},
+    "cernes": {"severity": "low", "treatable": True},
+    "sécheresse cutanée": {"severity": "low", "treatable": True},
+    "brillance excessive": {"severity": "low", "treatable": True}
+}
+
+
+def skin_types_catalog(labels: list) -> dict:
+    """Catalogue des types de peau, dans l'ordre des labels de l'analyseur"""
+    missing = [label for label in labels if label not in SKIN_TYPE_DESCRIPTIONS]
+    if missing:
+        logger.warning(f"⚠️ Types de peau sans description dans le catalogue: {missing}")
+    return {
+        "skin_types": [
+            {"type": label, "description": SKIN_TYPE_DESCRIPTIONS.get(label, "")}
+            for label in labels
+        ]
+    }
+
+
+def skin_problems_catalog(labels: list) -> dict:
+    """Catalogue des problèmes détectables, dans l'ordre des labels de l'analyseur"""
+    missing = [label for label in labels if label not in SKIN_PROBLEM_INFO]
+    if missing:
+        logger.warning(f"⚠️ Problèmes de peau sans métadonnées dans le catalogue: {missing}")
+    return {
+        "problems": [
+            {"problem": label, **SKIN_PROBLEM_INFO.get(label, {"severity": "medium", "treatable": True})}
+            for label in labels
+        ]
+    }
+
+
+class PrecomputedJSON:
+    """
+    Réponse JSON sérialisée une seule fois : chaque requête renvoie les mêmes octets,
+    ou un 304 sans corps si le client présente le bon ETag (If-None-Match).
+
+    L'ETag est faible (W/) : le middleware de compression peut encoder le corps
+    différemment selon Accept-Encoding.
+    """
+
+    def __init__(self, payload: dict, cache_control: str = None):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = f'W/"{hashlib.sha256(self.body).hexdigest()[:16]}"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": cache_control or f"public, max-age={CATALOG_MAX_AGE_SECONDS}"
+        }
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag.removeprefix("W/") for tag in tags)
+
+    def response(self, if_none_match: Optional[str] = None) -> Response:
+        if self.matches(if_none_match):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
@@ -0,0 +1,142 @@
+# services/structured_logging.py - Logs JSON non bloquants avec contexte par requête
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from contextlib import contextmanager
+
+# Contexte de la requête en cours (propagé automatiquement aux coroutines et threads de starlette)
+analysis_id_var = contextvars.ContextVar("analysis_id", default=None)
+stage_sampled_var = contextvars.ContextVar("stage_sampled", default=False)
+
+# Attributs standards d'un LogRecord (tout le reste vient de extra=...)
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Loggers de l'application (les lignes DEBUG par étape y sont échantillonnées)
+APP_LOGGERS = ("main", "services")
+
+_listener = None
+_stage_sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par log : horodatage, niveau, logger, message, analysis_id et champs extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute analysis_id et applique l'échantillonnage des lignes DEBUG par étape"""
+
+    def __init__(self, debug_everything: bool):
+        super().__init__()
+        self.debug_everything = debug_everything
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and not self.debug_everything and not stage_sampled_var.get():
+            return False
+        if not hasattr(record, "analysis_id"):
+            record.analysis_id = analysis_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui abandonne les logs plutôt que de bloquer la requête si la file est pleine"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging():
+    """
+    Configure le pipeline de logs une seule fois par processus
+
+    Les handlers de la requête ne font qu'un put_nowait dans une file ; l'écriture
+    (formatage JSON + stdout) se fait dans le thread du QueueListener.
+
+    Variables d'environnement:
+        LOG_LEVEL: niveau global (INFO par défaut, DEBUG = toutes les lignes par étape)
+        LOG_STAGE_SAMPLE_RATE: fraction des requêtes dont les lignes par étape sont émises
+        LOG_FORMAT: "json" (défaut) ou "text"
+    """
+    global _listener, _stage_sample_rate
+    if _listener is not None:
+        return
+
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    _stage_sample_rate = sample_rate = float(os.getenv("LOG_STAGE_SAMPLE_RATE", "0"))
+
+    output = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s %(name)s [%(analysis_id)s] %(message)s"))
+
+    log_queue = queue.Queue(maxsize=10000)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(debug_everything=level <= logging.DEBUG))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # Les lignes DEBUG de l'application ne sont créées que si elles peuvent être échantillonnées
+    if sample_rate > 0:
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(logging.DEBUG)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+@contextmanager
+def request_log_context(analysis_id: str, logger: logging.Logger, event: str = "analysis"):
+    """
+    Associe les logs du bloc à analysis_id et émet un unique record de synthèse à la sortie
+
+    Le dict retourné sert à ajouter des champs au record de synthèse (skin_type, status...).
+    """
+    id_token = analysis_id_var.set(analysis_id)
+    sampled_token = stage_sampled_var.set(_stage_sample_rate > 0 and random.random() < _stage_sample_rate)
+    summary = {"event": event, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        yield summary
+    except Exception as e:
+        summary["status"] = "error"
+        detail = getattr(e, "detail", None) or str(e)
+        summary["error"] = detail.get("error") if isinstance(detail, dict) else detail
+        raise
+    finally:
+        summary["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        level = logging.INFO if summary["status"] == "ok" else logging.WARNING
+        logger.log(level, f"{event} {summary['status']}", extra=summary)
+        analysis_id_var.reset(id_token)
+        stage_sampled_var.reset(sampled_token)
@@ -0,0 +1,133 @@
+# services/threading_policy.py - Politique de threads CPU (torch / OpenCV) selon la charge
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+THREADING_MODES = ("latency", "throughput")
+
+
+def detect_cpu_limit() -> dict:
+    """
+    Nombre de CPU réellement utilisables : affinité du processus et quota cgroup
+    (v2 : cpu.max, v1 : cpu.cfs_quota_us / cpu.cfs_period_us)
+    """
+    try:
+        affinity = len(os.sched_getaffinity(0))
+    except AttributeError:
+        affinity = os.cpu_count() or 1
+
+    quota = None
+    source = "affinity"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota, source = int(limit) / int(period), "cgroup_v2"
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota, source = limit / period, "cgroup_v1"
+        except (OSError, ValueError):
+            pass
+
+    cpus = affinity if quota is None else max(1, min(affinity, math.ceil(quota)))
+    return {"cpus": cpus, "affinity": affinity, "quota": quota, "source": source}
+
+
+class ThreadingPolicy:
+    """
+    Choisit le nombre de threads intra-op de torch et d'OpenCV.
+
+    - latency : nœud au repos, une analyse peut utiliser tous les CPU du quota
+    - throughput : plusieurs analyses en parallèle, un thread chacune pour éviter
+      la sur-souscription
+
+    En mode auto, bascule en throughput dès que BUSY_THRESHOLD analyses tournent
+    en même temps, et ne revient en latency qu'après COOLDOWN secondes de calme.
+
+    Le nombre de threads OpenMP est propre à chaque thread appelant : adjust()
+    choisit le mode (sur la boucle, à l'admission) et apply() l'applique dans le
+    thread qui exécute l'analyse.
+    """
+
+    def __init__(self):
+        self.MODE = os.getenv("THREADING_POLICY", "auto").lower()   # auto, latency ou throughput
+        self.BUSY_THRESHOLD = int(os.getenv("THREADING_BUSY_THRESHOLD", "2"))
+        self.COOLDOWN = float(os.getenv("THREADING_COOLDOWN_SECONDS", "2.0"))
+
+        self.cpu_limit = detect_cpu_limit()
+        self.lock = threading.Lock()
+        self.active_mode = self.MODE if self.MODE in THREADING_MODES else "latency"
+        self.applied = {}                # bibliothèque -> dernier nombre de threads appliqué
+        self.switches = 0
+        self.last_busy = 0.0
+
+    def threads_for(self, mode: str) -> int:
+        return self.cpu_limit["cpus"] if mode == "latency" else 1
+
+    def apply(self):
+        """
+        Applique le mode actif, dans le thread appelant, aux bibliothèques déjà
+        importées (sans jamais les importer)
+        """
+        threads = self.threads_for(self.active_mode)
+
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            if torch.get_num_threads() != threads:
+                torch.set_num_threads(threads)
+            self.applied["torch"] = threads
+
+        cv2 = sys.modules.get("cv2")
+        if cv2 is not None:
+            if cv2.getNumThreads() != threads:
+                cv2.setNumThreads(threads)
+            self.applied["cv2"] = threads
+
+    def adjust(self, in_flight: int):
+        """Appelé à l'admission de chaque analyse avec le nombre d'analyses en cours : choisit le mode"""
+        with self.lock:
+            if self.MODE == "auto":
+                now = time.monotonic()
+                if in_flight >= self.BUSY_THRESHOLD:
+                    self.last_busy = now
+                    mode = "throughput"
+                elif now - self.last_busy >= self.COOLDOWN:
+                    mode = "latency"
+                else:
+                    mode = self.active_mode
+
+                if mode != self.active_mode:
+                    self.active_mode = mode
+                    self.switches += 1
+                    logger.info(f"🧮 Politique de threads: {mode} ({self.threads_for(mode)} thread(s), {in_flight} analyses en cours)")
+
+    def set_mode(self, mode: str):
+        """Fixe le mode (ex. serveur d'inférence : toujours latency, le batching fait le reste)"""
+        with self.lock:
+            self.MODE = mode
+            self.active_mode = mode
+            self.apply()
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.MODE,
+            "active_mode": self.active_mode,
+            "threads_per_analysis": self.threads_for(self.active_mode),
+            "cpu_limit": self.cpu_limit,
+            "applied": dict(self.applied),
+            "switches": self.switches
+        }
+
+
+# Instance globale
+threading_policy = ThreadingPolicy()
@@ -0,0 +1,90 @@
+# services/validation_tickets.py - Tickets de validation : /api/analyze réutilise le travail de /api/validate-face
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationTicketStore:
+    """
+    Garde en mémoire, pour une courte durée, ce qu'une validation réussie a déjà calculé :
+
+    - face_crop : visage recadré et filtré, prêt pour l'encodeur (224x224)
+    - faces : boîtes OpenCV détectées
+    - image_embeds : embedding CLIP de l'image entière (validation et mode rapide)
+
+    Un ticket est opaque, à usage unique et expire après TTL secondes. Au-delà de
+    MAX_TICKETS, les plus anciens sont évincés. Rien n'est écrit sur disque et la
+    photo entière n'est jamais conservée.
+    """
+
+    def __init__(self):
+        # Configuration
+        self.TTL = float(os.getenv("VALIDATION_TICKET_TTL_SECONDS", "120"))
+        self.MAX_TICKETS = int(os.getenv("VALIDATION_TICKET_MAX", "256"))
+
+        self.lock = threading.Lock()
+        self.tickets = OrderedDict()     # ticket -> (expiration, données)
+        self.counts = {"issued": 0, "redeemed": 0, "expired": 0, "evicted": 0, "unknown": 0}
+
+    def _purge_expired(self, now: float):
+        while self.tickets:
+            ticket, (expires_at, _) = next(iter(self.tickets.items()))
+            if expires_at > now:
+                break
+            del self.tickets[ticket]
+            self.counts["expired"] += 1
+
+    def issue(self, face_crop: Image.Image, faces: list, image_embeds: np.ndarray, face_confidence: float, image_size: tuple) -> str:
+        """Enregistre le résultat d'une validation réussie et retourne le ticket"""
+        ticket = secrets.token_urlsafe(24)
+        entry = {
+            "face_crop": face_crop,
+            "faces": faces,
+            "image_embeds": image_embeds,
+            "face_confidence": face_confidence,
+            "image_size": image_size
+        }
+        with self.lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            while len(self.tickets) >= self.MAX_TICKETS:
+                self.tickets.popitem(last=False)
+                self.counts["evicted"] += 1
+            self.tickets[ticket] = (now + self.TTL, entry)
+            self.counts["issued"] += 1
+        return ticket
+
+    def redeem(self, ticket: str) -> Optional[dict]:
+        """Retire et retourne les données du ticket (None s'il est inconnu, déjà utilisé ou expiré)"""
+        with self.lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            item = self.tickets.pop(ticket, None)
+            if item is None:
+                self.counts["unknown"] += 1
+                return None
+            self.counts["redeemed"] += 1
+            return item[1]
+
+    def stats(self) -> dict:
+        with self.lock:
+            self._purge_expired(time.monotonic())
+            return {
+                "active": len(self.tickets),
+                "max_tickets": self.MAX_TICKETS,
+                "ttl_seconds": self.TTL,
+                **self.counts
+            }
+
+
+# Instance globale
+validation_tickets = ValidationTicketStore()
@@ -0,0 +1,52 @@
+# tests/conftest.py - Fixtures communes : API en processus avec le backend CLIP factice
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CLIP_BACKEND"] = "fake"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def encode_image(image: Image.Image, fmt: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def upload(data: bytes, name: str = "photo.png", content_type: str = "image/png") -> dict:
+    return {"file": (name, data, content_type)}
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    # Bloc with : événements startup/shutdown (workers de jobs)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def face_png() -> bytes:
+    """Portrait de face (démo Tk) : détecté par OpenCV, validé par le backend factice"""
+    with open(os.path.join(DATA_DIR, "face.png"), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="session")
+def noise_png() -> bytes:
+    """Image nette et bien exposée, sans visage"""
+    pixels = np.random.default_rng(0).integers(0, 256, (300, 300, 3), dtype=np.uint8)
+    return encode_image(Image.fromarray(pixels))
@@ -0,0 +1,65 @@
+# tests/test_api.py - /api/analyze et /api/validate-face de bout en bout (backend CLIP factice)
+from conftest import upload
+
+
+def test_analyze_full(client, face_png):
+    response = client.post("/api/analyze", files=upload(face_png))
+    assert response.status_code == 200
+    assert response.headers["X-Analysis-Mode"] == "full"
+
+    analysis = response.json()
+    assert analysis["mode"] == "full"
+    assert analysis["skin_type"]["category"] in analysis["skin_type"]["all_scores"]
+    assert analysis["problems_detected"]
+    assert "recommendations" in analysis and "detailed_scores" in analysis
+
+
+def test_analyze_fast(client, face_png):
+    response = client.post("/api/analyze", files=upload(face_png), data={"mode": "fast"})
+    assert response.status_code == 200
+    assert response.headers["X-Analysis-Mode"] == "fast"
+
+    analysis = response.json()
+    assert analysis["downgraded"] is False
+    assert "recommendations" not in analysis
+    assert 0.0 < analysis["face_confidence"] <= 1.0
+
+
+def test_analyze_rejects_invalid_uploads(client, face_png, noise_png):
+    not_image = client.post("/api/analyze", files=upload(b"hello", "notes.txt", "text/plain"))
+    assert not_image.status_code == 400
+
+    corrupted = client.post("/api/analyze", files=upload(face_png[:300]))
+    assert corrupted.status_code == 400
+
+    no_face = client.post("/api/analyze", files=upload(noise_png))
+    assert no_face.status_code == 400
+
+
+def test_analyze_compact_response(client, face_png):
+    analysis = client.post("/api/analyze?verbose=false", files=upload(face_png)).json()
+    assert "all_scores" not in analysis["skin_type"]
+    assert "all_scores" not in analysis["skin_condition"]
+    assert "detailed_scores" not in analysis
+    assert "recommendations" in analysis
+
+
+def test_analyze_selected_fields(client, face_png):
+    response = client.post("/api/analyze?fields=id,skin_type.category,problems_detected", files=upload(face_png))
+    analysis = response.json()
+    assert set(analysis) == {"id", "skin_type", "problems_detected"}
+    assert set(analysis["skin_type"]) == {"category"}
+
+
+def test_validate_face(client, face_png, noise_png):
+    valid = client.post("/api/validate-face", files=upload(face_png)).json()
+    assert valid["validation"]["is_valid"] is True
+    assert valid["validation"]["details"]["opencv_detection"]["faces_detected"] >= 1
+    assert "ticket" not in valid
+
+    compact = client.post("/api/validate-face?verbose=false", files=upload(face_png)).json()["validation"]
+    assert set(compact["details"]) == {"validation_passed"}
+
+    invalid = client.post("/api/validate-face", files=upload(noise_png)).json()["validation"]
+    assert invalid["is_valid"] is False
+    assert invalid["suggestion"]
@@ -0,0 +1,86 @@
+# tests/test_buffer_pool.py - Pool de buffers : restitution et aucun partage entre emprunteurs simultanés
+import asyncio
+import io
+import threading
+
+import httpx
+import numpy as np
+from PIL import Image, ImageOps
+
+from conftest import encode_image, upload
+from services.buffer_pool import BufferPool
+
+BUFFER_NAMES = ("resized", "filtered", "lab", "luminance", "equalized", "crop", "pixels")
+
+
+def test_concurrent_borrowers_get_distinct_buffers():
+    pool = BufferPool(max_size=2)
+    borrowers = 4
+    barrier = threading.Barrier(borrowers)
+    borrowed = []
+
+    def borrow(index: int):
+        with pool.borrow() as buffers:
+            buffers.pixels.fill(index)
+            borrowed.append(buffers)
+            # Tous les emprunts sont en cours en même temps
+            barrier.wait(timeout=5)
+            assert np.all(buffers.pixels == index)
+
+    threads = [threading.Thread(target=borrow, args=(index,)) for index in range(borrowers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(buffers) for buffers in borrowed}) == borrowers
+    for i, first in enumerate(borrowed):
+        for second in borrowed[i + 1:]:
+            for name in BUFFER_NAMES:
+                assert not np.shares_memory(getattr(first, name), getattr(second, name))
+
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["free"] == 2 and stats["discarded"] == 2
+    assert stats["created"] == borrowers
+
+
+def test_buffers_are_returned_and_reused_even_on_error():
+    pool = BufferPool(max_size=2)
+    try:
+        with pool.borrow() as first:
+            raise ValueError("prétraitement impossible")
+    except ValueError:
+        pass
+    assert pool.stats()["in_use"] == 0
+
+    with pool.borrow() as second:
+        assert second is first
+    assert pool.stats()["created"] == 1
+
+
+def test_concurrent_analyses_match_sequential_ones(app, client, face_png):
+    """Aucun résultat ne garde une référence à un buffer rendu puis réemprunté par une autre analyse"""
+    from services.buffer_pool import buffer_pool
+    mirrored_png = encode_image(ImageOps.mirror(Image.open(io.BytesIO(face_png)).convert("RGB")))
+    photos = [face_png, mirrored_png]
+
+    def scores(response) -> dict:
+        assert response.status_code == 200
+        return response.json()["detailed_scores"]["problems"]
+
+    expected = [scores(client.post("/api/analyze", files=upload(photo))) for photo in photos]
+    assert expected[0] != expected[1]
+
+    async def concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as async_client:
+            return await asyncio.gather(*[
+                async_client.post("/api/analyze", files=upload(photos[i % 2]), data={"allow_downgrade": "false"})
+                for i in range(8)
+            ])
+
+    responses = asyncio.run(concurrently())
+    for i, response in enumerate(responses):
+        assert scores(response) == expected[i % 2]
+    assert buffer_pool.stats()["in_use"] == 0
@@ -0,0 +1,30 @@
+# tests/test_bulk_analyze.py - Reprise de l'analyse en masse : fichiers illisibles non retentés
+import json
+
+from tools.bulk_analyze import ERROR_INPUT, ERROR_TRANSIENT, JsonlWriter, prepare_image
+
+
+def test_undecodable_file_is_an_input_error(face_png):
+    record = prepare_image(("corrompue.png", face_png[:len(face_png) // 3]))
+    assert record["status"] == "error"
+    assert record["error_class"] == ERROR_INPUT
+
+    assert prepare_image(("pas_une_image.jpg", b"texte"))["error_class"] == ERROR_INPUT
+
+
+def test_resume_skips_input_errors_unless_asked(tmp_path):
+    output = tmp_path / "resultats.jsonl"
+    records = [
+        {"path": "ok.jpg", "status": "ok"},
+        {"path": "floue.jpg", "status": "rejected"},
+        {"path": "corrompue.jpg", "status": "error", "error_class": ERROR_INPUT},
+        {"path": "serveur.jpg", "status": "error", "error_class": ERROR_TRANSIENT},
+        # Ligne écrite avant les classes d'erreur
+        {"path": "ancienne.jpg", "status": "error"}
+    ]
+    output.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    writer = JsonlWriter(str(output))
+    assert writer.done_paths() == {"ok.jpg", "floue.jpg", "corrompue.jpg"}
+    assert writer.done_paths(retry_errors=True) == {"ok.jpg", "floue.jpg"}
+    writer.close()
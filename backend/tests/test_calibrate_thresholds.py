@@ -0,0 +1,55 @@
+# tests/test_calibrate_thresholds.py - Calibration : mêmes règles de comparaison et même contrôle qualité que la production
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter, ImageOps
+
+from tools.calibrate_thresholds import extract, pr_curve, sweep
+
+
+def test_curves_use_the_production_comparisons():
+    from services.face_validation import passes_validation_threshold
+    from services.skincare_analysis import passes_detection_threshold, skincare_analyzer
+    from services.skincare_recommendation import passes_recommendation_threshold
+
+    threshold = skincare_analyzer.PROBLEM_DETECTION_THRESHOLD
+    scores, labels, thresholds = np.array([threshold]), np.array([True]), np.array([threshold])
+
+    # Score exactement au seuil : non détecté en production, donc non compté comme détecté
+    detected = asyncio.run(skincare_analyzer._detect_multiple_conditions(scores, ["acné"], "test", threshold=threshold))
+    assert detected == []
+    assert pr_curve(scores, labels, thresholds, passes_detection_threshold)["recall"][0] == 0.0
+    assert pr_curve(scores, labels, thresholds, passes_recommendation_threshold)["recall"][0] == 0.0
+    # La validation accepte le score égal au seuil
+    assert pr_curve(scores, labels, thresholds, passes_validation_threshold)["recall"][0] == 1.0
+
+
+def test_quality_gate_is_applied(tmp_path, face_png):
+    face = Image.open(io.BytesIO(face_png)).convert("RGB")
+    (tmp_path / "face").mkdir()
+    (tmp_path / "not_face").mkdir()
+    face.save(tmp_path / "face" / "nette.png")
+    ImageOps.mirror(face).save(tmp_path / "face" / "miroir.png")
+    face.filter(ImageFilter.GaussianBlur(12)).save(tmp_path / "face" / "floue.png")
+    noise = np.random.default_rng(0).integers(0, 256, (181, 142, 3), dtype=np.uint8)
+    Image.fromarray(noise).save(tmp_path / "not_face" / "bruit.png")
+
+    cache = str(tmp_path / "calibration.npz")
+    extract(str(tmp_path), cache)
+    data = np.load(cache)
+    assert dict(zip(data["paths"], data["quality_ok"]))["face/floue.png"] == False  # noqa: E712
+
+    report = sweep(cache)
+    assert report["quality_rejected"]["faces"] == 1
+    # La photo floue n'est acceptée à aucun seuil : rappel maximum 2/3
+    assert report["clip_human_face"]["best"]["recall"] <= round(2 / 3, 4)
+    assert report["face_validation_combined"]["best"]["recall"] <= round(2 / 3, 4)
+
+
+def test_cache_without_quality_verdict_is_refused(tmp_path):
+    cache = str(tmp_path / "ancien.npz")
+    np.savez(cache, is_face=np.array([True]))
+    with pytest.raises(SystemExit):
+        sweep(cache)
@@ -0,0 +1,32 @@
+# tests/test_catalogs.py - Réponses précalculées : ETag, If-None-Match et Cache-Control
+import pytest
+
+from conftest import upload
+
+CATALOGS = ["/", "/health", "/api/skin-types", "/api/skin-problems", "/api/features"]
+
+
+@pytest.mark.parametrize("path", CATALOGS)
+def test_catalog_revalidation(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    not_modified = client.get(path, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert client.get(path, headers={"If-None-Match": 'W/"autre"'}).status_code == 200
+
+
+def test_catalog_cache_control(client):
+    assert client.get("/api/skin-types").headers["Cache-Control"].startswith("public, max-age=")
+    assert client.get("/health").headers["Cache-Control"] == "no-cache"
+
+
+def test_skin_types_catalog_matches_analyzer(client, face_png):
+    catalog = [entry["type"] for entry in client.get("/api/skin-types").json()["skin_types"]]
+    analysis = client.post("/api/analyze", files=upload(face_png)).json()
+    assert catalog == list(analysis["skin_type"]["all_scores"])
@@ -0,0 +1,151 @@
+# tests/test_concurrency.py - Pipeline hors de la boucle : charge réelle, jobs et /health
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from conftest import upload
+
+PIPELINE_SECONDS = 0.6
+
+
+@pytest.fixture
+def slow_pipeline(monkeypatch):
+    """Validation ralentie par un appel bloquant, comme un pipeline CPU réel"""
+    import main
+    original = main.validate_face_for_skincare
+
+    async def slow_validate(*args, **kwargs):
+        time.sleep(PIPELINE_SECONDS)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(main, "validate_face_for_skincare", slow_validate)
+
+
+def test_health_stays_responsive_while_jobs_run(client, face_png, slow_pipeline):
+    job_ids = [client.post("/api/jobs", files=upload(face_png)).json()["job_id"] for _ in range(2)]
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert client.get("/health").status_code == 200
+    assert time.perf_counter() - start < PIPELINE_SECONDS / 2
+
+    for job_id in job_ids:
+        job = client.get(f"/api/jobs/{job_id}?wait=10").json()
+        assert job["status"] == "done"
+
+
+async def post_concurrently(app, count: int, data: bytes, form: dict = None) -> list:
+    """count analyses envoyées en même temps à l'application ASGI"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        return await asyncio.gather(*[
+            client.post("/api/analyze", files=upload(data), data=form or {}) for _ in range(count)
+        ])
+
+
+def test_overload_downgrades_full_analyses(app, face_png, slow_pipeline, monkeypatch):
+    from services.analysis_modes import analysis_load
+    monkeypatch.setattr(analysis_load, "MAX_FULL_IN_FLIGHT", 2)
+    downgraded_before = analysis_load.downgraded_total
+
+    responses = asyncio.run(post_concurrently(app, 5, face_png))
+    assert all(r.status_code == 200 for r in responses)
+
+    modes = [r.headers["X-Analysis-Mode"] for r in responses]
+    assert modes.count("full") == 2
+    assert modes.count("fast") == 3
+    assert all(r.json()["downgraded"] for r in responses if r.headers["X-Analysis-Mode"] == "fast")
+    assert analysis_load.downgraded_total - downgraded_before == 3
+    assert analysis_load.in_flight == 0
+
+
+def test_overload_respects_allow_downgrade_false(app, face_png, slow_pipeline, monkeypatch):
+    from services.analysis_modes import analysis_load
+    monkeypatch.setattr(analysis_load, "MAX_FULL_IN_FLIGHT", 1)
+
+    responses = asyncio.run(post_concurrently(app, 3, face_png, {"allow_downgrade": "false"}))
+    assert [r.headers["X-Analysis-Mode"] for r in responses] == ["full"] * 3
+
+
+def pool_thread_counts() -> dict:
+    """Nombres de threads vus depuis un thread du pool d'analyse (propres à chaque thread pour OpenMP)"""
+    import sys
+    import threading
+    from services.analysis_modes import analysis_load
+
+    async def probe():
+        import cv2
+        counts = {"thread": threading.current_thread().name, "cv2": cv2.getNumThreads()}
+        if "torch" in sys.modules:
+            counts["torch"] = sys.modules["torch"].get_num_threads()
+        return counts
+
+    return asyncio.run(analysis_load.run(probe))
+
+
+def test_threading_policy_follows_real_concurrency(app, client, face_png, slow_pipeline, monkeypatch):
+    from services.threading_policy import threading_policy
+    monkeypatch.setattr(threading_policy, "MODE", "auto")
+    monkeypatch.setattr(threading_policy, "active_mode", "latency")
+    monkeypatch.setattr(threading_policy, "last_busy", 0.0)
+    monkeypatch.setattr(threading_policy, "COOLDOWN", 60.0)
+    # Au moins deux CPU pour distinguer les deux modes, même sur une machine à un cœur
+    monkeypatch.setattr(threading_policy, "cpu_limit", {**threading_policy.cpu_limit, "cpus": 2})
+    switches_before = threading_policy.switches
+
+    # Analyses simultanées : un thread chacune pour ne pas sur-souscrire les CPU
+    responses = asyncio.run(post_concurrently(app, 4, face_png, {"allow_downgrade": "false"}))
+    assert all(r.status_code == 200 for r in responses)
+    assert threading_policy.active_mode == "throughput"
+    assert threading_policy.applied["cv2"] == 1
+    assert threading_policy.switches == switches_before + 1
+    counts = pool_thread_counts()
+    assert counts["thread"].startswith("analysis")
+    assert all(counts[library] == 1 for library in ("cv2", "torch") if library in counts)
+
+    # Retour au calme : une analyse seule reprend tous les CPU
+    monkeypatch.setattr(threading_policy, "COOLDOWN", 0.0)
+    assert client.post("/api/analyze", files=upload(face_png)).status_code == 200
+    assert threading_policy.active_mode == "latency"
+    assert threading_policy.applied["cv2"] == threading_policy.cpu_limit["cpus"]
+    assert threading_policy.switches == switches_before + 2
+    counts = pool_thread_counts()
+    assert all(counts[library] == threading_policy.cpu_limit["cpus"] for library in ("cv2", "torch") if library in counts)
+
+
+def test_validate_face_runs_off_the_loop(app, face_png, slow_pipeline):
+    from services.analysis_modes import analysis_load
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            validation = asyncio.create_task(client.post("/api/validate-face", files=upload(face_png)))
+            await asyncio.sleep(0.1)
+            # La validation est admise comme une analyse
+            in_flight = analysis_load.in_flight
+            start = time.perf_counter()
+            health = await client.get("/health")
+            health_seconds = time.perf_counter() - start
+            return await validation, health, health_seconds, in_flight
+
+    validation, health, health_seconds, in_flight = asyncio.run(scenario())
+    assert validation.status_code == 200
+    assert validation.json()["validation"]["is_valid"] is True
+    assert health.status_code == 200
+    assert health_seconds < PIPELINE_SECONDS / 2
+    assert in_flight == 1
+
+
+def test_jobs_hold_encoded_upload_until_started(client, face_png, slow_pipeline):
+    from services.job_store import job_store
+    job_ids = [client.post("/api/jobs", files=upload(face_png)).json()["job_id"] for _ in range(3)]
+
+    payloads = [job_store.get(job_id)["payload"] for job_id in job_ids]
+    # Jobs en attente : octets de l'upload, jamais l'image décodée ; jobs démarrés : plus rien
+    assert all(payload is None or payload == face_png for payload in payloads)
+    for job_id in job_ids:
+        job = client.get(f"/api/jobs/{job_id}?wait=10").json()
+        assert job["status"] == "done"
+        assert job_store.get(job_id)["payload"] is None
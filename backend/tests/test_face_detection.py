@@ -0,0 +1,68 @@
+# tests/test_face_detection.py - Détecteurs de visage : repli sur Haar, format et ordre des boîtes
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services import face_detection
+from services.face_detection import HaarFaceDetector, create_face_detector
+
+
+@pytest.fixture
+def face_rgb(face_png) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(face_png)).convert("RGB"))
+
+
+def test_missing_yunet_model_falls_back_to_haar(tmp_path, monkeypatch):
+    monkeypatch.setattr(face_detection, "YUNET_MODEL_PATH", str(tmp_path / "absent.onnx"))
+    assert isinstance(create_face_detector("yunet"), HaarFaceDetector)
+
+
+def test_unloadable_yunet_model_falls_back_to_haar(tmp_path, monkeypatch):
+    # Téléchargement tronqué ou remplacé : le modèle ne se charge pas, l'API démarre quand même
+    model = tmp_path / "face_detection_yunet_2023mar.onnx"
+    model.write_bytes(b"pas un modele onnx")
+    monkeypatch.setattr(face_detection, "YUNET_MODEL_PATH", str(model))
+    assert isinstance(create_face_detector("yunet"), HaarFaceDetector)
+
+
+def test_opencv_without_face_detector_yn_falls_back_to_haar(monkeypatch):
+    import cv2
+    monkeypatch.delattr(cv2, "FaceDetectorYN", raising=False)
+    assert isinstance(create_face_detector("yunet"), HaarFaceDetector)
+
+
+def test_boxes_are_full_resolution_integers(face_rgb):
+    faces = HaarFaceDetector().detect(face_rgb)
+    assert len(faces) == 1
+    box, score = faces[0]["box"], faces[0]["score"]
+    assert isinstance(box, tuple) and len(box) == 4 and all(isinstance(v, int) for v in box)
+    assert isinstance(score, float)
+    x, y, w, h = box
+    height, width = face_rgb.shape[:2]
+    assert 0 <= x and 0 <= y and w > 0 and h > 0 and x + w <= width and y + h <= height
+
+
+def test_boxes_are_scaled_back_from_the_reduced_copy(face_rgb):
+    detector = HaarFaceDetector()
+    factor = 6
+    large = np.asarray(Image.fromarray(face_rgb).resize((face_rgb.shape[1] * factor, face_rgb.shape[0] * factor)))
+    assert max(large.shape[:2]) > detector.DETECTION_MAX_SIZE
+
+    (small_face,), (large_face,) = detector.detect(face_rgb), detector.detect(large)
+    np.testing.assert_allclose(np.array(large_face["box"]) / factor, small_face["box"], atol=0.1 * small_face["box"][2])
+
+
+def test_largest_face_comes_first(face_rgb):
+    face = Image.fromarray(face_rgb)
+    canvas = Image.new("RGB", (600, 400), (128, 128, 128))
+    canvas.paste(face, (20, 100))
+    canvas.paste(face.resize((face.width * 2, face.height * 2)), (280, 20))
+
+    faces = HaarFaceDetector().detect(np.asarray(canvas))
+    assert len(faces) == 2
+    areas = [w * h for _, _, w, h in (f["box"] for f in faces)]
+    assert areas == sorted(areas, reverse=True)
+    # Le grand visage est celui collé à droite
+    assert faces[0]["box"][0] > 280 > faces[1]["box"][0]
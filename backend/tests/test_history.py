@@ -0,0 +1,67 @@
+# tests/test_history.py - Suivi dans le temps : identifiant en en-tête, jamais dans l'URL
+from collections import OrderedDict
+
+import pytest
+
+from conftest import upload
+
+HISTORY_ID = "test-history-0123456789"
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    from services.skincare_history import skincare_history
+    monkeypatch.setattr(skincare_history, "DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setattr(skincare_history, "connection", None)
+    monkeypatch.setattr(skincare_history, "cache", OrderedDict())
+    yield skincare_history
+    if skincare_history.connection is not None:
+        skincare_history.connection.close()
+
+
+def test_history_round_trip_with_header(client, face_png, history):
+    for _ in range(2):
+        response = client.post("/api/analyze", files=upload(face_png), data={"history_id": HISTORY_ID})
+        assert response.status_code == 200
+
+    headers = {"X-History-Id": HISTORY_ID}
+    assert len(client.get("/api/history", headers=headers).json()["analyses"]) == 2
+
+    progress = client.get("/api/history/progress", params={"label": "acné"}, headers=headers)
+    assert progress.status_code == 200
+
+    assert client.delete("/api/history", headers=headers).json() == {"deleted": 2}
+    assert client.get("/api/history", headers=headers).status_code == 404
+
+
+def test_history_requires_valid_header(client, history):
+    assert client.get("/api/history").status_code == 400
+    assert client.get("/api/history", headers={"X-History-Id": "short"}).status_code == 400
+    assert client.delete("/api/history").status_code == 400
+    # L'ancienne forme (identifiant dans le chemin) n'existe plus
+    assert client.get(f"/api/history/{HISTORY_ID}").status_code in (404, 405)
+
+
+def test_fast_and_downgraded_analyses_report_skipped_history(client, face_png, history, monkeypatch):
+    from services.analysis_modes import analysis_load
+    response = client.post("/api/analyze", files=upload(face_png), data={"history_id": HISTORY_ID, "mode": "fast"}).json()
+    assert response["history_recorded"] is False
+    assert response["history_skipped_reason"] == "fast_mode"
+
+    # Surcharge : l'analyse complète demandée est servie en mode rapide, sans historique
+    monkeypatch.setattr(analysis_load, "MAX_FULL_IN_FLIGHT", 0)
+    response = client.post("/api/analyze", files=upload(face_png), data={"history_id": HISTORY_ID}).json()
+    assert response["downgraded"] is True
+    assert response["history_recorded"] is False
+    assert response["history_skipped_reason"] == "fast_mode"
+    assert client.get("/api/history", headers={"X-History-Id": HISTORY_ID}).status_code == 404
+
+    monkeypatch.setattr(analysis_load, "MAX_FULL_IN_FLIGHT", 4)
+    response = client.post("/api/analyze", files=upload(face_png), data={"history_id": HISTORY_ID}).json()
+    assert response["history_recorded"] is True
+    assert response["history_skipped_reason"] is None
+
+
+def test_analysis_without_history_id_has_no_history_status(client, face_png, history):
+    response = client.post("/api/analyze", files=upload(face_png)).json()
+    assert response["history_recorded"] is None
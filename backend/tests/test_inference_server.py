@@ -0,0 +1,93 @@
+# tests/test_inference_server.py - Client du serveur d'inférence : socket Unix et mémoire partagée
+import asyncio
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from services import clip_backend
+from services.clip_backend import FakeClipBackend
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    """Serveur d'inférence (modèle factice) dans un thread avec sa propre boucle"""
+    from services.inference_server import InferenceServer
+    from services.threading_policy import threading_policy
+    monkeypatch.setattr(clip_backend, "LocalClipBackend", FakeClipBackend)
+    # Le serveur fixe la politique de threads du processus : restaurée après le test
+    monkeypatch.setattr(threading_policy, "MODE", threading_policy.MODE)
+    monkeypatch.setattr(threading_policy, "active_mode", threading_policy.active_mode)
+
+    path = str(tmp_path / "inference.sock")
+    server = InferenceServer(path)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield path
+    loop.call_soon_threadsafe(task.cancel)
+    # Laisser l'annulation et la fermeture des connexions s'exécuter avant d'arrêter la boucle
+    asyncio.run_coroutine_threadsafe(asyncio.wait([task]), loop).result(timeout=5)
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+def test_remote_backend_matches_local_and_unlinks_segment(socket_path):
+    from services.inference_server import RemoteClipBackend
+    backend = RemoteClipBackend(socket_path, connect_timeout=5.0)
+
+    pixels = np.random.default_rng(0).standard_normal((3, 3, 224, 224)).astype(np.float32)
+    np.testing.assert_allclose(backend.encode_images(pixels), FakeClipBackend().encode_images(pixels), rtol=1e-5)
+
+    segment = f"/dev/shm/{backend.free[0].shm.name}"
+    assert os.path.exists(segment)
+    backend.close()
+    assert not os.path.exists(segment)
+    # Idempotent : l'atexit enregistré peut rappeler close()
+    backend.close()
+
+
+def test_remote_backend_serves_threads_in_parallel(socket_path):
+    from services.inference_server import RemoteClipBackend
+    backend = RemoteClipBackend(socket_path, connect_timeout=5.0)
+    reference = FakeClipBackend()
+    inputs = [np.random.default_rng(seed).standard_normal((1, 3, 224, 224)).astype(np.float32) for seed in range(16)]
+
+    barrier = threading.Barrier(4)
+    in_use = []
+
+    def encode(pixels):
+        with backend._borrow() as connection:
+            in_use.append(connection)
+            # Quatre threads tiennent une connexion en même temps : aucune n'est partagée
+            barrier.wait(timeout=5)
+        return backend.encode_images(pixels)
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(encode, inputs[:4]))
+        results += list(executor.map(backend.encode_images, inputs[4:]))
+
+    assert len(set(map(id, in_use))) == 4
+    assert len({connection.shm.name for connection in backend.free}) == len(backend.free)
+    for pixels, result in zip(inputs, results):
+        np.testing.assert_allclose(result, reference.encode_images(pixels), rtol=1e-5, atol=1e-6)
+    backend.close()
+
+
+def test_remote_backend_times_out_and_reconnects(socket_path):
+    from services.inference_server import RemoteClipBackend
+    backend = RemoteClipBackend(socket_path, connect_timeout=5.0)
+    connection = backend.free[0]
+    assert connection.sock.gettimeout() == backend.TIMEOUT
+
+    # Connexion coupée (redémarrage du serveur) : une reconnexion, la requête aboutit
+    connection.sock.shutdown(socket.SHUT_RDWR)
+    pixels = np.ones((1, 3, 224, 224), dtype=np.float32)
+    np.testing.assert_allclose(backend.encode_images(pixels), FakeClipBackend().encode_images(pixels), rtol=1e-5)
+    assert backend.free == [connection]
+    backend.close()
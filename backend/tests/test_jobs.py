@@ -0,0 +1,45 @@
+# tests/test_jobs.py - Jobs d'analyse : création, long-polling et Server-Sent Events
+import json
+
+from conftest import upload
+
+
+def test_job_long_polling(client, face_png):
+    created = client.post("/api/jobs", files=upload(face_png))
+    assert created.status_code == 202
+    job_id = created.json()["job_id"]
+
+    job = client.get(f"/api/jobs/{job_id}?wait=10").json()
+    assert job["status"] == "done"
+    assert job["result"]["mode"] == "full"
+    assert "recommendations" in job["result"]
+
+
+def test_job_result_shaping(client, face_png):
+    job_id = client.post("/api/jobs", files=upload(face_png)).json()["job_id"]
+    job = client.get(f"/api/jobs/{job_id}?wait=10&fields=id,skin_type.category").json()
+    assert job["result"] == {"id": job_id, "skin_type": {"category": job["result"]["skin_type"]["category"]}}
+
+
+def test_job_failure_is_reported(client, noise_png):
+    job_id = client.post("/api/jobs", files=upload(noise_png)).json()["job_id"]
+    job = client.get(f"/api/jobs/{job_id}?wait=10").json()
+    assert job["status"] == "failed"
+    assert job["error"]
+
+
+def test_job_events_stream(client, face_png):
+    job_id = client.post("/api/jobs", files=upload(face_png)).json()["job_id"]
+
+    statuses = []
+    with client.stream("GET", f"/api/jobs/{job_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("data: "):
+                statuses.append(json.loads(line[len("data: "):])["status"])
+    assert statuses[-1] == "done"
+
+
+def test_unknown_job(client):
+    assert client.get("/api/jobs/inconnu").status_code == 404
+    assert client.get("/api/jobs/inconnu/events").status_code == 404
@@ -0,0 +1,22 @@
+# tests/test_live.py - Mode caméra en direct (WebSocket /ws/live)
+def test_live_camera_analyzes_stable_face(client, face_png):
+    with client.websocket_connect("/ws/live") as websocket:
+        for _ in range(20):
+            websocket.send_bytes(face_png)
+            message = websocket.receive_json()
+            assert message["type"] == "feedback"
+            assert "next_frame_delay_ms" in message
+            if message["ready"]:
+                break
+        else:
+            raise AssertionError("aucune frame jugée stable")
+
+        analysis = websocket.receive_json()
+        assert analysis["type"] == "analysis"
+        assert analysis["result"]["skin_type"]["category"]
+
+
+def test_live_camera_reports_unreadable_frame(client):
+    with client.websocket_connect("/ws/live") as websocket:
+        websocket.send_bytes(b"pas une image")
+        assert websocket.receive_json() == {"type": "error", "message": "Frame illisible"}
@@ -0,0 +1,82 @@
+# tests/test_logging.py - Logs structurés : file non bloquante, contexte par requête, un record de synthèse
+import json
+import logging
+import queue
+
+import pytest
+
+from conftest import upload
+from services.structured_logging import (
+    DroppingQueueHandler, JsonFormatter, RequestContextFilter, request_log_context
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    """Records du logger "main" tels que les voit le handler de file (contexte et échantillonnage compris)"""
+    handler = ListHandler()
+    handler.addFilter(RequestContextFilter(debug_everything=False))
+    logger = logging.getLogger("main")
+    level = logger.level
+    # LOG_LEVEL=WARNING pendant les tests : INFO et DEBUG doivent atteindre les handlers
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_app_logs_go_through_a_non_blocking_queue(app):
+    # Hors handlers de capture de pytest : seule la file, aucune écriture sur la requête
+    handlers = [h for h in logging.getLogger().handlers if not type(h).__module__.startswith("_pytest")]
+    assert len(handlers) == 1 and isinstance(handlers[0], DroppingQueueHandler)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for index in range(3):
+        handler.emit(logging.LogRecord("main", logging.INFO, __file__, 0, f"ligne {index}", (), None))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_one_summary_record_per_analysis(client, face_png, captured):
+    response = client.post("/api/analyze", files=upload(face_png))
+    assert response.status_code == 200
+
+    summaries = [record for record in captured if getattr(record, "event", None) == "analysis"]
+    assert len(summaries) == 1
+    summary = summaries[0]
+    assert summary.status == "ok"
+    assert summary.analysis_id == response.json()["id"]
+    assert summary.duration_ms > 0
+    # Lignes par étape (DEBUG) non échantillonnées : absentes
+    assert not [record for record in captured if record.levelno <= logging.DEBUG]
+
+
+def test_summary_reports_errors_and_context_is_reset(captured):
+    logger = logging.getLogger("main")
+    with pytest.raises(ValueError):
+        with request_log_context("analyse-1", logger) as summary:
+            summary["image_size"] = (640, 480)
+            logger.info("étape")
+            raise ValueError("image illisible")
+    logger.info("hors requête")
+
+    step, summary, outside = captured
+    assert step.analysis_id == "analyse-1"
+    assert (summary.levelno, summary.status, summary.error) == (logging.WARNING, "error", "image illisible")
+    assert outside.analysis_id is None
+
+    line = json.loads(JsonFormatter().format(summary))
+    assert line["analysis_id"] == "analyse-1"
+    assert line["image_size"] == [640, 480]
@@ -0,0 +1,72 @@
+# tests/test_photo_quality.py - Dominante de couleur : ni la peau ni le fond ne font rejeter la photo
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from conftest import encode_image, upload
+from services.photo_quality import photo_quality_checker
+
+# Échelle de teintes de peau, de très claire à très foncée
+SKIN_TONES = ["#FFDBAC", "#F1C27D", "#E0AC69", "#C68642", "#8D5524", "#5C3A21", "#3B2219"]
+BACKGROUNDS = [(128, 128, 128), (235, 235, 230), (40, 40, 40)]
+# Murs colorés sous une lumière neutre
+COLORED_BACKGROUNDS = [(70, 110, 180), (180, 80, 80), (200, 180, 120), (120, 160, 110)]
+
+
+def portrait(skin: str, face_ratio: float, background=(128, 128, 128), tint=(1.0, 1.0, 1.0)) -> Image.Image:
+    """Visage (ellipse) occupant face_ratio du cadre, éclairage éventuellement teinté"""
+    width, height = 300, 400
+    image = Image.new("RGB", (width, height), background)
+    face_width, face_height = width * face_ratio, height * face_ratio
+    ImageDraw.Draw(image).ellipse(
+        [(width - face_width) / 2, (height - face_height) / 2, (width + face_width) / 2, (height + face_height) / 2],
+        fill=skin
+    )
+    pixels = np.asarray(image, dtype=np.float32) * np.array(tint, dtype=np.float32)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+@pytest.mark.parametrize("skin", SKIN_TONES)
+@pytest.mark.parametrize("face_ratio", [0.6, 0.8, 0.95])
+@pytest.mark.parametrize("background", BACKGROUNDS)
+def test_skin_tone_is_not_a_color_cast(skin, face_ratio, background):
+    result = photo_quality_checker.assess(portrait(skin, face_ratio, background))
+    assert "color_cast" not in result["issues"], result["metrics"]
+
+
+@pytest.mark.parametrize("background", COLORED_BACKGROUNDS)
+@pytest.mark.parametrize("skin", ["#FFDBAC", "#C68642", "#3B2219"])
+def test_colored_background_is_not_rejected(skin, background):
+    result = photo_quality_checker.assess(portrait(skin, 0.6, background))
+    assert "color_cast" not in result["issues"], result["metrics"]
+
+
+@pytest.mark.parametrize("tint", [(1.0, 0.6, 0.6), (0.6, 0.6, 1.0), (0.6, 1.0, 0.6), (1.0, 1.0, 0.6)])
+@pytest.mark.parametrize("skin", ["#E0AC69", "#8D5524"])
+def test_colored_lighting_is_only_a_warning(skin, tint):
+    result = photo_quality_checker.assess(portrait(skin, 0.6, (200, 200, 200), tint))
+    assert "color_cast" in result["warnings"], result["metrics"]
+    assert "color_cast" not in result["issues"]
+    assert result["suggestion"]
+
+
+def test_color_cast_does_not_block_validation(client, face_png):
+    """Photo valide sous une lumière colorée : analysée, avec l'avertissement dans les détails"""
+    pixels = np.asarray(Image.open(io.BytesIO(face_png)).convert("RGB"), dtype=np.float32)
+    tint = np.array([0.6, 0.6, 1.0], dtype=np.float32)
+    tinted = np.full((400, 300, 3), 200 * tint, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    top, left = (tinted.shape[0] - height) // 2, (tinted.shape[1] - width) // 2
+    tinted[top:top + height, left:left + width] = np.clip(pixels * tint, 0, 255)
+
+    response = client.post("/api/validate-face", files=upload(encode_image(Image.fromarray(tinted))))
+    validation = response.json()["validation"]
+    assert validation["details"]["photo_quality"]["warnings"] == ["color_cast"]
+    assert validation["details"]["validation_passed"]["photo_quality"] is True
+
+
+def test_reference_portrait_passes_quality(face_png):
+    result = photo_quality_checker.assess(Image.open(io.BytesIO(face_png)))
+    assert result["is_acceptable"], result
@@ -0,0 +1,105 @@
+# tests/test_profiling.py - Profilage à la demande de /api/analyze
+import pytest
+
+from conftest import upload
+
+TOKEN = "test-profile-token"
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    from services.profiling import request_profiler
+    monkeypatch.setattr(request_profiler, "PROFILING_TOKEN", TOKEN)
+    return request_profiler
+
+
+def test_profiled_analysis_is_stored(client, face_png, profiler):
+    response = client.post("/api/analyze", files=upload(face_png), headers={"X-Profile-Token": TOKEN})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/api/profiles/{profile_id}", headers={"X-Profile-Token": TOKEN})
+    assert profile.status_code == 200
+    assert "run_full_pipeline" in profile.json()["cprofile"]
+
+
+def test_no_profile_id_when_another_profile_is_running(client, face_png, profiler, monkeypatch):
+    monkeypatch.setattr(profiler, "active", True)
+    response = client.post("/api/analyze", files=upload(face_png), headers={"X-Profile-Token": TOKEN})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_profile_yields_whether_it_profiles(profiler):
+    with profiler.profile("outer") as outer:
+        with profiler.profile("inner") as inner:
+            pass
+    assert outer is True and inner is False
+    assert profiler.get("outer") is not None
+    assert profiler.get("inner") is None
+
+
+class BrokenTorchProfile:
+    """Profiler torch qui échoue au démarrage ou à l'arrêt"""
+
+    def __init__(self, fail_on):
+        self.fail_on = fail_on
+
+    def __enter__(self):
+        if self.fail_on == "enter":
+            raise RuntimeError("profiler déjà actif")
+        return self
+
+    def __exit__(self, *exc):
+        if self.fail_on == "exit":
+            raise RuntimeError("export impossible")
+
+    def key_averages(self):
+        raise RuntimeError("pas de données")
+
+
+@pytest.mark.parametrize("fail_on", ["enter", "exit"])
+def test_torch_profiler_failure_releases_the_profiler(profiler, monkeypatch, fail_on):
+    import sys
+    import types
+    torch = types.ModuleType("torch")
+    torch.profiler = types.SimpleNamespace(
+        profile=lambda **kwargs: BrokenTorchProfile(fail_on),
+        ProfilerActivity=types.SimpleNamespace(CPU="cpu")
+    )
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setitem(sys.modules, "torch.profiler", torch.profiler)
+
+    # Le profil cProfile est gardé, l'analyse n'échoue pas et le profileur est libéré
+    with profiler.profile(f"broken-{fail_on}") as profiled:
+        assert profiled is True
+    assert profiler.get(f"broken-{fail_on}")["torch"] is None
+    assert profiler.active is False
+    with profiler.profile("next") as profiled:
+        assert profiled is True
+
+
+def test_profiles_can_be_listed_while_stored(profiler, monkeypatch):
+    import threading
+    monkeypatch.setattr(profiler, "MAX_PROFILES", 3)
+    errors = []
+
+    def store(worker: int):
+        for index in range(200):
+            with profiler.profile(f"{worker}-{index}"):
+                pass
+
+    def read():
+        try:
+            for _ in range(2000):
+                profiler.list()
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(worker,)) for worker in range(2)] + [threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(profiler.list()) <= 3
@@ -0,0 +1,115 @@
+# tests/test_shadow.py - Évaluation shadow : jamais d'effet sur la réponse de production
+import threading
+import time
+
+import pytest
+
+from conftest import upload
+
+
+def without_id(response) -> dict:
+    data = response.json()
+    data.pop("id")
+    return data
+
+
+def wait_idle(evaluator, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while evaluator.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert evaluator.pending == 0
+
+
+@pytest.fixture
+def shadow(monkeypatch):
+    from services.shadow_evaluation import shadow_evaluator
+    monkeypatch.setattr(shadow_evaluator, "SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(shadow_evaluator, "CANDIDATE_BACKEND", "fake")
+    monkeypatch.setattr(shadow_evaluator, "candidate", None)
+    monkeypatch.setattr(shadow_evaluator, "executor", None)
+    shadow_evaluator.reset()
+    yield shadow_evaluator
+    wait_idle(shadow_evaluator)
+    if shadow_evaluator.executor is not None:
+        shadow_evaluator.executor.shutdown(wait=True)
+    shadow_evaluator.reset()
+
+
+def test_candidate_agreement_is_measured(client, face_png, shadow):
+    assert client.post("/api/analyze", files=upload(face_png)).status_code == 200
+    wait_idle(shadow)
+    metrics = shadow.metrics()
+    assert metrics["completed"] == 1 and metrics["errors"] == 0
+    # Même backend factice des deux côtés : accord total
+    assert metrics["skin_type_agreement"] == 1.0
+    assert metrics["problems_mean_jaccard"] == 1.0
+
+
+@pytest.mark.parametrize("failure", ["candidate_raises", "candidate_error_result", "submit_raises"])
+def test_shadow_failures_never_affect_the_response(client, face_png, shadow, monkeypatch, failure):
+    monkeypatch.setattr(shadow, "SAMPLE_RATE", 0.0)
+    baseline = client.post("/api/analyze", files=upload(face_png))
+    monkeypatch.setattr(shadow, "SAMPLE_RATE", 1.0)
+
+    if failure == "candidate_raises":
+        def broken_candidate():
+            raise RuntimeError("modèle candidat introuvable")
+        monkeypatch.setattr(shadow, "_get_candidate", broken_candidate)
+    elif failure == "candidate_error_result":
+        class ErrorCandidate:
+            async def analyze_skin_from_memory(self, pil_image, analysis_id):
+                return {"error": "encodage impossible"}
+        monkeypatch.setattr(shadow, "candidate", ErrorCandidate())
+    else:
+        class ClosedExecutor:
+            def submit(self, *args):
+                raise RuntimeError("cannot schedule new futures after shutdown")
+        monkeypatch.setattr(shadow, "executor", ClosedExecutor())
+
+    response = client.post("/api/analyze", files=upload(face_png))
+    assert response.status_code == 200
+    assert without_id(response) == without_id(baseline)
+
+    wait_idle(shadow)
+    metrics = shadow.metrics()
+    assert metrics["errors"] == 1 and metrics["completed"] == 0 and metrics["pending"] == 0
+    if failure == "submit_raises":
+        # Pas d'executor réel à arrêter dans la fixture
+        monkeypatch.setattr(shadow, "executor", None)
+
+
+def test_slow_candidate_adds_no_latency(client, face_png, shadow, monkeypatch):
+    release = threading.Event()
+
+    class SlowCandidate:
+        async def analyze_skin_from_memory(self, pil_image, analysis_id):
+            release.wait(timeout=10)
+            raise RuntimeError("interrompu")
+
+    monkeypatch.setattr(shadow, "candidate", SlowCandidate())
+    start = time.perf_counter()
+    assert client.post("/api/analyze", files=upload(face_png)).status_code == 200
+    assert time.perf_counter() - start < 5
+    # La réponse est partie alors que le candidat tourne encore
+    assert shadow.pending == 1
+    release.set()
+
+
+def test_shadow_is_submitted_after_the_response_is_assembled(client, face_png, shadow, monkeypatch):
+    import main
+    events = []
+    generate = main.generate_skincare_recommendations
+    submit = shadow.maybe_submit
+
+    async def recording_generate(*args, **kwargs):
+        events.append("recommendations")
+        return await generate(*args, **kwargs)
+
+    def recording_submit(*args, **kwargs):
+        events.append("shadow")
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(main, "generate_skincare_recommendations", recording_generate)
+    monkeypatch.setattr(shadow, "maybe_submit", recording_submit)
+    assert client.post("/api/analyze", files=upload(face_png)).status_code == 200
+    assert events == ["recommendations", "shadow"]
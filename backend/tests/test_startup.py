@@ -0,0 +1,55 @@
+# tests/test_startup.py - Démarrage rapide : import de main et endpoints légers sans torch, transformers ni cv2
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "transformers", "cv2")
+
+# Processus neuf : enregistre toute tentative d'import (module installé ou non), puis sys.modules
+SCRIPT = """
+import json, sys
+
+HEAVY = {heavy!r}
+attempted = []
+
+class RecordHeavyImports:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in HEAVY:
+            attempted.append(name)
+        return None
+
+sys.meta_path.insert(0, RecordHeavyImports())
+
+import main
+{requests}
+print(json.dumps({{"attempted": sorted(set(attempted)), "loaded": [m for m in HEAVY if m in sys.modules]}}))
+"""
+
+
+def run_fresh(requests: str = "", clip_backend: str = "local") -> dict:
+    env = {**os.environ, "CLIP_BACKEND": clip_backend, "PRELOAD_MODEL": "false", "LOG_LEVEL": "ERROR"}
+    script = SCRIPT.format(heavy=HEAVY_MODULES, requests=requests)
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("clip_backend", ["local", "remote", "fake"])
+def test_import_main_loads_no_heavy_module(clip_backend):
+    assert run_fresh(clip_backend=clip_backend) == {"attempted": [], "loaded": []}
+
+
+def test_cheap_endpoints_load_no_heavy_module():
+    requests = """
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+for url in ("/health", "/api/skin-types", "/api/skin-problems", "/api/features"):
+    assert client.get(url).status_code == 200, url
+"""
+    assert run_fresh(requests) == {"attempted": [], "loaded": []}
@@ -0,0 +1,48 @@
+# tests/test_validation_tickets.py - Tickets de /api/validate-face réutilisés par /api/analyze
+import numpy as np
+from PIL import Image
+
+from conftest import encode_image, upload
+
+
+def test_ticket_analysis_matches_upload(client, face_png):
+    response = client.post("/api/validate-face?ticket=true", files=upload(face_png))
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+
+    from_ticket = client.post("/api/analyze", data={"ticket": ticket})
+    from_upload = client.post("/api/analyze", files=upload(face_png))
+    assert from_ticket.status_code == 200
+    assert from_ticket.json()["skin_type"] == from_upload.json()["skin_type"]
+    assert from_ticket.json()["problems_detected"] == from_upload.json()["problems_detected"]
+
+
+def test_ticket_is_single_use(client, face_png):
+    ticket = client.post("/api/validate-face?ticket=true", files=upload(face_png)).json()["ticket"]
+    assert client.post("/api/analyze", data={"ticket": ticket}).status_code == 200
+    assert client.post("/api/analyze", data={"ticket": ticket}).status_code == 404
+
+
+def test_no_ticket_for_image_without_face(client, noise_png):
+    response = client.post("/api/validate-face?ticket=true", files=upload(noise_png))
+    assert response.status_code == 200
+    assert response.json()["validation"]["is_valid"] is False
+    assert "ticket" not in response.json()
+
+
+def test_no_ticket_when_rejected_before_clip(client):
+    """Rejets avant CLIP (qualité, taille) : pas d'embedding, pas de 500"""
+    dark = encode_image(Image.fromarray(np.full((400, 400, 3), 8, dtype=np.uint8)))
+    tiny = encode_image(Image.fromarray(np.random.default_rng(1).integers(0, 256, (40, 40, 3), dtype=np.uint8)))
+
+    for data in (dark, tiny):
+        response = client.post("/api/validate-face?ticket=true", files=upload(data))
+        assert response.status_code == 200
+        assert response.json()["validation"]["is_valid"] is False
+        assert "ticket" not in response.json()
+
+
+def test_analyze_requires_file_or_ticket(client, face_png):
+    assert client.post("/api/analyze").status_code == 400
+    ticket = client.post("/api/validate-face?ticket=true", files=upload(face_png)).json()["ticket"]
+    assert client.post("/api/analyze", files=upload(face_png), data={"ticket": ticket}).status_code == 400
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# tools/benchmark_pipeline.py - Coût du pipeline hors modèle (HTTP, décodage, OpenCV, sérialisation)
+"""
+Envoie des photos à POST /api/analyze de main:app en processus (transport ASGI, sans
+réseau), avec le backend CLIP factice par défaut : aucune donnée réseau ni poids à
+télécharger. Chaque requête traverse tout ce qui entoure le modèle : encodage et
+parsing multipart, décodage, pool de threads d'analyse, ordonnancement de la boucle,
+sérialisation et compression de la réponse.
+
+Usage (depuis backend/):
+    python -m tools.benchmark_pipeline photos/*.jpg --requests 200 [--mode fast] [--concurrency 4]
+    CLIP_BACKEND=local python -m tools.benchmark_pipeline photo.jpg   # même mesure avec le vrai modèle
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CLIP_BACKEND", "fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _percentiles(values) -> dict:
+    values = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+
+async def run(paths, requests: int, mode: str, concurrency: int, verbose: bool, allow_downgrade: bool):
+    import httpx
+    import main
+
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append((os.path.basename(path), f.read()))
+
+    latencies = []
+    response_bytes = []
+    statuses = Counter()
+    modes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    url = f"/api/analyze?verbose={str(verbose).lower()}"
+    form = {"mode": mode, "allow_downgrade": str(allow_downgrade).lower()}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def one(index: int):
+            name, data = payloads[index % len(payloads)]
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(url, files={"file": (name, data, "image/jpeg")}, data=form)
+                elapsed = time.perf_counter() - start
+
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                latencies.append(elapsed)
+                response_bytes.append(len(response.content))
+                modes[response.headers.get("X-Analysis-Mode")] += 1
+
+        # Échauffement : chargement du backend, du détecteur, du cache des prompts et des threads d'analyse
+        await asyncio.gather(*(one(i) for i in range(max(1, concurrency))))
+        latencies.clear()
+        response_bytes.clear()
+        statuses.clear()
+        modes.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    from services.clip_backend import get_clip_backend
+    print(f"Backend CLIP: {get_clip_backend().name} | mode: {mode} | concurrence: {concurrency} | verbose: {verbose}")
+    print(f"{requests} requêtes en {elapsed:.2f}s ({requests / elapsed:.1f} req/s) | statuts: {dict(statuses)}")
+    if latencies:
+        print(f"  latence   {_percentiles(latencies)} ms")
+        print(f"  réponse   {int(np.mean(response_bytes))} octets en moyenne | modes servis: {dict(modes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /api/analyze hors modèle (ASGI en processus)")
+    parser.add_argument("images", nargs="+", help="Photos de visage (réutilisées en boucle)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--mode", choices=("fast", "full"), default="full")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--compact", action="store_true", help="Réponses allégées (verbose=false)")
+    parser.add_argument("--allow-downgrade", action="store_true", help="Laisser la surcharge servir le mode rapide")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.images, args.requests, args.mode, args.concurrency, not args.compact, args.allow_downgrade))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# tools/bulk_analyze.py - Analyse en masse d'archives de photos (dossier ou tar), hors HTTP
+"""
+Fait passer un dossier ou une archive tar de photos par le même pipeline que
+/api/analyze (mode complet), en flux et sur tous les cœurs :
+
+    lecture ──> pool de processus : décodage, contrôle qualité, OpenCV, recadrage
+            ──> processus principal : CLIP par lots, décision, analyse, recommandations
+            ──> écriture incrémentale (JSONL ou fichiers Parquet)
+
+Les chemins déjà traités (statut "ok" ou "rejected") sont ignorés : relancer la
+même commande après une interruption reprend là où elle s'était arrêtée. Les
+erreurs portent une classe : "input" (fichier illisible ou corrompu, même résultat
+à chaque essai) n'est pas retentée, sauf avec --retry-errors ; "transient"
+(encodeur, serveur d'inférence, mémoire...) l'est à chaque reprise.
+
+Usage (depuis backend/):
+    python -m tools.bulk_analyze photos/ --output resultats.jsonl
+    python -m tools.bulk_analyze archive.tar.gz --output resultats/ --format parquet --batch-size 32
+    CLIP_BACKEND=remote python -m tools.bulk_analyze photos/ --output resultats.jsonl   # serveur d'inférence
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# Même résolution que les uploads réduits par le frontend (UPLOAD_MAX_DIMENSION)
+MAX_DIMENSION = 1024
+
+# Statuts définitifs : ignorés à la reprise
+FINAL_STATUSES = ("ok", "rejected")
+
+# Classes d'erreur : "input" est définitive (sauf --retry-errors), "transient" est retentée
+ERROR_INPUT, ERROR_TRANSIENT = "input", "transient"
+
+
+def is_done(status: str, error_class, retry_errors: bool = False) -> bool:
+    """Chemin à ignorer à la reprise (lignes d'avant les classes d'erreur : erreur retentée)"""
+    if status in FINAL_STATUSES:
+        return True
+    return status == "error" and error_class == ERROR_INPUT and not retry_errors
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def iter_directory(root: str, skip: set):
+    """(chemin relatif, octets) de chaque image du dossier, dans un ordre stable"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            name = os.path.relpath(full_path, root)
+            if name in skip:
+                continue
+            with open(full_path, "rb") as f:
+                yield name, f.read()
+
+
+def iter_tar(archive: str, skip: set):
+    """Lecture en flux (tar, tar.gz, tar.bz2, tar.xz) : l'archive n'est jamais extraite sur disque"""
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if member.name in skip:
+                continue
+            yield member.name, tar.extractfile(member).read()
+
+
+def count_directory(root: str) -> int:
+    return sum(
+        1 for _, _, filenames in os.walk(root)
+        for filename in filenames if filename.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Étape 1 : pool de processus (tout ce qui précède CLIP)
+# ---------------------------------------------------------------------------
+
+def _init_worker():
+    """Un thread OpenCV par processus : le parallélisme vient du nombre de processus"""
+    os.environ["THREADING_POLICY"] = "throughput"
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+
+def prepare_image(item):
+    """
+    Décodage, contrôle qualité, détection OpenCV et recadrage d'une image.
+
+    Retourne soit un rejet (aucun passage dans CLIP n'est nécessaire), soit les deux
+    tenseurs (3, 224, 224) à encoder : image entière (validation) et visage recadré
+    et filtré (analyse).
+    """
+    name, data = item
+    try:
+        from PIL import Image
+        from services.clip_backend import preprocess_for_clip
+        from services.face_validation import face_validator
+        from services.photo_quality import photo_quality_checker
+        from services.skincare_analysis import skincare_analyzer
+
+        try:
+            pil_image = Image.open(io.BytesIO(data))
+            pil_image.draft("RGB", (MAX_DIMENSION, MAX_DIMENSION))    # Décodage JPEG réduit
+            pil_image = pil_image.convert("RGB")
+            pil_image.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+        except Exception as e:
+            # Fichier illisible, tronqué ou trop grand : le retenter donnerait la même erreur
+            return {"path": name, "status": "error", "error_class": ERROR_INPUT, "reason": str(e)}
+        del data
+
+        if min(pil_image.size) < 50:
+            return {"path": name, "status": "rejected", "reason": "Image trop petite"}
+
+        quality_result = photo_quality_checker.assess(pil_image)
+        if not quality_result["is_acceptable"]:
+            return {
+                "path": name, "status": "rejected",
+                "reason": quality_result["reason"], "suggestion": quality_result["suggestion"]
+            }
+
+        opencv_result = face_validator.detect_faces_opencv(pil_image)
+        if not opencv_result["has_valid_face"]:
+            # Rejet certain quelle que soit la réponse de CLIP : on économise l'encodage
+            skipped_clip = {"is_human_face": False, "confidence": 0.0, "skipped": True}
+            validation = face_validator.build_result(pil_image.size, quality_result, opencv_result, skipped_clip)
+            return {
+                "path": name, "status": "rejected",
+                "reason": validation["reason"], "suggestion": validation["suggestion"]
+            }
+
+        # Boîtes de la détection ci-dessus : pas de seconde détection pour le recadrage
+        face_boxes = [face["position"] for face in opencv_result["faces_info"]]
+        processed_image = skincare_analyzer.preprocess_pil_image(pil_image, name, face_boxes)
+        return {
+            "path": name,
+            "status": "prepared",
+            "image_size": pil_image.size,
+            "photo_quality": quality_result,
+            "opencv_detection": opencv_result,
+            "pixels": np.stack([preprocess_for_clip(pil_image), preprocess_for_clip(processed_image)])
+        }
+    except Exception as e:
+        return {"path": name, "status": "error", "error_class": ERROR_TRANSIENT, "reason": str(e)}
+
+
+# ---------------------------------------------------------------------------
+# Étape 2 : CLIP par lots et analyse (processus principal)
+# ---------------------------------------------------------------------------
+
+async def analyze_batch(batch: list, verbose: bool) -> list:
+    """Un seul appel à l'encodeur pour tout le lot (2 images par photo)"""
+    from models.schemas import SkincareAnalysisResponse
+    from services.clip_backend import get_clip_backend
+    from services.face_validation import face_validator
+    from services.response_shaping import shape_analysis
+    from services.skincare_analysis import skincare_analyzer
+    from services.skincare_recommendation import generate_skincare_recommendations
+
+    pixels = np.concatenate([item.pop("pixels") for item in batch])
+    embeds = get_clip_backend().encode_images(pixels)
+
+    records = []
+    for i, item in enumerate(batch):
+        name = item["path"]
+        try:
+            full_embeds, crop_embeds = embeds[2 * i:2 * i + 1], embeds[2 * i + 1:2 * i + 2]
+
+            clip_result = await face_validator.validate_human_face_clip(None, full_embeds)
+            validation = face_validator.build_result(item["image_size"], item["photo_quality"], item["opencv_detection"], clip_result)
+            if not validation["is_valid"]:
+                records.append({"path": name, "status": "rejected", "reason": validation["reason"], "suggestion": validation["suggestion"]})
+                continue
+
+            skin_analysis = await skincare_analyzer.analyze_embeddings(crop_embeds, name)
+            recommendations = await generate_skincare_recommendations(skin_analysis)
+            response = SkincareAnalysisResponse(
+                id=name,
+                skin_type=skin_analysis.get("skin_type", {}),
+                problems_detected=skin_analysis.get("problems_detected", []),
+                skin_condition=skin_analysis.get("skin_condition", {}),
+                recommendations=recommendations,
+                confidence_note=skin_analysis.get("confidence_note", ""),
+                detailed_scores={
+                    "problems": skin_analysis.get("problem_scores", {}),
+                    "face_validation": clip_result.get("confidence", 0.0)
+                }
+            )
+            records.append({"path": name, "status": "ok", "analysis": shape_analysis(response, verbose)})
+        except Exception as e:
+            records.append({"path": name, "status": "error", "error_class": ERROR_TRANSIENT, "reason": str(e)})
+    return records
+
+
+# ---------------------------------------------------------------------------
+# Étape 3 : sorties incrémentales
+# ---------------------------------------------------------------------------
+
+class JsonlWriter:
+    """Une ligne par image, vidée après chaque lot"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Une ligne tronquée par une interruption est retirée avant de reprendre
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                content = f.read()
+                if content and not content.endswith(b"\n"):
+                    f.truncate(content.rfind(b"\n") + 1)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def done_paths(self, retry_errors: bool = False) -> set:
+        done = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if is_done(record["status"], record.get("error_class"), retry_errors):
+                        done.add(record["path"])
+                except (ValueError, KeyError):
+                    continue
+        return done
+
+    def write(self, records: list):
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Fichiers part-NNNNN.parquet de ROWS_PER_FILE lignes dans un dossier. Colonnes à
+    plat pour les requêtes courantes, analyse complète en JSON dans "result".
+    """
+
+    ROWS_PER_FILE = 1000
+
+    def __init__(self, directory: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ La sortie Parquet nécessite pyarrow (pip install pyarrow)")
+
+        self.pa, self.pq = pa, pq
+        self.schema = pa.schema([
+            ("path", pa.string()),
+            ("status", pa.string()),
+            ("reason", pa.string()),
+            ("error_class", pa.string()),
+            ("skin_type", pa.string()),
+            ("problems", pa.list_(pa.string())),
+            ("skin_condition", pa.string()),
+            ("severity", pa.string()),
+            ("result", pa.string())
+        ])
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.parts = sorted(f for f in os.listdir(directory) if f.startswith("part-") and f.endswith(".parquet"))
+        self.rows = []
+
+    def done_paths(self, retry_errors: bool = False) -> set:
+        done = set()
+        for part in self.parts:
+            part_path = os.path.join(self.directory, part)
+            # Fichiers écrits avant la colonne error_class : erreurs retentées
+            columns = [c for c in ("path", "status", "error_class") if c in self.pq.read_schema(part_path).names]
+            table = self.pq.read_table(part_path, columns=columns)
+            paths, statuses = table.column("path").to_pylist(), table.column("status").to_pylist()
+            error_classes = table.column("error_class").to_pylist() if "error_class" in columns else [None] * len(paths)
+            for path, status, error_class in zip(paths, statuses, error_classes):
+                if is_done(status, error_class, retry_errors):
+                    done.add(path)
+        return done
+
+    def write(self, records: list):
+        for record in records:
+            analysis = record.get("analysis", {})
+            self.rows.append({
+                "path": record["path"],
+                "status": record["status"],
+                "reason": record.get("reason"),
+                "error_class": record.get("error_class"),
+                "skin_type": analysis.get("skin_type", {}).get("category"),
+                "problems": [p["condition"] for p in analysis.get("problems_detected", [])] if analysis else None,
+                "skin_condition": analysis.get("skin_condition", {}).get("category"),
+                "severity": analysis.get("recommendations", {}).get("severity"),
+                "result": json.dumps(analysis, ensure_ascii=False) if analysis else None
+            })
+        if len(self.rows) >= self.ROWS_PER_FILE:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        part = f"part-{len(self.parts):05d}.parquet"
+        tmp_path = os.path.join(self.directory, part + ".tmp")
+        self.pq.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema), tmp_path)
+        os.replace(tmp_path, os.path.join(self.directory, part))    # Un fichier visible est toujours complet
+        self.parts.append(part)
+        self.rows = []
+
+    def close(self):
+        self._flush()
+
+
+# ---------------------------------------------------------------------------
+# Orchestration
+# ---------------------------------------------------------------------------
+
+class Progress:
+    """Compteurs et débit, affichés sur une seule ligne (stderr)"""
+
+    def __init__(self, total=None, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self.counts = {"ok": 0, "rejected": 0, "error": 0}
+        self.clip_seconds = 0.0
+        self.start = time.perf_counter()
+        self.last_print = 0.0
+
+    def update(self, records: list, force: bool = False):
+        for record in records:
+            self.counts[record["status"]] += 1
+        now = time.perf_counter()
+        if force or now - self.last_print >= self.interval:
+            self.last_print = now
+            done = sum(self.counts.values())
+            elapsed = now - self.start
+            total = f"/{self.total}" if self.total is not None else ""
+            sys.stderr.write(
+                f"\r{done}{total} images | {self.counts['ok']} ok, {self.counts['rejected']} rejetées, "
+                f"{self.counts['error']} erreurs | {done / elapsed if elapsed else 0:.1f} img/s | CLIP {self.clip_seconds:.1f}s"
+            )
+            sys.stderr.flush()
+
+
+def run(args):
+    from services.threading_policy import detect_cpu_limit
+
+    cpus = detect_cpu_limit()["cpus"]
+    workers = args.workers or max(1, cpus // 2)
+    clip_threads = args.clip_threads or max(1, cpus - workers)
+
+    writer = ParquetWriter(args.output) if args.format == "parquet" else JsonlWriter(args.output)
+    skip = writer.done_paths(args.retry_errors)
+    if skip:
+        print(f"↩️ Reprise : {len(skip)} images déjà présentes dans {args.output}")
+
+    if os.path.isdir(args.input):
+        source = iter_directory(args.input, skip)
+        total = max(0, count_directory(args.input) - len(skip))
+    else:
+        source = iter_tar(args.input, skip)
+        total = None
+
+    # Chargement du modèle avant de lancer le pool, puis threads torch limités à leur part des CPU
+    from services.clip_backend import get_clip_backend
+    backend = get_clip_backend()
+    backend.encode_images(np.ones((1, 3, 224, 224), dtype=np.float32))
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(clip_threads)
+    print(f"🚀 {workers} processus de préparation, CLIP ({backend.name}) sur {clip_threads} thread(s), lots de {args.batch_size}")
+
+    progress = Progress(total)
+    loop = asyncio.new_event_loop()
+    batch = []
+
+    def flush_batch():
+        if not batch:
+            return
+        start = time.perf_counter()
+        records = loop.run_until_complete(analyze_batch(batch, args.verbose))
+        progress.clip_seconds += time.perf_counter() - start
+        writer.write(records)
+        progress.update(records)
+        batch.clear()
+
+    def handle(prepared: dict):
+        if prepared["status"] == "prepared":
+            batch.append(prepared)
+            if len(batch) >= args.batch_size:
+                flush_batch()
+        else:
+            writer.write([prepared])
+            progress.update([prepared])
+
+    # "spawn" : les processus ne partagent ni l'état de torch ni ses threads
+    pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker)
+    pending = deque()
+    max_pending = workers * 4       # Contre-pression : jamais toute l'archive en mémoire
+    try:
+        for item in source:
+            pending.append(pool.apply_async(prepare_image, (item,)))
+            while len(pending) >= max_pending or (pending and pending[0].ready()):
+                handle(pending.popleft().get())
+        while pending:
+            handle(pending.popleft().get())
+        flush_batch()
+    finally:
+        pool.terminate()
+        writer.close()
+        loop.close()
+
+    progress.update([], force=True)
+    sys.stderr.write("\n")
+    elapsed = time.perf_counter() - progress.start
+    print(f"✅ {sum(progress.counts.values())} images en {elapsed:.1f}s -> {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse en masse d'un dossier ou d'une archive tar de photos")
+    parser.add_argument("input", help="Dossier de photos ou archive tar (.tar, .tar.gz, ...)")
+    parser.add_argument("--output", required=True, help="Fichier .jsonl, ou dossier de sortie en Parquet")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=16, help="Photos par appel à CLIP")
+    parser.add_argument("--workers", type=int, default=None, help="Processus de préparation (défaut : moitié des CPU)")
+    parser.add_argument("--clip-threads", type=int, default=None, help="Threads torch pour CLIP (défaut : CPU restants)")
+    parser.add_argument("--verbose", action="store_true", help="Garder les scores détaillés dans chaque résultat")
+    parser.add_argument("--retry-errors", action="store_true", help="Retenter aussi les fichiers illisibles ou corrompus")
+    args = parser.parse_args()
+
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# tools/calibrate_thresholds.py - Calibration hors ligne des seuils à partir d'embeddings en cache
+"""
+Calibre les seuils de validation et de détection sur un dossier d'images labellisées.
+
+Structure attendue du dossier:
+    dataset/
+        face/          photos de visages exploitables
+        not_face/      photos à rejeter (objets, animaux, visages trop petits...)
+        problems.json  optionnel : {"face/img01.jpg": ["acné", "rides"], ...}
+
+Étape 1 (une seule fois, modèle requis) : extraction des embeddings CLIP, des
+sorties du détecteur et du verdict du contrôle qualité, mis en cache dans un .npz.
+Étape 2 (quelques secondes, sans modèle) : balayage vectorisé de tous les seuils et
+courbes précision/rappel.
+
+Les décisions reproduisent celles de production : mêmes règles de comparaison
+(importées des services : >= pour la validation, > pour les problèmes et les
+recommandations) et même contrôle qualité en amont (une photo rejetée par ce
+contrôle n'est jamais acceptée, quel que soit le seuil ; les problèmes ne sont
+calibrés que sur les photos qui l'ont passé).
+
+Usage (depuis backend/):
+    python -m tools.calibrate_thresholds extract dataset/ --cache calibration.npz
+    python -m tools.calibrate_thresholds sweep --cache calibration.npz [--json report.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+# ==========================================
+# ÉTAPE 1 : EXTRACTION (une seule inférence par image)
+# ==========================================
+
+def _list_dataset(root: str):
+    items = []
+    for label_dir, is_face in (("face", True), ("not_face", False)):
+        directory = os.path.join(root, label_dir)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((f"{label_dir}/{name}", is_face))
+    return items
+
+
+def extract(root: str, cache_path: str, batch_size: int = 16):
+    """Passe chaque image une fois dans le pipeline et met en cache embeddings + détections"""
+    from PIL import Image
+    from services.clip_backend import preprocess_for_clip
+    from services.face_validation import face_validator
+    from services.photo_quality import photo_quality_checker
+    from services.skincare_analysis import skincare_analyzer
+
+    items = _list_dataset(root)
+    if not items:
+        raise SystemExit(f"Aucune image trouvée dans {root}/face ou {root}/not_face")
+
+    problems_path = os.path.join(root, "problems.json")
+    problem_labels = {}
+    if os.path.exists(problems_path):
+        with open(problems_path, encoding="utf-8") as f:
+            problem_labels = json.load(f)
+
+    skincare_analyzer.load_model()
+    backend = skincare_analyzer.clip_backend
+    problems = skincare_analyzer.skin_problems
+
+    def embed_images(images):
+        return backend.encode_images(np.stack([preprocess_for_clip(image) for image in images]))
+
+    def embed_texts(texts):
+        return backend.encode_texts(texts)
+
+    full_embeds, crop_embeds, area_ratios, quality_ok = [], [], [], []
+    start = time.perf_counter()
+    for offset in range(0, len(items), batch_size):
+        batch = items[offset:offset + batch_size]
+        full_images, crops = [], []
+        for relative_path, _ in batch:
+            pil_image = Image.open(os.path.join(root, relative_path)).convert("RGB")
+            # Contrôles de production avant tout modèle : taille minimum puis qualité de la photo
+            quality_ok.append(
+                min(pil_image.size) >= face_validator.MIN_IMAGE_SIZE
+                and photo_quality_checker.assess(pil_image)["is_acceptable"]
+            )
+            detection = face_validator.detect_faces_opencv(pil_image)
+            area_ratios.append(max((f["area_ratio"] for f in detection["faces_info"]), default=0.0))
+            full_images.append(pil_image)
+            crops.append(skincare_analyzer.preprocess_pil_image(pil_image, "calibration"))
+        full_embeds.append(embed_images(full_images))
+        crop_embeds.append(embed_images(crops))
+        print(f"  {min(offset + batch_size, len(items))}/{len(items)} images", end="\r", flush=True)
+
+    problem_prompts = [p for problem in problems for p in (f"visage avec {problem}", f"visage sans {problem}")]
+    np.savez_compressed(
+        cache_path,
+        paths=np.array([path for path, _ in items]),
+        is_face=np.array([is_face for _, is_face in items], dtype=bool),
+        has_problem_labels=np.array([path in problem_labels for path, _ in items], dtype=bool),
+        problem_labels=np.array(
+            [[problem in problem_labels.get(path, []) for problem in problems] for path, _ in items],
+            dtype=bool
+        ).reshape(len(items), len(problems)),
+        problems=np.array(problems),
+        area_ratio=np.array(area_ratios, dtype=np.float32),
+        quality_ok=np.array(quality_ok, dtype=bool),
+        full_embeds=np.concatenate(full_embeds),
+        crop_embeds=np.concatenate(crop_embeds),
+        validation_text_embeds=embed_texts(face_validator.VALIDATION_PROMPTS),
+        human_prompt_count=face_validator.HUMAN_PROMPT_COUNT,
+        problem_text_embeds=embed_texts(problem_prompts).reshape(len(problems), 2, -1),
+        logit_scale=float(backend.logit_scale)
+    )
+    print(f"\n✅ {len(items)} images mises en cache dans {cache_path} ({time.perf_counter() - start:.1f}s), "
+          f"{len(items) - sum(quality_ok)} rejetées par le contrôle qualité")
+
+
+# ==========================================
+# ÉTAPE 2 : BALAYAGE VECTORISÉ DES SEUILS
+# ==========================================
+
+def _softmax(logits, axis=-1):
+    logits = logits - logits.max(axis=axis, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=axis, keepdims=True)
+
+
+def pr_curve(scores: np.ndarray, labels: np.ndarray, thresholds: np.ndarray, passes, eligible: np.ndarray = None) -> dict:
+    """
+    Précision/rappel/F1 pour chaque seuil, sans boucle Python
+
+    passes : règle de comparaison du service (passes(score, seuil) sur des tableaux)
+    eligible : images pouvant être acceptées (contrôle qualité passé), toutes par défaut
+    """
+    predicted = passes(scores[:, None], thresholds[None, :])
+    if eligible is not None:
+        predicted &= eligible[:, None]
+    positives = labels[:, None]
+    tp = (predicted & positives).sum(axis=0)
+    fp = (predicted & ~positives).sum(axis=0)
+    fn = (~predicted & positives).sum(axis=0)
+    precision = np.divide(tp, tp + fp, out=np.ones(len(thresholds)), where=(tp + fp) > 0)
+    recall = np.divide(tp, tp + fn, out=np.zeros(len(thresholds)), where=(tp + fn) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(thresholds)), where=(precision + recall) > 0)
+    return {"thresholds": thresholds, "precision": precision, "recall": recall, "f1": f1}
+
+
+def _at(curve: dict, threshold: float) -> dict:
+    index = int(np.abs(curve["thresholds"] - threshold).argmin())
+    return {key: round(float(curve[key][index]), 4) for key in ("precision", "recall", "f1")}
+
+
+def _best(curve: dict) -> dict:
+    index = int(curve["f1"].argmax())
+    return {"threshold": round(float(curve["thresholds"][index]), 4), **_at(curve, float(curve["thresholds"][index]))}
+
+
+def sweep(cache_path: str, steps: int = 101) -> dict:
+    from services.face_validation import face_validator, passes_validation_threshold
+    from services.skincare_analysis import skincare_analyzer, passes_detection_threshold
+    from services.skincare_recommendation import RECOMMENDATION_CONFIDENCE_THRESHOLD, passes_recommendation_threshold
+
+    data = np.load(cache_path)
+    if "quality_ok" not in data:
+        raise SystemExit(f"❌ {cache_path} ne contient pas le verdict du contrôle qualité : relancez extract")
+    is_face = data["is_face"]
+    quality_ok = data["quality_ok"]
+    scale = float(data["logit_scale"])
+    human_count = int(data["human_prompt_count"])
+    thresholds = np.linspace(0.0, 1.0, steps)
+
+    # Validation CLIP : même normalisation que FaceValidator.validate_human_face_clip
+    validation_probs = _softmax(scale * data["full_embeds"] @ data["validation_text_embeds"].T)
+    clip_confidence = validation_probs[:, :human_count].sum(axis=1)
+
+    # Grille 2D (aire du visage x confiance CLIP) pour la décision finale
+    area_thresholds = np.linspace(0.0, 0.3, 61)
+    area_ok = passes_validation_threshold(data["area_ratio"][:, None, None], area_thresholds[None, :, None])
+    clip_ok = passes_validation_threshold(clip_confidence[:, None, None], thresholds[None, None, :])
+    accepted = quality_ok[:, None, None] & area_ok & clip_ok
+    positives = is_face[:, None, None]
+    tp = (accepted & positives).sum(axis=0)
+    fp = (accepted & ~positives).sum(axis=0)
+    fn = (~accepted & positives).sum(axis=0)
+    precision = np.divide(tp, tp + fp, out=np.ones(tp.shape), where=(tp + fp) > 0)
+    recall = np.divide(tp, tp + fn, out=np.zeros(tp.shape), where=(tp + fn) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(tp.shape), where=(precision + recall) > 0)
+    best_area, best_clip = np.unravel_index(int(f1.argmax()), f1.shape)
+    current_area = int(np.abs(area_thresholds - face_validator.MIN_FACE_AREA_RATIO).argmin())
+    current_clip = int(np.abs(thresholds - face_validator.CLIP_HUMAN_FACE_THRESHOLD).argmin())
+
+    clip_curve = pr_curve(clip_confidence, is_face, thresholds, passes_validation_threshold, quality_ok)
+    area_curve = pr_curve(data["area_ratio"], is_face, area_thresholds, passes_validation_threshold, quality_ok)
+
+    report = {
+        "images": int(len(is_face)),
+        "faces": int(is_face.sum()),
+        "quality_rejected": {"images": int((~quality_ok).sum()), "faces": int((is_face & ~quality_ok).sum())},
+        "clip_human_face": {
+            "current": {"threshold": face_validator.CLIP_HUMAN_FACE_THRESHOLD,
+                        **_at(clip_curve, face_validator.CLIP_HUMAN_FACE_THRESHOLD)},
+            "best": _best(clip_curve)
+        },
+        "min_face_area_ratio": {
+            "current": {"threshold": face_validator.MIN_FACE_AREA_RATIO,
+                        **_at(area_curve, face_validator.MIN_FACE_AREA_RATIO)},
+            "best": _best(area_curve)
+        },
+        "face_validation_combined": {
+            "current": {
+                "min_face_area_ratio": face_validator.MIN_FACE_AREA_RATIO,
+                "clip_threshold": face_validator.CLIP_HUMAN_FACE_THRESHOLD,
+                "precision": round(float(precision[current_area, current_clip]), 4),
+                "recall": round(float(recall[current_area, current_clip]), 4),
+                "f1": round(float(f1[current_area, current_clip]), 4)
+            },
+            "best": {
+                "min_face_area_ratio": round(float(area_thresholds[best_area]), 4),
+                "clip_threshold": round(float(thresholds[best_clip]), 4),
+                "precision": round(float(precision[best_area, best_clip]), 4),
+                "recall": round(float(recall[best_area, best_clip]), 4),
+                "f1": round(float(f1[best_area, best_clip]), 4)
+            }
+        },
+        "curves": {"clip_human_face": clip_curve}
+    }
+
+    # Problèmes de peau : P("visage avec X") pour chaque problème, calculé en un seul produit matriciel
+    # (seules les photos qui passent le contrôle qualité sont analysées en production)
+    labelled = data["has_problem_labels"] & quality_ok
+    if labelled.any():
+        crop = data["crop_embeds"][labelled]
+        pair_logits = scale * np.einsum("nd,pkd->npk", crop, data["problem_text_embeds"])
+        problem_scores = _softmax(pair_logits)[:, :, 0]
+        problem_labels = data["problem_labels"][labelled]
+
+        # Micro-moyenne sur tous les problèmes
+        curve = pr_curve(problem_scores.ravel(), problem_labels.ravel(), thresholds, passes_detection_threshold)
+        recommendation_curve = pr_curve(problem_scores.ravel(), problem_labels.ravel(), thresholds, passes_recommendation_threshold)
+        report["problem_detection"] = {
+            "current": {"threshold": skincare_analyzer.PROBLEM_DETECTION_THRESHOLD,
+                        **_at(curve, skincare_analyzer.PROBLEM_DETECTION_THRESHOLD)},
+            "best": _best(curve),
+            "per_problem": {
+                str(problem): _best(pr_curve(problem_scores[:, i], problem_labels[:, i], thresholds, passes_detection_threshold))
+                for i, problem in enumerate(data["problems"]) if problem_labels[:, i].any()
+            }
+        }
+        report["recommendation"] = {
+            "current": {"threshold": RECOMMENDATION_CONFIDENCE_THRESHOLD,
+                        **_at(recommendation_curve, RECOMMENDATION_CONFIDENCE_THRESHOLD)},
+            "note": "Même score que la détection ; doit rester >= au seuil de détection"
+        }
+        report["curves"]["problem_detection"] = curve
+
+    return report
+
+
+def _print_report(report: dict):
+    print(f"📊 {report['images']} images ({report['faces']} visages), rejetées par le contrôle qualité : "
+          f"{report['quality_rejected']['images']} (dont {report['quality_rejected']['faces']} visages)\n")
+    for key in ("clip_human_face", "min_face_area_ratio", "face_validation_combined", "problem_detection", "recommendation"):
+        if key not in report:
+            continue
+        print(f"▶ {key}")
+        for label in ("current", "best"):
+            if label in report[key]:
+                print(f"   {label:8s} {report[key][label]}")
+        for problem, best in report[key].get("per_problem", {}).items():
+            print(f"   {problem:20s} {best}")
+    print("\nCourbe précision/rappel (validation CLIP):")
+    curve = report["curves"]["clip_human_face"]
+    for i in range(0, len(curve["thresholds"]), max(1, len(curve["thresholds"]) // 20)):
+        print(f"   {curve['thresholds'][i]:.2f}  P={curve['precision'][i]:.3f}  R={curve['recall'][i]:.3f}  F1={curve['f1'][i]:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibration hors ligne des seuils SkinCare AI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = subparsers.add_parser("extract", help="Inférence unique et mise en cache des embeddings")
+    extract_parser.add_argument("dataset", help="Dossier contenant face/, not_face/ et problems.json (optionnel)")
+    extract_parser.add_argument("--cache", default="calibration.npz")
+    extract_parser.add_argument("--batch-size", type=int, default=16)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Balayage des seuils à partir du cache")
+    sweep_parser.add_argument("--cache", default="calibration.npz")
+    sweep_parser.add_argument("--steps", type=int, default=101)
+    sweep_parser.add_argument("--json", help="Écrit le rapport complet (avec courbes) dans ce fichier")
+
+    args = parser.parse_args()
+    if args.command == "extract":
+        extract(args.dataset, args.cache, args.batch_size)
+    else:
+        start = time.perf_counter()
+        report = sweep(args.cache, args.steps)
+        _print_report(report)
+        print(f"\n⏱️ Balayage en {time.perf_counter() - start:.2f}s")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, default=lambda a: np.round(a, 4).tolist())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# tools/soak_test.py - Test d'endurance mémoire (fuites, dérive du RSS) de main:app en processus
+"""
+Envoie des milliers d'uploads valides et invalides à main:app (client de test, dans
+le processus), échantillonne régulièrement le RSS, le tas Python (tracemalloc), le
+nombre d'objets suivis par le GC et l'allocateur torch (CUDA) s'il est chargé, puis
+échoue si la croissance en régime établi dépasse les seuils.
+
+Les --warmup-requests premières requêtes (caches, arènes de l'allocateur, pools)
+ne sont pas mesurées : la référence est prise après elles, et la pente ne porte que
+sur les --requests suivantes. En dessous de --min-requests mesurées, la pente n'est
+pas fiable et le test refuse de conclure. Les logs de l'application sont limités à
+ERROR (--log-level) pour que le rapport reste lisible.
+
+Usage (depuis backend/):
+    python -m tools.soak_test photos/visage1.jpg photos/visage2.jpg --requests 3000
+    CLIP_BACKEND=local python -m tools.soak_test photo.jpg --requests 5000 --json soak.json
+
+Code de sortie 1 si une croissance dépasse son seuil (Mo pour 1000 requêtes), ou si
+des réponses n'ont pas le statut attendu ; 2 si le test est trop court pour conclure.
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CLIP_BACKEND", "fake")
+
+MB = 1024 * 1024
+# En dessous, le bruit des allocations dépasse le seuil de pente
+MIN_MEASURED_REQUESTS = 1000
+
+# Scénario -> poids dans le mélange
+SCENARIO_WEIGHTS = {
+    "analyze_full": 0.35,
+    "analyze_fast": 0.15,
+    "validate_then_ticket": 0.10,
+    "validate": 0.10,
+    "no_face": 0.10,
+    "blurry": 0.10,
+    "corrupted": 0.05,
+    "too_small": 0.05
+}
+
+
+def build_payloads(paths) -> dict:
+    """Photos valides fournies, variantes invalides générées à partir de la première"""
+    from PIL import Image, ImageFilter
+
+    def encode(image, fmt="JPEG") -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, quality=90)
+        return buffer.getvalue()
+
+    valid = []
+    for path in paths:
+        with open(path, "rb") as f:
+            valid.append(f.read())
+
+    reference = Image.open(io.BytesIO(valid[0])).convert("RGB")
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (reference.height, reference.width, 3), dtype=np.uint8))
+
+    return {
+        "valid": valid,
+        "no_face": encode(noise, "PNG"),
+        "blurry": encode(reference.filter(ImageFilter.GaussianBlur(12))),
+        "corrupted": valid[0][:len(valid[0]) // 3] + os.urandom(2048),
+        "too_small": encode(Image.new("RGB", (8, 8), (200, 160, 140)))
+    }
+
+
+def run_scenario(client, scenario: str, payloads: dict, rng: random.Random) -> bool:
+    """Exécute un scénario ; True si les statuts HTTP sont ceux attendus"""
+    def upload(data: bytes, name: str = "photo.jpg"):
+        return {"file": (name, data, "image/jpeg")}
+
+    photo = rng.choice(payloads["valid"])
+
+    if scenario == "analyze_full":
+        return client.post("/api/analyze", files=upload(photo), data={"allow_downgrade": "false"}).status_code == 200
+    if scenario == "analyze_fast":
+        return client.post("/api/analyze?verbose=false", files=upload(photo), data={"mode": "fast"}).status_code == 200
+    if scenario == "validate":
+        return client.post("/api/validate-face?verbose=false", files=upload(photo)).status_code == 200
+    if scenario == "validate_then_ticket":
+        response = client.post("/api/validate-face?ticket=true&verbose=false", files=upload(photo))
+        ticket = response.json().get("ticket") if response.status_code == 200 else None
+        return ticket is not None and client.post("/api/analyze", data={"ticket": ticket}).status_code == 200
+    # Uploads invalides : rejet attendu (400), jamais d'erreur serveur
+    return client.post("/api/analyze", files=upload(payloads[scenario])).status_code == 400
+
+
+def read_rss_mb() -> float:
+    """RSS courant (Linux : /proc/self/statm), sinon pic du processus"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def torch_stats():
+    """Allocateur torch (CUDA uniquement) ; sur CPU la mémoire de torch est comprise dans le RSS"""
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return {
+        "allocated_mb": round(torch.cuda.memory_allocated() / MB, 2),
+        "reserved_mb": round(torch.cuda.memory_reserved() / MB, 2)
+    }
+
+
+def take_sample(requests: int, start: float) -> dict:
+    # Après collecte : on mesure ce qui reste vivant, pas les déchets en attente
+    gc.collect()
+    return {
+        "requests": requests,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "rss_mb": round(read_rss_mb(), 2),
+        "heap_mb": round(tracemalloc.get_traced_memory()[0] / MB, 2),
+        "gc_objects": len(gc.get_objects()),
+        "torch": torch_stats()
+    }
+
+
+def growth_per_1k(samples: list, key: str) -> float:
+    """Pente (régression linéaire) de key par 1000 requêtes"""
+    x = np.array([s["requests"] for s in samples], dtype=np.float64)
+    y = np.array([s[key] for s in samples], dtype=np.float64)
+    return float(np.polyfit(x, y, 1)[0] * 1000)
+
+
+def run(args) -> int:
+    if args.requests < args.min_requests:
+        print(
+            f"❌ {args.requests} requêtes mesurées : trop peu pour distinguer une fuite du bruit de l'allocateur "
+            f"(minimum {args.min_requests}, --min-requests pour forcer)"
+        )
+        return 2
+
+    # Avertissements attendus des uploads invalides : le rapport ne doit pas s'y noyer
+    os.environ["LOG_LEVEL"] = args.log_level
+    from fastapi.testclient import TestClient
+    import main
+    logging.getLogger().setLevel(args.log_level)
+
+    payloads = build_payloads(args.photos)
+    rng = random.Random(args.seed)
+    scenarios, weights = zip(*SCENARIO_WEIGHTS.items())
+    failures = {scenario: 0 for scenario in scenarios}
+
+    tracemalloc.start(args.tracemalloc_frames)
+    samples = []
+
+    with TestClient(main.app) as client:
+        # Échauffement hors mesure : chargement du backend, du détecteur, des caches et des pools,
+        # premières allocations des arènes (elles ne sont jamais rendues et ne sont pas une fuite)
+        for scenario in scenarios:
+            run_scenario(client, scenario, payloads, rng)
+        for _ in range(args.warmup_requests):
+            run_scenario(client, rng.choices(scenarios, weights)[0], payloads, rng)
+
+        start = time.perf_counter()
+        samples.append(take_sample(0, start))
+        warmup_snapshot = tracemalloc.take_snapshot()
+        for i in range(1, args.requests + 1):
+            scenario = rng.choices(scenarios, weights)[0]
+            if not run_scenario(client, scenario, payloads, rng):
+                failures[scenario] += 1
+
+            if i % args.sample_every == 0:
+                sample = take_sample(i, start)
+                samples.append(sample)
+                print(
+                    f"{i:>6} req | RSS {sample['rss_mb']:.1f} Mo | tas Python {sample['heap_mb']:.1f} Mo | "
+                    f"{sample['gc_objects']} objets | {i / sample['elapsed_s']:.1f} req/s"
+                )
+
+        final_snapshot = tracemalloc.take_snapshot()
+
+    tracemalloc.stop()
+
+    if len(samples) < 3:
+        print("❌ Pas assez d'échantillons en régime établi (augmentez --requests ou réduisez --sample-every)")
+        return 2
+
+    report = {
+        "requests": args.requests,
+        "warmup_requests": args.warmup_requests,
+        "clip_backend": os.environ["CLIP_BACKEND"],
+        "rss_growth_mb_per_1k": round(growth_per_1k(samples, "rss_mb"), 3),
+        "heap_growth_mb_per_1k": round(growth_per_1k(samples, "heap_mb"), 3),
+        "gc_objects_growth_per_1k": round(growth_per_1k(samples, "gc_objects"), 1),
+        "unexpected_statuses": {k: v for k, v in failures.items() if v},
+        "samples": samples
+    }
+
+    print(f"\nRégime établi après {args.warmup_requests} requêtes d'échauffement ({len(samples)} échantillons) :")
+    print(f"  RSS        {report['rss_growth_mb_per_1k']:+.3f} Mo / 1000 requêtes (seuil {args.max_rss_growth})")
+    print(f"  tas Python {report['heap_growth_mb_per_1k']:+.3f} Mo / 1000 requêtes (seuil {args.max_heap_growth})")
+    print(f"  objets GC  {report['gc_objects_growth_per_1k']:+.1f} / 1000 requêtes")
+
+    growing = [stat for stat in final_snapshot.compare_to(warmup_snapshot, "lineno") if stat.size_diff > 0][:10]
+    if growing:
+        print("\nLignes dont l'allocation a le plus augmenté depuis la fin de l'échauffement :")
+        for stat in growing:
+            print(f"  {stat.size_diff / 1024:+10.1f} Ko  {stat.traceback}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    errors = []
+    if report["rss_growth_mb_per_1k"] > args.max_rss_growth:
+        errors.append(f"RSS +{report['rss_growth_mb_per_1k']:.3f} Mo / 1000 requêtes")
+    if report["heap_growth_mb_per_1k"] > args.max_heap_growth:
+        errors.append(f"tas Python +{report['heap_growth_mb_per_1k']:.3f} Mo / 1000 requêtes")
+    if report["unexpected_statuses"]:
+        errors.append(f"statuts inattendus : {report['unexpected_statuses']}")
+
+    if errors:
+        print(f"\n❌ Échec : {' ; '.join(errors)}")
+        return 1
+    print("\n✅ Pas de croissance mémoire au-delà des seuils")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test d'endurance mémoire de l'API en processus")
+    parser.add_argument("photos", nargs="+", help="Photos de visage valides (les cas invalides sont générés)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requêtes mesurées, après l'échauffement")
+    parser.add_argument("--warmup-requests", type=int, default=300, help="Requêtes d'échauffement, hors mesure")
+    parser.add_argument("--min-requests", type=int, default=MIN_MEASURED_REQUESTS, help="Refuse de conclure en dessous")
+    parser.add_argument("--sample-every", type=int, default=50, help="Requêtes entre deux mesures")
+    parser.add_argument("--max-rss-growth", type=float, default=2.0, help="Mo / 1000 requêtes")
+    parser.add_argument("--max-heap-growth", type=float, default=0.5, help="Mo / 1000 requêtes")
+    parser.add_argument("--tracemalloc-frames", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Écrit le rapport et les échantillons dans ce fichier")
+    parser.add_argument("--log-level", default="ERROR", type=str.upper, help="Niveau des logs de l'application pendant le test")
+    args = parser.parse_args()
+
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
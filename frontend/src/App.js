@@ -21,6 +21,50 @@ import {
   Clock
 } from 'lucide-react';
 
+// Valeurs par défaut si le backend n'annonce pas ses contraintes (/api/features)
+const DEFAULT_UPLOAD_CONSTRAINTS = { max_dimension: 1024, jpeg_quality: 0.85 };
+
+// Réduit et recompresse la photo dans le navigateur avant l'upload :
+// le backend n'utilise jamais plus qu'un recadrage du visage en 224px
+const downscaleImage = async (file, maxDimension, quality) => {
+  const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+  const originalWidth = bitmap.width;
+  const originalHeight = bitmap.height;
+  const scale = Math.min(1, maxDimension / Math.max(originalWidth, originalHeight));
+
+  // Image déjà assez petite et légère : on l'envoie telle quelle
+  if (scale === 1 && file.size <= 1024 * 1024) {
+    bitmap.close();
+    return { blob: file, originalWidth, originalHeight };
+  }
+
+  const width = Math.round(originalWidth * scale);
+  const height = Math.round(originalHeight * scale);
+
+  let blob;
+  if (typeof OffscreenCanvas !== 'undefined') {
+    const canvas = new OffscreenCanvas(width, height);
+    canvas.getContext('2d').drawImage(bitmap, 0, 0, width, height);
+    blob = await canvas.convertToBlob({ type: 'image/jpeg', quality });
+  } else {
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    canvas.getContext('2d').drawImage(bitmap, 0, 0, width, height);
+    blob = await new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', quality));
+  }
+  bitmap.close();
+
+  // toBlob rend null si l'encodage échoue (canvas trop grand, mémoire insuffisante)
+  if (!blob) {
+    const encodingError = new Error('Impossible de préparer la photo pour l\'envoi, essayez avec une autre image');
+    encodingError.name = 'EncodingError';
+    throw encodingError;
+  }
+
+  return { blob, originalWidth, originalHeight };
+};
+
 const App = () => {
   const [isMenuOpen, setIsMenuOpen] = useState(false);
   const [currentPage, setCurrentPage] = useState('home');
@@ -34,6 +78,7 @@ const App = () => {
     const [userName, setUserName] = useState('');
     const [error, setError] = useState(null);
     const [apiStatus, setApiStatus] = useState('connected');
+    const [uploadConstraints, setUploadConstraints] = useState(DEFAULT_UPLOAD_CONSTRAINTS);
     const fileInputRef = useRef(null);
 
     // Configuration API
@@ -42,8 +87,24 @@ const App = () => {
     // Vérifier le statut de l'API au chargement
     useEffect(() => {
       checkApiStatus();
+      loadUploadConstraints();
     }, []);
 
+    // Résolution suffisante annoncée par le backend
+    const loadUploadConstraints = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/api/features`);
+        if (response.ok) {
+          const features = await response.json();
+          if (features.upload_constraints) {
+            setUploadConstraints({ ...DEFAULT_UPLOAD_CONSTRAINTS, ...features.upload_constraints });
+          }
+        }
+      } catch (error) {
+        // On garde les valeurs par défaut
+      }
+    };
+
     const checkApiStatus = async () => {
       try {
         const response = await fetch(`${API_BASE_URL}/health`);
@@ -92,9 +153,36 @@ const App = () => {
       setError(null);
 
       try {
+        // Réduire la photo avant l'upload (4-12MB → quelques centaines de KB)
+        let uploadFile = selectedImage;
+        let originalWidth = null;
+        let originalHeight = null;
+        try {
+          const downscaled = await downscaleImage(
+              selectedImage,
+              uploadConstraints.max_dimension,
+              uploadConstraints.jpeg_quality
+          );
+          if (downscaled.blob !== selectedImage) {
+            uploadFile = new File([downscaled.blob], 'photo.jpg', { type: 'image/jpeg' });
+          }
+          originalWidth = downscaled.originalWidth;
+          originalHeight = downscaled.originalHeight;
+        } catch (downscaleError) {
+          // Encodage raté : message d'erreur plutôt qu'un fichier vide envoyé à l'API
+          if (downscaleError.name === 'EncodingError') {
+            throw downscaleError;
+          }
+          console.warn('Réduction impossible, envoi de l\'image originale:', downscaleError);
+        }
+
         // Préparer les données pour l'upload
         const formData = new FormData();
-        formData.append('file', selectedImage);
+        formData.append('file', uploadFile);
+        if (originalWidth && originalHeight) {
+          formData.append('original_width', originalWidth);
+          formData.append('original_height', originalHeight);
+        }
 
         console.log('Envoi vers SkinCare CLIP API:', `${API_BASE_URL}/api/analyze`);
 